@@ -0,0 +1,105 @@
+from nodes.state import BatchState, FaultTarget, FileFaults
+from langgraph.graph import StateGraph, START, END
+from langgraph.types import Send
+from graphs.fault_generator_graph import build_fault_generator_graph, initial_state
+from utils.repository import Repository, WorktreePool
+from utils.test_outcome_cache import TestOutcomeCache
+from utils.kill_history import KillHistory
+from pathlib import Path
+from typing import Dict, List, Optional
+
+
+class FileFaultGenerator:
+    def __init__(self, llm, pool: WorktreePool, **options):
+        """
+        Args:
+            llm: LLM
+            pool: ファイルごとの処理に貸し出すworktree。同時に処理するファイルの数はworktreeの数になる
+            options: build_fault_generator_graph に渡す引数
+        """
+        self.pool = pool
+        # worktreeごとに、そのworktreeでテストを実行するグラフを作成する
+        self.graphs: Dict[Path, StateGraph] = {
+            worktree.path: build_fault_generator_graph(llm, worktree, **options)
+            for worktree in pool.repositories
+        }
+
+    async def process(self, target: FaultTarget) -> BatchState:
+        source_code_path = target["source_code_path"]
+        test_code_path = target["test_code_path"]
+
+        async with self.pool.lease() as worktree:
+            print(f"FAULTS {source_code_path} ({worktree.path})")
+            try:
+                state = initial_state(
+                    source_code_path=self.pool.translate(source_code_path, worktree),
+                    test_code_path=self.pool.translate(test_code_path, worktree),
+                )
+                result = await self.graphs[worktree.path].ainvoke(state)
+            except Exception as e:
+                # 1つのファイルの失敗で他のファイルの結果を失わないようにする
+                print(f"FAULTS {source_code_path} failed: {e}")
+                return {"results": [FileFaults(
+                    source_code_path=source_code_path,
+                    test_code_path=test_code_path,
+                    faults=[],
+                    error=f"{type(e).__name__}: {e}",
+                )]}
+            finally:
+                worktree.clean()
+
+        return {"results": [FileFaults(
+            source_code_path=source_code_path,
+            test_code_path=test_code_path,
+            faults=result.get("faults") or [],
+            error=None,
+        )]}
+
+
+def fan_out(state: BatchState) -> List[Send]:
+    return [Send("generate_faults", target) for target in state["targets"]]
+
+
+def build_fault_generator_batch_graph(llm, pool: WorktreePool, is_debug: bool = False, schemata: bool = False, targeted_tests: bool = False, cache: Optional[TestOutcomeCache] = None, fail_fast: bool = False, kill_history: Optional[KillHistory] = None, timeout_factor: Optional[float] = None, streaming: bool = False, equivalence_shard_size: Optional[int] = None) -> StateGraph:
+    """複数のソースコードのFAULTを並列に生成するグラフを作成します。
+
+    各ファイルは build_fault_generator_graph のグラフで処理され、
+    同時に処理するファイルの数は pool のworktreeの数に制限されます。
+
+    Args:
+        llm: LLM
+        pool: 開いたworktreeのプール
+        is_debug: Trueの場合、LLMの代わりに固定のDIFFを使う
+        schemata: mutant schemataでMUTANTをまとめてテストする場合はTrue
+        targeted_tests: 対応するテストクラスだけを実行する場合はTrue
+        cache: テスト結果のキャッシュ
+        fail_fast: MUTANTのテストを最初に失敗したテストで止める場合はTrue
+        kill_history: MUTANTを検出したテストの履歴。指定した場合、検出した回数の多いテストを先に実行する
+        timeout_factor: 指定した場合、元のソースコードでのテストの実行時間のこの倍数をMUTANTのテストのタイムアウトにする
+        streaming: diffの生成、MUTANTのテスト、等価性の判定をパイプラインで重ねて実行する場合はTrue
+        equivalence_shard_size: 指定した場合、等価性の判定をこの数のDIFFごとに分割して同時に行う
+    """
+    generator = FileFaultGenerator(llm, pool, is_debug=is_debug, schemata=schemata, targeted_tests=targeted_tests, cache=cache, fail_fast=fail_fast, kill_history=kill_history, timeout_factor=timeout_factor, streaming=streaming, equivalence_shard_size=equivalence_shard_size)
+
+    builder = StateGraph(BatchState)
+    builder.add_node("generate_faults", generator.process)
+
+    builder.add_conditional_edges(START, fan_out, ["generate_faults"])
+    builder.add_edge("generate_faults", END)
+
+    return builder.compile()
+
+
+def initial_batch_state(repository: Repository, source_code_paths: Optional[List[Path]] = None) -> BatchState:
+    """リポジトリ内のソースコードとテストコードの組から初期状態を作成します。
+
+    Args:
+        repository: 対象のリポジトリ
+        source_code_paths: 対象にするソースコード。Noneの場合はテストコードがある全てのソースコード
+    """
+    targets = []
+    for source_code_path, test_code_path in repository.source_test_pairs():
+        if source_code_paths is not None and source_code_path.resolve() not in [Path(path).resolve() for path in source_code_paths]:
+            continue
+        targets.append(FaultTarget(source_code_path=source_code_path, test_code_path=test_code_path))
+    return {"targets": targets, "results": []}
@@ -3,18 +3,30 @@ from langgraph.graph import StateGraph, START, END
 from nodes.diff_generator_node import DiffGeneratorNode
 from nodes.diff_applier_node import DiffApplierNode
 from nodes.equivalence_detector import EquivalenceDetectorNode
+from nodes.fault_pipeline_node import FaultPipelineNode
 from utils.repository import Repository
 from pathlib import Path
-from typing import Callable
+from typing import Callable, Optional
+from utils.test_outcome_cache import TestOutcomeCache
+from utils.kill_history import KillHistory
 
 
-def build_fault_generator_graph(llm, repository: Repository, is_debug: bool = False) -> StateGraph:
+def build_fault_generator_graph(llm, repository: Repository, is_debug: bool = False, parallelism: int = 1, targeted_tests: bool = False, schemata: bool = False, cache: Optional[TestOutcomeCache] = None, fail_fast: bool = False, kill_history: Optional[KillHistory] = None, timeout_factor: Optional[float] = None, streaming: bool = False, equivalence_shard_size: Optional[int] = None) -> StateGraph:
     diff_generator = DiffGeneratorNode(llm)
-    diff_applier = DiffApplierNode(repository)
-    equivalence_detector = EquivalenceDetectorNode(llm)
+    diff_applier = DiffApplierNode(repository, parallelism=parallelism, targeted_tests=targeted_tests, schemata=schemata, cache=cache, fail_fast=fail_fast, kill_history=kill_history, timeout_factor=timeout_factor)
+    equivalence_detector = EquivalenceDetectorNode(llm, shard_size=equivalence_shard_size)
 
     builder = StateGraph(GlobalState)
 
+    if streaming and not is_debug:
+        # diffの生成、MUTANTのテスト、等価性の判定を重ねて実行する（mutant schemataは使わない）
+        fault_pipeline = FaultPipelineNode(diff_applier, equivalence_detector, diff_generator=diff_generator)
+        builder.add_node("fault_pipeline", fault_pipeline.process)
+
+        builder.add_edge(START, "fault_pipeline")
+        builder.add_edge("fault_pipeline", END)
+        return builder.compile()
+
     if is_debug:
         from nodes.diff_constant_node import DiffConstantNode
         diff_constant = DiffConstantNode()
@@ -22,6 +34,16 @@ def build_fault_generator_graph(llm, repository: Repository, is_debug: bool = Fa
     else:
         builder.add_node("diff_generator", diff_generator.process)
 
+    if streaming:
+        # MUTANTのテストと等価性の判定を重ねて実行する（mutant schemataは使わない）
+        fault_pipeline = FaultPipelineNode(diff_applier, equivalence_detector)
+        builder.add_node("fault_pipeline", fault_pipeline.process)
+
+        builder.add_edge(START, "diff_generator")
+        builder.add_edge("diff_generator", "fault_pipeline")
+        builder.add_edge("fault_pipeline", END)
+        return builder.compile()
+
     builder.add_node("diff_applier", diff_applier.process)
     builder.add_node("equivalence_detector", equivalence_detector.process)
 
@@ -5,13 +5,15 @@ from nodes.diff_test_applier_node import DiffTestApplierNode
 from nodes.testcode_rewrite_generator_node import TestRewriteGeneratorNode
 from utils.repository import Repository
 from pathlib import Path
-from typing import List
+from typing import List, Optional
+from utils.test_outcome_cache import TestOutcomeCache
+from utils.kill_history import KillHistory
 
 
-def build_test_generator_graph(llm, repository: Repository, is_debug: bool = False) -> StateGraph:
+def build_test_generator_graph(llm, repository: Repository, is_debug: bool = False, targeted_tests: bool = False, cache: Optional[TestOutcomeCache] = None, fail_fast: bool = False, kill_history: Optional[KillHistory] = None, timeout_factor: Optional[float] = None) -> StateGraph:
     test_generator = TestGeneratorNode(llm)
-    diff_test_applier = DiffTestApplierNode(repository)
-    testcode_rewrite_generator = TestRewriteGeneratorNode(llm, repository)
+    diff_test_applier = DiffTestApplierNode(repository, targeted_tests=targeted_tests, cache=cache, fail_fast=fail_fast, kill_history=kill_history, timeout_factor=timeout_factor)
+    testcode_rewrite_generator = TestRewriteGeneratorNode(llm, repository, targeted_tests=targeted_tests)
     builder = StateGraph(GlobalState)
 
     if is_debug:
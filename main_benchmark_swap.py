@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+ベンチマーク: MUTANTごとのファイルの置き換え方法を比較します。
+
+- reset: `git reset --hard` でリポジトリを戻してからMUTANTを書き込む（従来の方法）
+- swap: Repository.swap でMUTANTのファイルだけを置き換え、メモリ上の元の内容に戻す
+
+--gradle を指定した場合は、MUTANTごとにGradleのタスク（既定はcompileKotlin）も実行し、
+up-to-dateの判定への影響を含めて計測します。
+
+使用例:
+    python main_benchmark_swap.py -n 50
+    python main_benchmark_swap.py -n 10 --gradle
+"""
+
+import argparse
+import statistics
+import time
+from pathlib import Path
+from typing import Callable, List, Optional
+from utils.gradle_runner import DaemonGradleRunner
+from utils.repository import Repository
+
+REPOSITORY_PATH = Path("repositories/kotlin-math-utils")
+SOURCE_CODE_PATH = REPOSITORY_PATH / "src/main/kotlin/com/example/math/StatisticsCalculator.kt"
+
+
+def make_mutants(source_code: str, count: int) -> List[str]:
+    """ソースコードの末尾にコメントを追加した、互いに異なるMUTANTを作成します。"""
+    return [f"{source_code.rstrip()}\n// MUTANT {index}\n" for index in range(count)]
+
+
+def run_reset(repository: Repository, path: Path, mutated_code: str, gradle: Optional[Callable[[], None]]):
+    repository.clean()
+    path.write_text(mutated_code)
+    if gradle is not None:
+        gradle()
+
+
+def run_swap(repository: Repository, path: Path, mutated_code: str, gradle: Optional[Callable[[], None]]):
+    with repository.swap(path, mutated_code):
+        if gradle is not None:
+            gradle()
+
+
+def benchmark(name: str, run: Callable, repository: Repository, path: Path, mutants: List[str], gradle: Optional[Callable[[], None]]):
+    durations = []
+    for mutated_code in mutants:
+        started = time.perf_counter()
+        run(repository, path, mutated_code, gradle)
+        durations.append(time.perf_counter() - started)
+    repository.clean()
+
+    total = sum(durations)
+    print(
+        f"{name:>5}: {len(durations)} mutants, total {total:.3f}s, "
+        f"mean {statistics.mean(durations) * 1000:.2f}ms, median {statistics.median(durations) * 1000:.2f}ms"
+    )
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MUTANTごとのファイルの置き換え方法を比較します")
+    parser.add_argument("-n", "--mutants", type=int, default=20, help="MUTANTの数")
+    parser.add_argument("--source", type=Path, default=SOURCE_CODE_PATH, help="MUTANTを書き込むソースコード")
+    parser.add_argument("--gradle", action="store_true", help="MUTANTごとにGradleのタスクを実行する")
+    parser.add_argument("--task", default="compileKotlin", help="--gradle で実行するタスク")
+    args = parser.parse_args()
+
+    runner = DaemonGradleRunner()
+    repository = Repository(REPOSITORY_PATH, runner=runner)
+    repository.clean()
+
+    mutants = make_mutants(args.source.read_text(), args.mutants)
+    gradle = (lambda: runner.run(repository.path, [args.task], capture_output=True)) if args.gradle else None
+
+    if gradle is not None:
+        # 最初の実行（デーモンの起動とコンパイル）を計測から除く
+        gradle()
+
+    reset_total = benchmark("reset", run_reset, repository, args.source, mutants, gradle)
+    swap_total = benchmark("swap", run_swap, repository, args.source, mutants, gradle)
+    print(f"speedup: {reset_total / swap_total:.2f}x")
+
+    if gradle is not None:
+        print(runner.report())
+    runner.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,29 +1,40 @@
 import asyncio
-import json
+import os
 from graphs.fault_generator_graph import build_fault_generator_graph, initial_state
-from utils.credentials import get_default_credentials
+from utils.credentials import get_default_credentials, get_replay_credentials
 from utils.llm import get_bedrock_llm
 from utils.repository import Repository
+from utils.gradle_runner import DaemonGradleRunner
+from utils.test_outcome_cache import TestOutcomeCache
+from utils.kill_history import KillMatrix
+from utils.llm_scheduler import get_default_scheduler
+from utils.llm_response_cache import LLMResponseCache, REPLAY, set_default_response_cache
 from pathlib import Path
-from typing import TypedDict, List, Optional
-from nodes.state import Fault
+from utils.fault_store import FaultStore
 
 
-class FaultRecord(TypedDict):
-    source_code_path: str
-    diff: str
-    is_equivalent: bool
-    reason: Optional[str] = None
+# MUTANTを同時に評価する数（worktreeの数）
+PARALLELISM = 4
+# 元のソースコードでのテストの実行時間に対する、MUTANTのテストのタイムアウトの倍率
+TIMEOUT_FACTOR = 3.0
+# 等価性の判定を分割する、1回のLLMの呼び出しあたりのDIFFの数
+EQUIVALENCE_SHARD_SIZE = 8
+# STREAMING=1 の場合、diffの生成、MUTANTのテスト、等価性の判定をパイプラインで重ねて実行する
+STREAMING = os.environ.get("STREAMING") == "1"
 
 
 async def main():
-    credentials = get_default_credentials()
+    # LLMの応答のキャッシュ（off, record, replay）。既定はoffで、LLM_CACHE_MODEを指定した場合のみ使う。replayの場合はBedrockを呼び出さない
+    llm_cache = LLMResponseCache(mode=os.environ.get("LLM_CACHE_MODE", "off"))
+    set_default_response_cache(llm_cache)
+
+    credentials = get_replay_credentials() if llm_cache.mode == REPLAY else get_default_credentials()
     llm = get_bedrock_llm(credentials)
 
-    repository = Repository(Path("repositories/kotlin-math-utils"))
+    repository = Repository(Path("repositories/kotlin-math-utils"), runner=DaemonGradleRunner())
     repository.clean()
 
-    graph = build_fault_generator_graph(llm, repository)
+    graph = build_fault_generator_graph(llm, repository, parallelism=PARALLELISM, targeted_tests=True, schemata=True, cache=TestOutcomeCache(), fail_fast=True, kill_history=KillMatrix(), timeout_factor=TIMEOUT_FACTOR, equivalence_shard_size=EQUIVALENCE_SHARD_SIZE, streaming=STREAMING)
     
     source_code_path = Path("repositories/kotlin-math-utils/src/main/kotlin/com/example/math/StatisticsCalculator.kt")
     test_code_path = Path("repositories/kotlin-math-utils/src/test/kotlin/com/example/math/StatisticsCalculatorTest.kt")
@@ -33,37 +44,37 @@ async def main():
         test_code_path=test_code_path,
     )
 
-    result = await graph.ainvoke(global_state)
-
-    print("COMPLETED")
+    # FAULTは生成されるたびに保存する
+    with FaultStore() as store:
+        run_id = store.start_run()
+        print("run_id:", run_id)
 
-    # 結果をファイルに保存
-    records = []
-    for fault in result['faults']:
-        diff = fault['diff']
-        is_equivalent = fault['is_equivalent']
-        reason = fault['reason']    
+        count = 0
+        async for update in graph.astream(global_state, stream_mode="updates"):
+            # FAULTは等価性の判定（ストリーミングの場合はパイプライン）のノードが出力する
+            node_update = update.get("fault_pipeline") or update.get("equivalence_detector") or {}
+            for fault in node_update.get("faults") or []:
+                store.append(run_id, source_code_path, test_code_path, fault)
+                count += 1
 
-        records.append(FaultRecord(
-            source_code_path=str(source_code_path),
-            diff=diff,
-            is_equivalent=is_equivalent,
-            reason=reason,
-        ))
+                # デバッグ用に結果を表示
+                print("###")
+                print("source_code_path:", source_code_path)
+                print("is_equivalent:", fault['is_equivalent'])
+                print("diff:")
+                print(fault['diff'])
+                print("reason:")
+                print(fault['reason'])
 
-        # デバッグ用に結果を表示
-        print("###")
-        print("source_code_path:", source_code_path)
-        print("is_equivalent:", is_equivalent)
-        print("diff:")
-        print(diff)
-        print("reason:")
-        print(reason)
+    print("COMPLETED")
+    print(f"SAVED {count} faults to {store.path} (run_id: {run_id})")
 
-    with open("results/last_faults.json", "w") as f:
-        json.dump(records, f, indent=4)
-    
-    print("SAVED")
+    # Gradleの実行時間を表示
+    print(repository.runner.report())
+    # LLMの呼び出しの統計を表示
+    print(get_default_scheduler().report())
+    print(llm_cache.report())
+    repository.runner.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,74 @@
+import asyncio
+import os
+from graphs.fault_generator_batch_graph import build_fault_generator_batch_graph, initial_batch_state
+from utils.credentials import get_default_credentials, get_replay_credentials
+from utils.llm import get_bedrock_llm
+from utils.repository import Repository, WorktreePool
+from utils.gradle_runner import DaemonGradleRunner
+from utils.test_outcome_cache import TestOutcomeCache
+from utils.kill_history import KillMatrix
+from utils.llm_scheduler import get_default_scheduler
+from utils.llm_response_cache import LLMResponseCache, REPLAY, set_default_response_cache
+from pathlib import Path
+from utils.fault_store import FaultStore
+
+
+# 同時に処理するファイルの数（worktreeの数）
+MAX_CONCURRENCY = 4
+# 元のソースコードでのテストの実行時間に対する、MUTANTのテストのタイムアウトの倍率
+TIMEOUT_FACTOR = 3.0
+# 等価性の判定を分割する、1回のLLMの呼び出しあたりのDIFFの数
+EQUIVALENCE_SHARD_SIZE = 8
+
+
+async def main():
+    # LLMの応答のキャッシュ（off, record, replay）。既定はoffで、LLM_CACHE_MODEを指定した場合のみ使う。replayの場合はBedrockを呼び出さない
+    llm_cache = LLMResponseCache(mode=os.environ.get("LLM_CACHE_MODE", "off"))
+    set_default_response_cache(llm_cache)
+
+    credentials = get_replay_credentials() if llm_cache.mode == REPLAY else get_default_credentials()
+    llm = get_bedrock_llm(credentials)
+
+    repository = Repository(Path("repositories/kotlin-math-utils"), runner=DaemonGradleRunner())
+    repository.clean()
+
+    global_state = initial_batch_state(repository)
+    for target in global_state["targets"]:
+        print("target:", target["source_code_path"], "<->", target["test_code_path"])
+
+    # FAULTはファイルごとの処理が終わるたびに保存する
+    with FaultStore() as store, WorktreePool(repository, MAX_CONCURRENCY) as pool:
+        run_id = store.start_run()
+        print("run_id:", run_id)
+
+        graph = build_fault_generator_batch_graph(llm, pool, targeted_tests=True, schemata=True, cache=TestOutcomeCache(), fail_fast=True, kill_history=KillMatrix(), timeout_factor=TIMEOUT_FACTOR, equivalence_shard_size=EQUIVALENCE_SHARD_SIZE)
+
+        count = 0
+        files = 0
+        async for update in graph.astream(global_state, stream_mode="updates"):
+            for file_faults in update.get("generate_faults", {}).get("results") or []:
+                files += 1
+                source_code_path = file_faults["source_code_path"]
+                if file_faults["error"] is not None:
+                    print("###")
+                    print("source_code_path:", source_code_path)
+                    print("error:", file_faults["error"])
+                    continue
+
+                for fault in file_faults["faults"]:
+                    store.append(run_id, source_code_path, file_faults["test_code_path"], fault)
+                    count += 1
+
+    print("COMPLETED")
+    print(f"SAVED {count} faults from {files} files to {store.path} (run_id: {run_id})")
+
+    # Gradleの実行時間を表示
+    print(repository.runner.report())
+    # LLMの呼び出しの統計を表示
+    print(get_default_scheduler().report())
+    print(llm_cache.report())
+    repository.runner.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,14 +1,25 @@
 import asyncio
 import json
+import os
 from graphs.testcode_generator_graph import build_test_generator_graph, initial_state
-from utils.credentials import get_default_credentials
+from utils.credentials import get_default_credentials, get_replay_credentials
 from utils.llm import get_bedrock_llm
 from utils.repository import Repository
+from utils.gradle_runner import DaemonGradleRunner
+from utils.test_outcome_cache import TestOutcomeCache
+from utils.kill_history import KillMatrix
+from utils.llm_scheduler import get_default_scheduler
+from utils.fault_store import FaultStore
+from utils.llm_response_cache import LLMResponseCache, REPLAY, set_default_response_cache
 from pathlib import Path
 from typing import TypedDict, List, Optional
 from nodes.state import Fault
 
 
+# 元のソースコードでのテストの実行時間に対する、FAULTのテストのタイムアウトの倍率
+TIMEOUT_FACTOR = 3.0
+
+
 class CodeRecord(TypedDict):
     source_code_path: str
     diff: str
@@ -17,24 +28,29 @@ class CodeRecord(TypedDict):
 
 
 async def main():
-    credentials = get_default_credentials()
+    # LLMの応答のキャッシュ（off, record, replay）。既定はoffで、LLM_CACHE_MODEを指定した場合のみ使う。replayの場合はBedrockを呼び出さない
+    llm_cache = LLMResponseCache(mode=os.environ.get("LLM_CACHE_MODE", "off"))
+    set_default_response_cache(llm_cache)
+
+    credentials = get_replay_credentials() if llm_cache.mode == REPLAY else get_default_credentials()
     llm = get_bedrock_llm(credentials)
 
-    repository = Repository(Path("repositories/kotlin-math-utils"))
+    repository = Repository(Path("repositories/kotlin-math-utils"), runner=DaemonGradleRunner())
     repository.clean()
 
-    graph = build_test_generator_graph(llm, repository)
+    graph = build_test_generator_graph(llm, repository, targeted_tests=True, cache=TestOutcomeCache(), fail_fast=True, kill_history=KillMatrix(), timeout_factor=TIMEOUT_FACTOR)
     
     source_code_path = Path("repositories/kotlin-math-utils/src/main/kotlin/com/example/math/StatisticsCalculator.kt")
     test_code_path = Path("repositories/kotlin-math-utils/src/test/kotlin/com/example/math/StatisticsCalculatorTest.kt")
 
-    with open("results/last_faults.json") as f:
-        faults_json = json.load(f)
+    # 最後の実行で生成された、等価でないFAULTを読み込む
+    with FaultStore() as store:
+        run_id = store.latest_run_id()
         faults = [Fault(
             diff=fault['diff'],
             is_equivalent=fault['is_equivalent'],
             reason=fault['reason'],
-        ) for fault in faults_json if not fault['is_equivalent']]
+        ) for fault in store.iter_faults(run_id=run_id, source_code_path=source_code_path, is_equivalent=False)]
 
     if not faults:
         print("No faults found")
@@ -56,6 +72,13 @@ async def main():
 
     print("COMPLETED")
 
+    # Gradleの実行時間を表示
+    print(repository.runner.report())
+    # LLMの呼び出しの統計を表示
+    print(get_default_scheduler().report())
+    print(llm_cache.report())
+    repository.runner.close()
+
     # # 結果をファイルに保存
     # records = []
     # for fault in result['faults']:
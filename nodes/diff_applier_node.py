@@ -1,29 +1,94 @@
-from utils.diff_applier import apply_diff_to_file_for_mutant
+from utils.diff_applier import apply_diff_for_mutant, apply_diffs_for_mutant
+from utils.prepared_source import PreparedSource
+from utils.mutant_diff_generator import iter_mutant_diffs
+from utils.mutant_schemata import MutantSchema, build_mutant_schema, MUTANT_ID_ENV
 from .state import GlobalState
 from pathlib import Path
 from typing_extensions import TypedDict
-from utils.repository import Repository
-import shutil
+from utils.repository import Repository, WorktreePool, get_test_class_name
 import hashlib
 import difflib
-from typing import List
+from typing import Dict, List, Optional
+from utils.test_outcome_cache import TestOutcomeCache
+from utils.test_results import TestFailure, TestReport, TestTimeout
+from utils.kill_history import KillHistory, mutant_hash
+from utils.mutant_deduplicator import MutantDeduplicator
+import asyncio
+import subprocess
 
 
 class LocalState(TypedDict):
     source_code_path: Path
+    test_code_path: Path
     diff: str
 
     @staticmethod
     def load_from(global_state: GlobalState) -> "LocalState":
         return LocalState(
             source_code_path=global_state["source_code_path"],
+            test_code_path=global_state["test_code_path"],
             diff=global_state["diff"],
         )
 
 
+class MutantContext(TypedDict):
+    """MUTANTの評価に共通する情報"""
+    source_code_path: Path
+    source_code: str
+    # MUTANTのDIFFの適用で共有する、前処理済みのソースコード
+    prepared_source: PreparedSource
+    test_code_path: Path
+    test_code: str
+    tests: Optional[List[str]]
+    # MUTANTごとのテストのタイムアウト（秒）。Noneの場合はタイムアウトしない
+    timeout: Optional[float]
+    # テストの結果のキャッシュのキーに使うHEADのtreeハッシュ。キャッシュを使わない場合はNone
+    tree_hash: Optional[str]
+
+
 class DiffApplierNode:
-    def __init__(self, repository: Repository):
+    def __init__(
+        self,
+        repository: Repository,
+        parallelism: int = 1,
+        targeted_tests: bool = False,
+        fallback_to_full_suite: bool = True,
+        schemata: bool = False,
+        cache: Optional[TestOutcomeCache] = None,
+        fail_fast: bool = False,
+        kill_history: Optional[KillHistory] = None,
+        timeout_factor: Optional[float] = None,
+        min_timeout: float = 30.0,
+        deduplicate: bool = True,
+    ):
+        """
+        Args:
+            repository: テスト対象のリポジトリ
+            parallelism: MUTANTを同時に評価する数。2以上の場合はworktreeのプールで並列に評価する
+            targeted_tests: Trueの場合、test_code_pathのテストクラスのみを実行する
+            fallback_to_full_suite: targeted_testsで一致するテストがない場合に全てのテストを実行するかどうか
+            schemata: Trueの場合、全てのMUTANTを1つのスキーマにまとめて1回だけコンパイルし、
+                実行時にMUTANTを切り替えてテストする。スキーマにできないMUTANTは個別に評価する
+            cache: テストの結果のキャッシュ。指定した場合、同じMUTANTのテストを省略する
+            fail_fast: Trueの場合、MUTANTのテストを最初に失敗したテストで止める
+            kill_history: MUTANTを検出したテストの履歴。指定した場合、検出した回数の多いテストを先に実行する
+            timeout_factor: 指定した場合、元のソースコードでのテストの実行時間のこの倍数をMUTANTのテストのタイムアウトにする。
+                タイムアウトしたMUTANT（無限ループなど）は検出されたものとみなす
+            min_timeout: タイムアウトの下限（秒）
+            deduplicate: Trueの場合、テストの前に全てのMUTANTをメモリ上で適用し、
+                重複したMUTANTと変更のないMUTANTを除く
+        """
         self.repository = repository
+        self.parallelism = parallelism
+        self.targeted_tests = targeted_tests
+        self.fallback_to_full_suite = fallback_to_full_suite
+        self.schemata = schemata
+        self.cache = cache
+        self.fail_fast = fail_fast
+        self.kill_history = kill_history
+        self.timeout_factor = timeout_factor
+        self.min_timeout = min_timeout
+        self.deduplicate = deduplicate
 
     async def process(self, global_state: GlobalState) -> GlobalState:
         state = LocalState.load_from(global_state)
@@ -32,12 +97,7 @@ class DiffApplierNode:
         return {**global_state, **result}
 
     async def _process(self, state: LocalState):
-        # リポジトリをクリーン
-        self.repository.clean()
-
-        source_code_path = state["source_code_path"]
-        source_code = source_code_path.read_text()
-        source_code_hash = self._get_code_hash(source_code)
+        context = self.prepare_context(state)
 
         diff = state["diff"]
 
@@ -46,63 +106,376 @@ class DiffApplierNode:
             f.write(diff)
 
         diff_mutants = self._extract_diff_mutants(diff)
+        if self.deduplicate:
+            diff_mutants = self._deduplicate(context, diff_mutants)
 
-        diff_faults = []
-        for diff_mutant in diff_mutants:
-            print("### APPLYING DIFF ###")
-            
-            # リポジトリをクリーン
-            print("CLEANING")
-            self.repository.clean()
-
-            # import pprint
-            # pprint.pprint(source_code_path)
-            # pprint.pprint(diff_mutant)
-            
-            mutated_path = apply_diff_to_file_for_mutant(
-                source_path=source_code_path,
-                diff=diff_mutant,
-            )
+        if self.schemata and 1 < len(diff_mutants):
+            results = await self._evaluate_with_schemata(context, diff_mutants)
+        else:
+            results = await self._evaluate_mutants(context, diff_mutants)
 
-            if mutated_path is None:
-                print("Failed to apply diff to file")
-                # print(diff_mutant)
-                continue
+        # 結果はMUTANTの順番を保つ
+        diff_faults = [diff_fault for diff_fault in results if diff_fault is not None]
+
+        if self.cache is not None:
+            print(self.cache.report())
+
+        return {
+            "diff_faults": diff_faults,
+        }
+
+    def prepare_context(self, state: LocalState) -> MutantContext:
+        """リポジトリをクリーンし、MUTANTの評価に共通する情報を作成します。
+
+        timeout_factorを指定した場合は、元のソースコードでテストを実行してタイムアウトを決めます。
+        """
+        # リポジトリをクリーン
+        self.repository.clean()
 
-            # コードに適用
-            shutil.copy(mutated_path, source_code_path)
+        source_code_path = state["source_code_path"]
+        test_code_path = state["test_code_path"]
+        source_code = source_code_path.read_text()
+        context = MutantContext(
+            source_code_path=source_code_path,
+            source_code=source_code,
+            prepared_source=PreparedSource(source_code),
+            test_code_path=test_code_path,
+            test_code=test_code_path.read_text(),
+            tests=[get_test_class_name(test_code_path)] if self.targeted_tests else None,
+            timeout=None,
+            # MUTANTごとにgitを実行しないように、1回だけ取得する
+            tree_hash=self.repository.tree_hash() if self.cache is not None else None,
+        )
+        if self.timeout_factor is not None:
+            context["timeout"] = self._measure_timeout(context)
+        return context
 
+    def _measure_timeout(self, context: MutantContext) -> Optional[float]:
+        """元のソースコードでテストを実行して実行時間を測り、MUTANTのテストのタイムアウトを決めます。
+
+        Returns:
+            タイムアウト（秒）。元のソースコードでテストが失敗した場合はNone
+        """
+        key = self._cache_key(self.repository, context, context["source_code"])
+        outcome = self.cache.get(key) if key is not None else None
+        if outcome is not None and outcome["passed"] and "elapsed" in outcome:
+            elapsed = outcome["elapsed"]
+        else:
+            print("MEASURING BASELINE")
+            report = self.repository.run_tests(tests=context["tests"], fallback_to_full_suite=self.fallback_to_full_suite)
+            if not report.is_success:
+                print("BASELINE FAILED: MUTANTS ARE TESTED WITHOUT TIMEOUT")
+                return None
+            elapsed = report.gradle_result.elapsed
+            if key is not None:
+                self.cache.put(key, True, elapsed=elapsed)
+
+        timeout = max(self.min_timeout, self.timeout_factor * elapsed)
+        print(f"BASELINE: {elapsed:.1f}s, TIMEOUT: {timeout:.1f}s")
+        return timeout
+
+    def _deduplicate(self, context: MutantContext, diff_mutants: List[str]) -> List[str]:
+        """全てのMUTANTをメモリ上で適用し、重複したMUTANTと変更のないMUTANTを除きます。
+
+        正規化したトークン列で比較するため、空白やコメントだけが異なるMUTANTも同じものとみなします。
+        適用できないMUTANTは評価時に失敗として扱われるため、そのまま残します。
+
+        Returns:
+            テストするMUTANTのdiffのリスト（diff_mutantsでの順番を保つ）
+        """
+        deduplicator = MutantDeduplicator(context["source_code"])
+        unique = []
+        for diff_mutant in diff_mutants:
             try:
-                # テストを実行. テストが失敗したら終了
-                print("TESTING")
-                self.repository.test()
-            except Exception as e:
-                print(f"SKIPPED: {e}")
+                mutated_code = apply_diff_for_mutant(context["prepared_source"], diff_mutant)
+            except ValueError:
+                unique.append(diff_mutant)
                 continue
+            if deduplicator.add(mutated_code):
+                unique.append(diff_mutant)
+
+        print(deduplicator.report())
+        return unique
+
+    async def _evaluate_mutants(self, context: MutantContext, diff_mutants: List[str]) -> List[Optional[str]]:
+        """MUTANTを1つずつ適用して評価します。parallelismが2以上の場合は並列に評価します。
+
+        Returns:
+            MUTANTごとの評価結果のリスト（diff_mutantsと同じ順番）
+        """
+        if 1 < self.parallelism and 1 < len(diff_mutants):
+            return await self._evaluate_in_worktrees(context, diff_mutants)
+
+        return [
+            self._evaluate_mutant(self.repository, context["source_code_path"], context, diff_mutant)
+            for diff_mutant in diff_mutants
+        ]
+
+    async def _evaluate_with_schemata(self, context: MutantContext, diff_mutants: List[str]) -> List[Optional[str]]:
+        """MUTANTのスキーマを1回だけコンパイルし、有効なMUTANTを切り替えながら評価します。
 
+        Args:
+            context: MUTANTの評価に共通する情報
+            diff_mutants: 評価するMUTANTのdiffのリスト
+
+        Returns:
+            MUTANTごとの評価結果のリスト（diff_mutantsと同じ順番）
+        """
+        source_code = context["source_code"]
+        results: List[Optional[str]] = [None] * len(diff_mutants)
+
+        mutated_codes: List[Optional[str]] = []
+        keys: List[Optional[str]] = []
+        for index, mutated_code in enumerate(apply_diffs_for_mutant(context["prepared_source"], diff_mutants)):
+            if mutated_code is None:
+                mutated_codes.append(None)
+                keys.append(None)
+                continue
+
+            # キャッシュ済みのMUTANTはスキーマに含めない
+            key = self._cache_key(self.repository, context, mutated_code)
+            outcome = self._cached(key)
+            if outcome is not None:
+                if outcome["passed"]:
+                    results[index] = self._to_diff_fault(source_code, outcome.get("formatted_code", mutated_code))
+                mutated_code = None
+
+            mutated_codes.append(mutated_code)
+            keys.append(key)
+
+        schema = build_mutant_schema(source_code, mutated_codes)
+        print(f"SCHEMATA: {len(schema.mutant_ids)} mutants, {len(schema.unsupported)} unsupported")
+
+        remaining = [index for index in schema.unsupported if mutated_codes[index] is not None]
+        if schema.mutant_ids and not self._run_schema(schema, context, mutated_codes, keys, results):
+            # スキーマがコンパイルできない場合などは全て個別に評価する
+            remaining = sorted(remaining + list(schema.mutant_ids.keys()))
+
+        if remaining:
+            evaluated = await self._evaluate_mutants(context, [diff_mutants[index] for index in remaining])
+            for index, result in zip(remaining, evaluated):
+                results[index] = result
+
+        return results
+
+    def _run_schema(
+        self,
+        schema: MutantSchema,
+        context: MutantContext,
+        mutated_codes: List[Optional[str]],
+        keys: List[Optional[str]],
+        results: List[Optional[str]],
+    ) -> bool:
+        """スキーマを適用してMUTANTごとにテストを実行し、resultsに結果を書き込みます。
+
+        Returns:
+            スキーマでの評価ができた場合はTrue、MUTANTを無効にした状態でテストが失敗した場合はFalse
+        """
+        print("### APPLYING SCHEMA ###")
+        with self.repository.swap(context["source_code_path"], schema.code):
             try:
-                # フォーマットを実行
-                print("FORMATTING")
-                self.repository.format()
+                # MUTANTを無効にした状態でコンパイルとテストを実行
+                print("TESTING SCHEMA")
+                self.repository.test(tests=context["tests"], fallback_to_full_suite=self.fallback_to_full_suite, env={MUTANT_ID_ENV: "0"})
             except Exception as e:
-                pass
+                print(f"SCHEMA FAILED: {e}")
+                return False
 
-            # 変更後のソースコードのハッシュ値を記録
-            mutated_code = mutated_path.read_text()
-            mutated_code_hash = self._get_code_hash(mutated_code)
-            if source_code_hash == mutated_code_hash:
-                print("SKIPPED: ソースコードが変更されていません")
-                continue
+            survivors = []
+            for index, mutant_id in schema.mutant_ids.items():
+                # コンパイル済みのスキーマに対してテストのみを再実行
+                print(f"MUTANT {mutant_id}")
+                if self._test(self.repository, context, keys[index], mutated_codes[index], env={MUTANT_ID_ENV: str(mutant_id)}, rerun=True):
+                    survivors.append(index)
 
-            print("DETECTED FAULT")
+        # 個別に評価する場合と同じFaultのdiffになるように、テストを通過したMUTANTをフォーマットする
+        for index in survivors:
+            with self.repository.swap(context["source_code_path"], mutated_codes[index]):
+                formatted_code = self._format(self.repository, context["source_code_path"], mutated_codes[index])
+            if keys[index] is not None:
+                self.cache.put(keys[index], True, formatted_code=formatted_code)
+            results[index] = self._to_diff_fault(context["source_code"], formatted_code)
 
-            # source_code_pathとmutated_pathのdiffを作り直す
-            new_diff = difflib.unified_diff(source_code.splitlines(), mutated_code.splitlines(), lineterm="")
-            diff_faults.append("\n".join(new_diff))
+        return True
 
-        return {
-            "diff_faults": diff_faults,
-        }
+    async def _evaluate_in_worktrees(self, context: MutantContext, diff_mutants: List[str]) -> List[Optional[str]]:
+        """worktreeのプールを使ってMUTANTを並列に評価します。
+
+        Args:
+            context: MUTANTの評価に共通する情報
+            diff_mutants: 評価するMUTANTのdiffのリスト
+
+        Returns:
+            MUTANTごとの評価結果のリスト（diff_mutantsと同じ順番）
+        """
+        size = min(self.parallelism, len(diff_mutants))
+        with WorktreePool(self.repository, size) as pool:
+            async def evaluate(diff_mutant: str) -> Optional[str]:
+                async with pool.lease() as repository:
+                    target_path = pool.translate(context["source_code_path"], repository)
+                    return await asyncio.to_thread(self._evaluate_mutant, repository, target_path, context, diff_mutant)
+
+            return await asyncio.gather(*[evaluate(diff_mutant) for diff_mutant in diff_mutants])
+
+    def _evaluate_mutant(self, repository: Repository, target_path: Path, context: MutantContext, diff_mutant: str) -> Optional[str]:
+        """MUTANTを1つ適用してテストを実行し、検出されなかった場合はFaultのdiffを返します。
+
+        Args:
+            repository: テストを実行するリポジトリ
+            target_path: MUTANTを書き込むリポジトリ内のパス
+            context: MUTANTの評価に共通する情報
+            diff_mutant: 適用するMUTANTのdiff
+
+        Returns:
+            テストが通過した（Faultとして検出された）場合は元のソースコードとのdiff、それ以外はNone
+        """
+        print("### APPLYING DIFF ###")
+
+        try:
+            # 直前のMUTANTがファイルに残っている場合があるため、元のソースコードに適用する
+            mutated_code = apply_diff_for_mutant(context["prepared_source"], diff_mutant)
+        except ValueError as e:
+            print(f"Failed to apply diff to file: {e}")
+            return None
+
+        return self.evaluate_mutated_code(repository, target_path, context, mutated_code)
+
+    def evaluate_mutated_code(self, repository: Repository, target_path: Path, context: MutantContext, mutated_code: str) -> Optional[str]:
+        """DIFFを適用済みのMUTANTのテストを実行し、検出されなかった場合はFaultのdiffを返します。
+
+        Args:
+            repository: テストを実行するリポジトリ
+            target_path: MUTANTを書き込むリポジトリ内のパス
+            context: MUTANTの評価に共通する情報
+            mutated_code: MUTANTを適用したソースコード
+
+        Returns:
+            テストが通過した（Faultとして検出された）場合は元のソースコードとのdiff、それ以外はNone
+        """
+        key = self._cache_key(repository, context, mutated_code)
+        outcome = self._cached(key)
+        if outcome is not None:
+            passed = outcome["passed"]
+            formatted_code = outcome.get("formatted_code", mutated_code)
+        else:
+            # MUTANTのファイルだけを置き換え、テストの後に元に戻す
+            with repository.swap(target_path, mutated_code):
+                passed = self._test(repository, context, key, mutated_code)
+                formatted_code = self._format(repository, target_path, mutated_code) if passed else mutated_code
+
+            if passed and key is not None:
+                self.cache.put(key, True, formatted_code=formatted_code)
+
+        if not passed:
+            return None
+
+        return self._to_diff_fault(context["source_code"], formatted_code)
+
+    def _format(self, repository: Repository, target_path: Path, mutated_code: str) -> str:
+        """テストを通過したMUTANTのファイルをフォーマットし、フォーマット後のソースコードを返します。
+
+        フォーマットは他のファイルも変更する場合があるため、MUTANTのファイル以外の変更されたファイルを元に戻します。
+        MUTANTのファイルはswapの終了時に元に戻ります。
+        """
+        try:
+            print("FORMATTING")
+            repository.format()
+        except Exception as e:
+            pass
+
+        formatted_code = target_path.read_text()
+        repository.restore_changed_files(keep=[target_path])
+        return formatted_code
+
+    def _cache_key(self, repository: Repository, context: MutantContext, mutated_code: str) -> Optional[str]:
+        if self.cache is None:
+            return None
+        return self.cache.key(repository, {
+            self.repository.relative_path(context["source_code_path"]): mutated_code,
+            self.repository.relative_path(context["test_code_path"]): context["test_code"],
+        }, context["tests"], tree_hash=context["tree_hash"])
+
+    def _cached(self, key: Optional[str]) -> Optional[dict]:
+        """キャッシュされたテストの結果を返します。キャッシュがない場合はNone"""
+        if key is None:
+            return None
+        outcome = self.cache.get(key)
+        if outcome is None:
+            return None
+        print(f"CACHED: {'PASSED' if outcome['passed'] else 'FAILED'}")
+        return outcome
+
+    def _test(
+        self,
+        repository: Repository,
+        context: MutantContext,
+        key: Optional[str],
+        mutated_code: str,
+        env: Optional[Dict[str, str]] = None,
+        rerun: bool = False,
+    ) -> bool:
+        """テストを実行し、成功した場合はTrueを返します。keyを指定した場合は結果をキャッシュします。
+
+        タイムアウトした場合は検出されたものとみなしてFalseを返します。
+
+        kill_historyを指定した場合は、テストケースごとの結果をMUTANTのハッシュ値とともに記録します。
+        """
+        source = str(self.repository.relative_path(context["source_code_path"]))
+        priority_tests = self.kill_history.priority_tests(source) if self.kill_history is not None else None
+        try:
+            # テストを実行. テストが失敗したら終了
+            print("TESTING")
+            report = repository.test(
+                tests=context["tests"],
+                fallback_to_full_suite=self.fallback_to_full_suite,
+                env=env,
+                rerun=rerun,
+                fail_fast=self.fail_fast,
+                priority_tests=priority_tests,
+                timeout=context["timeout"],
+            )
+        except TestTimeout as e:
+            # 終わらないテストは、MUTANTを検出したものとみなす。
+            # タイムアウトは負荷やタイムアウトの設定によって変わるため、キャッシュしない
+            print(f"TIMED OUT: {e}")
+            return False
+        except Exception as e:
+            print(f"SKIPPED: {e}")
+            # JUnit XMLのレポートから、MUTANTを検出したテストケースを記録する
+            failed_tests = []
+            if isinstance(e, TestFailure):
+                failed_tests = e.report.failed_tests
+                self._record_kills(source, mutated_code, e.report)
+            # Gradleが起動できないなどのテスト以外の失敗はキャッシュしない
+            if key is not None and isinstance(e, subprocess.CalledProcessError):
+                self.cache.put(key, False, failed_tests=failed_tests)
+            return False
+
+        self._record_kills(source, mutated_code, report)
+        if key is not None:
+            self.cache.put(key, True)
+        return True
+
+    def _record_kills(self, source: str, mutated_code: str, report: Optional[TestReport]):
+        if self.kill_history is not None and isinstance(report, TestReport):
+            self.kill_history.record(source, mutant_hash(mutated_code), report.cases)
+
+    def _to_diff_fault(self, source_code: str, mutated_code: str) -> Optional[str]:
+        """テストを通過したMUTANTから、元のソースコードとのdiffを作成します。
+
+        Returns:
+            元のソースコードとのdiff。ソースコードが実質的に変更されていない場合はNone
+        """
+        # 変更後のソースコードのハッシュ値を記録
+        if self._get_code_hash(source_code) == self._get_code_hash(mutated_code):
+            print("SKIPPED: ソースコードが変更されていません")
+            return None
+
+        print("DETECTED FAULT")
+
+        # source_code_pathとmutated_pathのdiffを作り直す
+        new_diff = difflib.unified_diff(source_code.splitlines(), mutated_code.splitlines(), lineterm="")
+        return "\n".join(new_diff)
 
     def _get_code_hash(self, code: str) -> str:
         without_comments = "\n".join([line for line in code.splitlines() if not line.strip().startswith("//")])
@@ -122,69 +495,5 @@ class DiffApplierNode:
                       - 他のMUTANTブロックは全てSKIPに置換される
                       - 変更前のコードが先に出力され、その後に変更後のコードが出力される
         """
-        # MUTANTタグの数をチェック
-        if diff.count("MUTANT <START>") == 0:
-            return []
-
-        # MUTANTブロックの位置を特定
-        def find_all_indexes(text: str, pattern: str, start: int = 0) -> List[int]:
-            """文字列内の全てのパターンの位置を取得します"""
-            indexes = []
-            while True:
-                index = text.find(pattern, start)
-                if index == -1:
-                    break
-                indexes.append(index)
-                start = index + len(pattern)
-            return indexes
-
-        # 全てのSTARTタグの位置を取得
-        start_indexes = find_all_indexes(diff, "MUTANT <START>")
-        print(f"start_indexes: {start_indexes}")
-
-        # 各STARTタグに対応する終了位置と終了タイプを特定
-        end_indexes = []
-        for start in start_indexes:
-            current_pos = start + len("MUTANT <START>")
-            next_start = diff.find("MUTANT <START>", current_pos)
-            next_end = diff.find("MUTANT <END>", current_pos)
-
-            # 終了タイプを決定（END/START/EOF）
-            if next_start == -1 and next_end == -1:
-                # 次のタグが見つからない場合はEOFまで
-                end = len(diff)
-                end_type = "EOF"
-            elif next_start == -1 or (next_end != -1 and next_end < next_start):
-                # ENDタグが先に見つかった場合
-                end = next_end + len("MUTANT <END>")
-                end_type = "END"
-            else:
-                # STARTタグが先に見つかった場合
-                end = next_start + len("MUTANT <START>")
-                end_type = "START"
-            
-            end_indexes.append((end, end_type))
-
-        # 各MUTANTブロックのdiffを生成
-        final_diffs = []
-        for start, (end, end_type) in zip(start_indexes, end_indexes):
-            # 前のブロックをSKIPに置換
-            before = diff[:start].replace("MUTANT <START>", "MUTANT <SKIP>").replace("MUTANT <END>", "MUTANT <SKIP>")
-
-            # 終了タイプに応じてブロックを処理
-            if end_type == "END":
-                # ENDで終了する場合は、そのまま使用
-                mutant = diff[start:end]
-            elif end_type == "START":
-                # STARTで終了する場合は、STARTをENDに置換
-                mutant = diff[start:end-len("MUTANT <START>")] + "MUTANT <END>"
-            else:  # EOF
-                # EOFで終了する場合は、残り全てを使用
-                mutant = diff[start:]
-
-            # 後続のブロックをSKIPに置換
-            after = diff[end:].replace("MUTANT <START>", "MUTANT <SKIP>").replace("MUTANT <END>", "MUTANT <SKIP>")
-
-            final_diffs.append(before + mutant + after)
-
-        return final_diffs
+        # スキーマや並列評価では全てのMUTANTが必要になるため、ここでリストにする
+        return list(iter_mutant_diffs(diff))
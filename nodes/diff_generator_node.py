@@ -1,9 +1,12 @@
 from utils.single_tool_caller import SingleToolCaller
 from tools.apply_to_file import apply_to_file
 from langchain_core.prompts import ChatPromptTemplate
+from utils.llm import cached_message
 from .state import GlobalState
 from typing_extensions import TypedDict
 from textwrap import dedent
+from typing import AsyncIterator
+from utils.mutant_diff_generator import MutantDiffStream
 
 
 class LocalState(TypedDict):
@@ -42,7 +45,8 @@ CLASS_UNDER_TEST:
 {class_under_test}
 ```
             """).strip()),
-            ("user", dedent("""
+            # クラスとテストクラスは同じファイルの呼び出しで変わらないため、ここまでをキャッシュする
+            cached_message(llm, "user", dedent("""
 EXISTING_TEST_CLASS:
 ```kotlin
 {existing_test_class}
@@ -56,15 +60,18 @@ EXISTING_TEST_CLASS:
         result = result if result is not None else {}
         return {**global_state, **result}
 
+    def _invoke_args(self, state: LocalState) -> dict:
+        return {
+            "class_under_test": state["source_code"],
+            "existing_test_class": state["test_code"],
+            "source_file_name": state["source_file_name"],
+            "test_file_name": state["test_file_name"],
+        }
+
     async def _process(self, state: LocalState):
         diff = await self.caller.call(
             prompt_template=self.prompt_template,
-            invoke_args={
-                "class_under_test": state["source_code"],
-                "existing_test_class": state["test_code"],
-                "source_file_name": state["source_file_name"],
-                "test_file_name": state["test_file_name"],
-            }
+            invoke_args=self._invoke_args(state),
         )
 
         diff = self._rearrange_diff(diff)
@@ -77,6 +84,37 @@ EXISTING_TEST_CLASS:
             "diff": diff,
         }
 
+    async def stream_mutant_diffs(self, global_state: GlobalState) -> AsyncIterator[str]:
+        """DIFFを生成しながら、完成したMUTANTブロックのDIFFを順に返します。
+
+        LLMがENDタグまで出力したMUTANTは、DIFF全体の生成を待たずに返すため、
+        利用側は後のMUTANTの生成中に先のMUTANTのテストを始められます。
+
+        Args:
+            global_state: グラフの状態
+
+        Returns:
+            MUTANTごとのDIFF（DiffApplierNodeの_extract_diff_mutantsと同じ形式）のイテレーター
+        """
+        state = LocalState.load_from(global_state)
+        stream = MutantDiffStream(self._rearrange_diff)
+
+        diff = ""
+        async for diff in self.caller.stream(
+            prompt_template=self.prompt_template,
+            invoke_args=self._invoke_args(state),
+            argument="diff",
+        ):
+            for diff_mutant in stream.feed(diff):
+                yield diff_mutant
+
+        # デバッグ用にdiffを保存
+        with open("debug/last_diff_generator.diff", "w") as f:
+            f.write(self._rearrange_diff(diff))
+
+        for diff_mutant in stream.finish(diff):
+            yield diff_mutant
+
     def _rearrange_diff(self, diff: str) -> str:
         difflines = diff.splitlines()
 
@@ -85,7 +123,7 @@ EXISTING_TEST_CLASS:
             if "// MUTANT <START>" in difflines[index]:
                 comment_line = difflines[index]
                 i = index
-                while True:
+                while 0 < i:
                     if not (difflines[i - 1].startswith("-") or not difflines[i - 1].strip()):
                         break
                     difflines[i] = difflines[i - 1]
@@ -97,7 +135,8 @@ EXISTING_TEST_CLASS:
             if "// MUTANT <END>" in difflines[index]:
                 comment_line = difflines[index]
                 i = index
-                while True:
+                # 生成途中のDIFFではENDタグが最後の行になる場合がある
+                while i + 1 < len(difflines):
                     if not (difflines[i + 1].startswith("-") or not difflines[i + 1].strip()):
                         break
                     difflines[i] = difflines[i + 1]
@@ -2,13 +2,16 @@ from utils.diff_applier import apply_diff_to_file
 from .state import GlobalState
 from pathlib import Path
 from typing_extensions import TypedDict
-from utils.repository import Repository
+from utils.repository import Repository, get_test_class_name
 import shutil
 import hashlib
 import difflib
-from typing import List
+from typing import List, Optional
+from utils.test_outcome_cache import TestOutcomeCache
+from utils.test_results import TestFailure, TestReport, TestTimeout
+from utils.kill_history import KillHistory, mutant_hash
+import subprocess
 from nodes.state import Fault
-import tempfile
 
 
 class LocalState(TypedDict):
@@ -28,8 +31,39 @@ class LocalState(TypedDict):
 
 
 class DiffTestApplierNode:
-    def __init__(self, repository: Repository):
+    def __init__(
+        self,
+        repository: Repository,
+        targeted_tests: bool = False,
+        fallback_to_full_suite: bool = True,
+        cache: Optional[TestOutcomeCache] = None,
+        fail_fast: bool = False,
+        kill_history: Optional[KillHistory] = None,
+        timeout_factor: Optional[float] = None,
+        min_timeout: float = 30.0,
+    ):
+        """
+        Args:
+            repository: テスト対象のリポジトリ
+            targeted_tests: Trueの場合、test_code_pathのテストクラスのみを実行する
+            fallback_to_full_suite: targeted_testsで一致するテストがない場合に全てのテストを実行するかどうか
+            cache: テストの結果のキャッシュ。指定した場合、同じソースコードとテストコードの組み合わせのテストを省略する
+            fail_fast: Trueの場合、最初に失敗したテストでテストを止める
+            kill_history: FAULTを検出したテストの履歴。指定した場合、検出した回数の多いテストを先に実行する
+            timeout_factor: 指定した場合、元のソースコードでのテストの実行時間のこの倍数をFAULTのテストのタイムアウトにする。
+                タイムアウトしたFAULTは検出されたものとみなす
+            min_timeout: タイムアウトの下限（秒）
+        """
         self.repository = repository
+        self.targeted_tests = targeted_tests
+        self.fallback_to_full_suite = fallback_to_full_suite
+        self.cache = cache
+        self.fail_fast = fail_fast
+        self.kill_history = kill_history
+        self.timeout_factor = timeout_factor
+        self.min_timeout = min_timeout
+        # 直前に_testで実行した（またはキャッシュにあった）テストの実行時間（秒）
+        self._last_elapsed: Optional[float] = None
 
     async def process(self, global_state: GlobalState) -> GlobalState:
         state = LocalState.load_from(global_state)
@@ -44,6 +78,7 @@ class DiffTestApplierNode:
         source_code_path = state["source_code_path"]
         test_code_path = state["test_code_path"]
         faults = state["faults"]
+        tests = [get_test_class_name(test_code_path)] if self.targeted_tests else None
 
         # テストコードの変更
         mutated_path = apply_diff_to_file(
@@ -59,45 +94,122 @@ class DiffTestApplierNode:
 
         print("TEST APPLIED")
 
-        try:
-            # テストを実行. テストが失敗したら終了
-            print("TESTING ON ORIGINAL")
-            self.repository.test()
-        except Exception as e:
-            print(f"FAILED TEST: {e}")
-            return None
-        
-        with tempfile.TemporaryDirectory() as temp_dir:
-            temp_source_code_path = Path(temp_dir) / source_code_path.name
-            shutil.copy(source_code_path, temp_source_code_path)
-
-            # Faultsの埋め込み
-            for fault in faults:
-                mutated_source_path = apply_diff_to_file(
-                    source_path=source_code_path,
-                    diff=fault["diff"],
-                )
-
-                if mutated_source_path is None:
-                    print("Failed to apply diff to source code")
-                    return None
+        source_code = source_code_path.read_text()
+        test_code = test_code_path.read_text()
 
-                # コードに適用
-                shutil.copy(mutated_source_path, source_code_path)
-
-                try:
-                    # テストを実行. テストが失敗したら終了
-                    print("TESTING ON FAULT")
-                    self.repository.test()
+        # テストを実行. テストが失敗したら終了
+        print("TESTING ON ORIGINAL")
+        if not self._test(source_code_path, source_code, test_code_path, test_code, tests, compile_first=True):
+            return None
 
+        timeout = None
+        if self.timeout_factor is not None and self._last_elapsed is not None:
+            timeout = max(self.min_timeout, self.timeout_factor * self._last_elapsed)
+            print(f"BASELINE: {self._last_elapsed:.1f}s, TIMEOUT: {timeout:.1f}s")
+        
+        # Faultsの埋め込み
+        for fault in faults:
+            mutated_source_path = apply_diff_to_file(
+                source_path=source_code_path,
+                diff=fault["diff"],
+            )
+
+            if mutated_source_path is None:
+                print("Failed to apply diff to source code")
+                return None
+
+            # ソースコードだけを置き換え、テストの後に元に戻す
+            mutated_source_code = mutated_source_path.read_text()
+            with self.repository.swap(source_code_path, mutated_source_code):
+                # テストを実行. テストが成功したら終了
+                print("TESTING ON FAULT")
+                if self._test(source_code_path, mutated_source_code, test_code_path, test_code, tests, prioritize=True, timeout=timeout):
                     print(f"Test passed as unexpected (fault not detected)")
                     return None
-                except Exception as e:
-                    print("Test failed as expected (fault detected)")
 
-                # コードを元に戻す
-                shutil.copy(temp_source_code_path, source_code_path)
-        
+            print("Test failed as expected (fault detected)")
+
         print("ALL FAULTS DETECTED")
         
         return None
+
+    def _test(self, source_code_path: Path, source_code: str, test_code_path: Path, test_code: str, tests: Optional[List[str]], compile_first: bool = False, prioritize: bool = False, timeout: Optional[float] = None) -> bool:
+        """テストを実行し、成功した場合はTrueを返します。キャッシュがあればテストを省略します。
+
+        Args:
+            source_code_path: ソースコードのパス
+            source_code: リポジトリに適用済みのソースコード
+            test_code_path: テストコードのパス
+            test_code: リポジトリに適用済みのテストコード
+            tests: 実行するテストのフィルタ
+            compile_first: Trueの場合、先にコンパイルだけを行い、コンパイルできなければテストを実行しない
+            prioritize: Trueの場合、FAULTを検出した回数の多いテストを先に実行し、テストケースごとの結果を記録する
+            timeout: テストのタイムアウト（秒）。タイムアウトした場合はテストが失敗したものとみなす
+
+        Returns:
+            テストが成功した場合はTrue
+        """
+        self._last_elapsed = None
+        key = None
+        if self.cache is not None:
+            key = self.cache.key(self.repository, {
+                self.repository.relative_path(source_code_path): source_code,
+                self.repository.relative_path(test_code_path): test_code,
+            }, tests)
+            outcome = self.cache.get(key)
+            if outcome is not None:
+                print(f"CACHED: {'PASSED' if outcome['passed'] else 'FAILED'}")
+                self._last_elapsed = outcome.get("elapsed")
+                return outcome["passed"]
+
+        if compile_first:
+            compile_result = self.repository.compile_tests()
+            if not compile_result.is_success:
+                print("FAILED COMPILE:")
+                print(compile_result.summary(test_code_path))
+                # エラーを解析できない場合はGradleの起動の失敗などの可能性があるため、キャッシュしない
+                if key is not None and compile_result.errors:
+                    self.cache.put(key, False, compile_errors=[str(error) for error in compile_result.errors])
+                return False
+
+        source = str(self.repository.relative_path(source_code_path))
+        priority_tests = None
+        if prioritize and self.kill_history is not None:
+            priority_tests = self.kill_history.priority_tests(source)
+
+        try:
+            report = self.repository.test(
+                tests=tests,
+                fallback_to_full_suite=self.fallback_to_full_suite,
+                fail_fast=self.fail_fast,
+                priority_tests=priority_tests,
+                timeout=timeout,
+            )
+        except TestTimeout as e:
+            # タイムアウトは負荷やタイムアウトの設定によって変わるため、キャッシュしない
+            print(f"TIMED OUT: {e}")
+            return False
+        except Exception as e:
+            print(f"FAILED TEST: {e}")
+            # JUnit XMLのレポートから、FAULTを検出したテストケースを記録する
+            failed_tests = []
+            if isinstance(e, TestFailure):
+                failed_tests = e.report.failed_tests
+                if prioritize:
+                    self._record_kills(source, source_code, e.report)
+            # Gradleが起動できないなどのテスト以外の失敗はキャッシュしない
+            if key is not None and isinstance(e, subprocess.CalledProcessError):
+                self.cache.put(key, False, failed_tests=failed_tests)
+            return False
+
+        if prioritize:
+            self._record_kills(source, source_code, report)
+        if report.gradle_result is not None:
+            self._last_elapsed = report.gradle_result.elapsed
+        if key is not None:
+            self.cache.put(key, True, elapsed=self._last_elapsed)
+        return True
+
+    def _record_kills(self, source: str, source_code: str, report: Optional[TestReport]):
+        if self.kill_history is not None and isinstance(report, TestReport):
+            self.kill_history.record(source, mutant_hash(source_code), report.cases)
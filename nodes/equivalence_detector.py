@@ -1,11 +1,15 @@
 from utils.single_tool_caller import SingleToolCaller
 from tools.output_equivalence import output_equivalence
 from langchain_core.prompts import ChatPromptTemplate
-from .state import GlobalState
+from utils.llm import cached_message
+from .state import Fault, GlobalState
 from typing_extensions import TypedDict
+from utils.diff_applier import apply_unified_diff
+from utils.kotlin_tokens import token_hash
 from textwrap import dedent
+import asyncio
 import json
-from typing import List
+from typing import Dict, List, Optional
 
 
 class LocalState(TypedDict):
@@ -21,7 +25,27 @@ class LocalState(TypedDict):
 
 
 class EquivalenceDetectorNode:
-    def __init__(self, llm):
+    def __init__(
+        self,
+        llm,
+        shard_size: Optional[int] = None,
+        max_shard_chars: int = 20000,
+        max_retries: int = 2,
+        syntactic_prefilter: bool = True,
+    ):
+        """
+        Args:
+            llm: LLM
+            shard_size: 指定した場合、1回の呼び出しで判定するDIFFの数の上限。DIFFを分割して同時に判定する
+            max_shard_chars: shard_sizeを指定した場合の、1回の呼び出しに含めるDIFFの合計の文字数の上限
+            max_retries: 結果が返ってこなかったDIFFを判定し直す回数
+            syntactic_prefilter: Trueの場合、正規化したトークン列が元のソースコードと一致するDIFFを
+                LLMを呼び出さずに等価と判定する
+        """
+        self.shard_size = shard_size
+        self.syntactic_prefilter = syntactic_prefilter
+        self.max_shard_chars = max_shard_chars
+        self.max_retries = max_retries
         self.caller = SingleToolCaller(llm, output_equivalence)
         self.prompt_template = ChatPromptTemplate.from_messages([
             ("system", dedent("""
@@ -33,8 +57,10 @@ For each DIFF, determine if applying these changes results in a class that behav
 For each DIFF, output:
 - 'True' if the changes are equivalent
 - 'False' if the changes are not equivalent, and explain how execution of the original version can produce a different behavior compared to the modified version.
+Output exactly one result for every DIFF, with the index number N of its "DIFF #N" header.
             """).strip()),
-            ("user", dedent("""
+            # 元のクラスはシャードや再試行の呼び出しで変わらないため、ここまでをキャッシュする
+            cached_message(llm, "user", dedent("""
 SOURCE_CODE:
 ```kotlin
 {source_code}
@@ -52,18 +78,118 @@ SOURCE_CODE:
         return {**global_state, **result}
 
     async def _process(self, state: LocalState):
-        source_code = state["source_code"]
-        diff_faults = state["diff_faults"]
+        return {
+            "faults": await self.detect(state["source_code"], state["diff_faults"]),
+        }
+
+    async def detect(self, source_code: str, diff_faults: List[str]) -> List[Fault]:
+        """FAULTのdiffごとに、元のソースコードと等価かどうかを判定します。
 
+        syntactic_prefilterがTrueの場合、空白、コメント、書式、リテラルの書き方だけを変更したDIFFは
+        LLMを呼び出さずに等価と判定します。
+        shard_sizeを指定した場合は、DIFFを分割して同時に判定します。
+        結果はDIFFの番号で対応付け、結果が返ってこなかったDIFFは判定し直します。
+
+        Args:
+            source_code: 元のソースコード
+            diff_faults: FAULTのdiffのリスト
+
+        Returns:
+            diff_faultsと同じ順番のFAULTのリスト
+        """
         if not diff_faults:
-            return {
-                "faults": [],
-            }
+            return []
+
+        # DIFFの番号（1から始まる） -> 判定結果
+        verdicts: Dict[int, dict] = self._prefilter(source_code, diff_faults) if self.syntactic_prefilter else {}
+        pending = [index for index in range(1, len(diff_faults) + 1) if index not in verdicts]
+        for attempt in range(self.max_retries + 1):
+            if not pending:
+                break
+            if attempt:
+                print(f"EQUIVALENCE RETRY {attempt}: {len(pending)} diffs without result")
+            shards = self._shards(diff_faults, pending)
+            results = await asyncio.gather(*[
+                self._detect_shard(source_code, diff_faults, shard, shard_index)
+                for shard_index, shard in enumerate(shards)
+            ])
+            for result in results:
+                verdicts.update(result)
+            pending = [index for index in pending if index not in verdicts]
+
+        faults = []
+        for index, diff in enumerate(diff_faults, 1):
+            verdict = verdicts.get(index)
+            if verdict is None:
+                # 判定できなかったFAULTは、等価でない（テストで検出すべき）ものとして残す
+                print(f"EQUIVALENCE MISSING: DIFF #{index}")
+                verdict = {"is_equivalent": False, "reason": None}
+            faults.append({
+                "diff": diff,
+                "is_equivalent": verdict["is_equivalent"],
+                "reason": verdict["reason"],
+            })
 
+        return faults
+
+    def _prefilter(self, source_code: str, diff_faults: List[str]) -> Dict[int, dict]:
+        """正規化したトークン列が元のソースコードと一致するDIFFを、等価と判定します。
+
+        Returns:
+            DIFFの番号 -> 判定結果。トークン列が一致したDIFFのみを含む
+        """
+        # 元のソースコードの正規化は、DIFFごとに繰り返さない
+        source_hash = token_hash(source_code)
+        verdicts = {}
+        for index, diff in enumerate(diff_faults, 1):
+            try:
+                mutated_code = apply_unified_diff(source_code, diff)
+            except ValueError:
+                # 復元できないDIFFはLLMで判定する
+                continue
+            if token_hash(mutated_code) == source_hash:
+                verdicts[index] = {
+                    "is_equivalent": True,
+                    "reason": "The normalized token sequence is identical to the original (only whitespace, comments, formatting or literal notation changed).",
+                }
+
+        if verdicts:
+            print(f"EQUIVALENCE PREFILTER: {len(verdicts)} of {len(diff_faults)} diffs are token-identical")
+        return verdicts
+
+    def _shards(self, diff_faults: List[str], indexes: List[int]) -> List[List[int]]:
+        """DIFFの番号を、数と文字数の上限を超えないように分割します。"""
+        if self.shard_size is None:
+            return [indexes]
+
+        shards = []
+        shard = []
+        chars = 0
+        for index in indexes:
+            size = len(diff_faults[index - 1])
+            if shard and (self.shard_size <= len(shard) or self.max_shard_chars < chars + size):
+                shards.append(shard)
+                shard = []
+                chars = 0
+            shard.append(index)
+            chars += size
+        if shard:
+            shards.append(shard)
+        return shards
+
+    async def _detect_shard(self, source_code: str, diff_faults: List[str], indexes: List[int], shard_index: int = 0) -> Dict[int, dict]:
+        """指定した番号のDIFFを1回の呼び出しで判定します。
+
+        Args:
+            shard_index: シャードの番号。同時に判定するシャードのデバッグ用の出力を分けるために使う
+
+        Returns:
+            DIFFの番号 -> 判定結果。結果が返ってこなかった番号は含まない
+        """
         # Format diffs with index numbers
         diffs_with_index = "\n\n".join([
-            f"DIFF #{i}:\n```diff\n{diff}\n```"
-            for i, diff in enumerate(diff_faults, 1)
+            f"DIFF #{index}:\n```diff\n{diff_faults[index - 1]}\n```"
+            for index in indexes
         ])
 
         result_json = await self.caller.call(
@@ -75,20 +201,34 @@ SOURCE_CODE:
         )
 
         # デバッグ用に結果を保存
-        with open("debug/last_equivalence_detector.json", "w") as f:
+        with open(f"debug/last_equivalence_detector_{shard_index}.json", "w") as f:
             f.write(result_json)
 
-        result = json.loads(result_json)
+        try:
+            return self._parse_verdicts(result_json, indexes)
+        except (json.JSONDecodeError, KeyError, TypeError) as e:
+            # 壊れた出力は結果が返ってこなかったものとして扱い、判定し直す
+            print(f"EQUIVALENCE INVALID OUTPUT (shard {shard_index}): {e!r}")
+            return {}
 
-        faults = []
-        for i, diff in enumerate(diff_faults):
-            fault_result = result["results"][i]
-            faults.append({
-                "diff": diff,
-                "is_equivalent": fault_result["is_equivalent"],
-                "reason": fault_result["reason"],
-            })
+    def _parse_verdicts(self, result_json: str, indexes: List[int]) -> Dict[int, dict]:
+        """LLMの出力から、DIFFの番号ごとの判定結果を取り出します。出力が壊れている場合は例外を送出します。"""
+        results = json.loads(result_json)["results"]
+
+        verdicts = {}
+        if all("index" not in result for result in results):
+            # 番号のない結果（以前のスキーマ）は、数が一致する場合のみ順番で対応付ける
+            if len(results) == len(indexes):
+                verdicts = dict(zip(indexes, results))
+        else:
+            for result in results:
+                index = result.get("index")
+                if isinstance(index, str) and index.isdigit():
+                    index = int(index)
+                if index in indexes and index not in verdicts:
+                    verdicts[index] = result
 
         return {
-            "faults": faults,
+            index: {"is_equivalent": result["is_equivalent"], "reason": result.get("reason")}
+            for index, result in verdicts.items()
         }
@@ -0,0 +1,231 @@
+"""
+MUTANTの抽出から等価性の判定までを、非同期のパイプラインで処理するノード。
+
+DiffApplierNodeとEquivalenceDetectorNodeを順に実行すると、全てのMUTANTのテストが終わるまで
+等価性の判定が始まりません。このノードは以下の3つの段階を、上限のあるキューでつないで同時に実行します。
+
+1. 抽出: diffからMUTANTを1つずつ取り出し、ソースコードに適用する（重複したMUTANTと変更のないMUTANTは除く）。
+   diff_generatorを指定した場合は、LLMがdiffを生成しながらENDタグまで出力したMUTANTから順に取り出す。
+   diffの受信は、元のソースコードでのテストの実行時間の計測などの準備と同時に始める
+2. テスト: MUTANTのテストを実行する（parallelismが2以上の場合はworktreeごとに1つずつ。worktreeは必要になってから作成する）
+3. 等価性の判定: テストを通過したMUTANTをequivalence_batch_size個ずつLLMで判定する
+
+先に通過したMUTANTの等価性の判定が、後のMUTANTのGradleの実行と重なるため、全体の時間が短くなります。
+mutant schemataは全てのMUTANTを先にまとめる必要があるため、このノードでは使いません。
+"""
+
+from contextlib import nullcontext
+from nodes.diff_applier_node import DiffApplierNode, MutantContext
+from nodes.diff_generator_node import DiffGeneratorNode
+from nodes.equivalence_detector import EquivalenceDetectorNode
+from .state import Fault, GlobalState
+from pathlib import Path
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from typing_extensions import TypedDict
+from utils.diff_applier import apply_diff_for_mutant
+from utils.mutant_deduplicator import MutantDeduplicator
+from utils.mutant_diff_generator import iter_mutant_diffs, MUTANT_START_TAG
+from utils.repository import Repository, WorktreePool
+import asyncio
+
+
+class LocalState(TypedDict):
+    source_code_path: Path
+    test_code_path: Path
+    diff: str
+
+    @staticmethod
+    def load_from(global_state: GlobalState) -> "LocalState":
+        return LocalState(
+            source_code_path=global_state["source_code_path"],
+            test_code_path=global_state["test_code_path"],
+            # diff_generatorでdiffを生成しながら処理する場合、diffはまだない
+            diff=global_state.get("diff", ""),
+        )
+
+
+class FaultPipelineNode:
+    def __init__(
+        self,
+        diff_applier: DiffApplierNode,
+        equivalence_detector: EquivalenceDetectorNode,
+        queue_size: int = 4,
+        equivalence_batch_size: int = 4,
+        diff_generator: Optional[DiffGeneratorNode] = None,
+    ):
+        """
+        Args:
+            diff_applier: MUTANTのテストに使うノード（リポジトリ、キャッシュ、タイムアウトなどの設定を使う）
+            equivalence_detector: 等価性の判定に使うノード
+            queue_size: 段階の間のキューの上限。抽出がテストより先に進みすぎないようにする
+            equivalence_batch_size: 1回のLLMの呼び出しで等価性を判定するMUTANTの数
+            diff_generator: 指定した場合、状態のdiffの代わりに、このノードでdiffを生成しながらMUTANTを取り出す
+        """
+        self.diff_applier = diff_applier
+        self.equivalence_detector = equivalence_detector
+        self.queue_size = queue_size
+        self.equivalence_batch_size = equivalence_batch_size
+        self.diff_generator = diff_generator
+
+    async def process(self, global_state: GlobalState) -> GlobalState:
+        state = LocalState.load_from(global_state)
+        if self.diff_generator is not None:
+            result = await self._process(state, self.diff_generator.stream_mutant_diffs(global_state))
+        else:
+            result = await self._process(state)
+        result = result if result is not None else {}
+        return {**global_state, **result}
+
+    async def _process(self, state: LocalState, diff_mutants: Optional[AsyncIterator[str]] = None):
+        """
+        Args:
+            state: ノードの状態
+            diff_mutants: 生成中のdiffから取り出すMUTANTのdiff。Noneの場合は状態のdiffから取り出す
+        """
+        if diff_mutants is None:
+            diff = state["diff"]
+
+            # デバッグ用にdiffを保存
+            with open("debug/last_diff_applier.diff", "w") as f:
+                f.write(diff)
+
+            mutant_count = diff.count(MUTANT_START_TAG)
+            if mutant_count == 0:
+                return {
+                    "diff_faults": [],
+                    "faults": [],
+                }
+            diff_mutants = self._iterate(diff)
+        else:
+            # 生成が終わるまでMUTANTの数は分からない
+            mutant_count = self.diff_applier.parallelism
+
+        # worktreeはMUTANTのテストを始めるときに必要な数だけ作成する
+        size = min(self.diff_applier.parallelism, mutant_count)
+        pool = WorktreePool(self.diff_applier.repository, size, lazy=True) if 1 < size else None
+        with pool if pool is not None else nullcontext():
+            diff_faults, faults = await self._run_pipeline(state, diff_mutants, pool)
+
+        if self.diff_applier.cache is not None:
+            print(self.diff_applier.cache.report())
+
+        return {
+            "diff_faults": diff_faults,
+            "faults": faults,
+        }
+
+    async def _iterate(self, diff: str) -> AsyncIterator[str]:
+        for diff_mutant in iter_mutant_diffs(diff):
+            yield diff_mutant
+
+    async def _run_pipeline(
+        self,
+        state: LocalState,
+        diff_mutants: AsyncIterator[str],
+        pool: Optional[WorktreePool],
+    ) -> Tuple[List[str], List[Fault]]:
+        """MUTANTの評価の準備と3つの段階を同時に実行します。
+
+        Args:
+            state: ノードの状態
+            diff_mutants: MUTANTごとのdiff
+            pool: テストを実行するworktreeのプール。Noneの場合は元のリポジトリで1つずつテストする
+
+        Returns:
+            MUTANTの順番に並べたFAULTのdiffのリストとFAULTのリスト
+        """
+        # diffの生成を止めないように、準備ができるまで受け取ったdiffは上限なく溜める
+        received: asyncio.Queue[Optional[str]] = asyncio.Queue()
+        mutants: asyncio.Queue[Optional[Tuple[int, str]]] = asyncio.Queue(maxsize=self.queue_size)
+        survivors: asyncio.Queue[Optional[Tuple[int, str]]] = asyncio.Queue(maxsize=self.queue_size)
+        # MUTANTの番号 -> 結果。段階ごとに終わる順番が変わるため、最後に番号の順に並べる
+        diff_faults: Dict[int, str] = {}
+        faults: Dict[int, Fault] = {}
+        parallelism = pool.size if pool is not None else 1
+        deduplicator: Optional[MutantDeduplicator] = None
+
+        async def receive():
+            async for diff_mutant in diff_mutants:
+                await received.put(diff_mutant)
+            await received.put(None)
+
+        async def extract(context: MutantContext):
+            nonlocal deduplicator
+            deduplicator = MutantDeduplicator(context["source_code"])
+            index = -1
+            while (diff_mutant := await received.get()) is not None:
+                index += 1
+                # 大きなソースコードでは適用とトークン化に時間がかかるため、イベントループを止めないようにスレッドで行う
+                try:
+                    mutated_code = await asyncio.to_thread(apply_diff_for_mutant, context["prepared_source"], diff_mutant)
+                except ValueError as e:
+                    print(f"Failed to apply diff to file: {e}")
+                    continue
+                if self.diff_applier.deduplicate and not await asyncio.to_thread(deduplicator.add, mutated_code):
+                    continue
+                await mutants.put((index, mutated_code))
+            await mutants.put(None)
+
+        async def test(context: MutantContext, index: int, mutated_code: str):
+            print(f"### PIPELINE MUTANT {index} ###")
+            if pool is not None:
+                async with pool.lease() as repository:
+                    target_path = pool.translate(context["source_code_path"], repository)
+                    diff_fault = await asyncio.to_thread(self.diff_applier.evaluate_mutated_code, repository, target_path, context, mutated_code)
+            else:
+                repository = self.diff_applier.repository
+                diff_fault = await asyncio.to_thread(self.diff_applier.evaluate_mutated_code, repository, context["source_code_path"], context, mutated_code)
+            if diff_fault is not None:
+                diff_faults[index] = diff_fault
+                await survivors.put((index, diff_fault))
+
+        async def run_tests(context: MutantContext):
+            # 同時にテストするMUTANTをparallelism個までにし、抽出がテストより先に進みすぎないようにする
+            slots = asyncio.Semaphore(parallelism)
+
+            async def run_test(index: int, mutated_code: str):
+                try:
+                    await test(context, index, mutated_code)
+                finally:
+                    slots.release()
+
+            async with asyncio.TaskGroup() as group:
+                while (item := await mutants.get()) is not None:
+                    await slots.acquire()
+                    group.create_task(run_test(*item))
+            await survivors.put(None)
+
+        async def detect(context: MutantContext, batch: List[Tuple[int, str]]):
+            results = await self.equivalence_detector.detect(context["source_code"], [diff_fault for _, diff_fault in batch])
+            for (index, _), fault in zip(batch, results):
+                faults[index] = fault
+
+        async def detect_equivalence(context: MutantContext):
+            # 判定の呼び出しは待たずに次のバッチを集め、LLMの同時実行数はスケジューラーに任せる
+            async with asyncio.TaskGroup() as group:
+                batch = []
+                while (item := await survivors.get()) is not None:
+                    batch.append(item)
+                    if self.equivalence_batch_size <= len(batch):
+                        group.create_task(detect(context, batch))
+                        batch = []
+                if batch:
+                    group.create_task(detect(context, batch))
+
+        async def evaluate():
+            # 元のソースコードでのテストの実行時間の計測などは、イベントループを止めないようにスレッドで行う
+            context = await asyncio.to_thread(self.diff_applier.prepare_context, state)
+            async with asyncio.TaskGroup() as group:
+                group.create_task(extract(context))
+                group.create_task(run_tests(context))
+                group.create_task(detect_equivalence(context))
+
+        # diffの受信は準備と同時に始め、LLMの生成と元のソースコードでのテストの実行を重ねる
+        async with asyncio.TaskGroup() as group:
+            group.create_task(receive())
+            group.create_task(evaluate())
+
+        if self.diff_applier.deduplicate and deduplicator is not None:
+            print(deduplicator.report())
+        print(f"PIPELINE: {len(diff_faults)} survived, {len(faults)} judged")
+        return [diff_faults[index] for index in sorted(diff_faults)], [faults[index] for index in sorted(faults)]
@@ -1,4 +1,5 @@
-from typing import TypedDict, Optional, List
+from typing import TypedDict, Optional, List, Annotated
+import operator
 from pathlib import Path
 
 
@@ -19,6 +20,24 @@ class GlobalState(TypedDict):
     faults: Optional[List[Fault]] = None
 
 
+
+class FaultTarget(TypedDict):
+    source_code_path: Path
+    test_code_path: Path
+
+
+class FileFaults(TypedDict):
+    source_code_path: Path
+    test_code_path: Path
+    faults: List[Fault]
+    error: Optional[str] = None
+
+
+class BatchState(TypedDict):
+    targets: List[FaultTarget]
+    # 並列に実行した各ファイルの結果を結合する
+    results: Annotated[List[FileFaults], operator.add]
+
 def initial_global_state_for_faults(source_code_path: Path, test_code_path: Path) -> GlobalState:
     with open(source_code_path) as f:
         source_code = f.read()
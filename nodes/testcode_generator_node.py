@@ -1,6 +1,7 @@
 from utils.single_tool_caller import SingleToolCaller
 from tools.apply_to_file import apply_to_file
 from langchain_core.prompts import ChatPromptTemplate
+from utils.llm import cached_message
 from .state import GlobalState, Fault
 from typing_extensions import TypedDict
 from textwrap import dedent
@@ -41,7 +42,8 @@ ORIGINAL_CLASS:
 {original_class}
 ```
             """).strip()),
-            ("user", dedent("""
+            # DIFFS以外は同じファイルの呼び出しで変わらないため、ここまでをキャッシュする
+            cached_message(llm, "user", dedent("""
 EXISTING_TEST_CLASS:
 ```kotlin
 {existing_test_class}
@@ -1,11 +1,12 @@
 from utils.single_tool_caller import SingleToolCaller
 from tools.apply_to_file import apply_to_file
 from langchain_core.prompts import ChatPromptTemplate
+from utils.llm import cached_message
 from .state import GlobalState, Fault
 from typing_extensions import TypedDict
 from textwrap import dedent
 from typing import List
-from utils.repository import Repository
+from utils.repository import Repository, get_test_class_name
 from pathlib import Path
 from utils.diff_applier import apply_diff_to_file
 import difflib
@@ -32,9 +33,11 @@ class LocalState(TypedDict):
 
 class TestRewriteGeneratorNode:
 
-    def __init__(self, llm, repository: Repository):
+    def __init__(self, llm, repository: Repository, targeted_tests: bool = False, fallback_to_full_suite: bool = True):
         self.caller = SingleToolCaller(llm, apply_to_file)
         self.repository = repository
+        self.targeted_tests = targeted_tests
+        self.fallback_to_full_suite = fallback_to_full_suite
         self.prompt_template = ChatPromptTemplate.from_messages([
             ("system", dedent("""
 You are tasked with generating additional test cases for a Kotlin class. \
@@ -45,7 +48,8 @@ Your goal is to write new test cases that will fail specifically because of the
 Write an extended version of the test class that contains extra test cases that will fail on the mutant version of the class, but would pass on the correct version. \
 Finally, output the diff snippet showing the changes relative to the original code in Unified Diff format.
             """).strip()),
-            ("user", dedent("""
+            # 元のクラスは書き直しのたびに変わらないため、ここまでをキャッシュする
+            cached_message(llm, "user", dedent("""
 ORIGINAL_CLASS:
 ```kotlin
 {original_class}
@@ -109,14 +113,25 @@ Please output the diff snippet showing the changes relative to the current test
 
         print("TEST APPLIED")
 
-        # テストを実行. テストが失敗したら終了
-        print("TESTING ON ORIGINAL")
-        is_success, stdout, stderr = self.repository.test2()
-        if is_success:
-            print(f"OK TEST")
-            return None
-
-        print(f"NG TEST")
+        # 先にコンパイルだけを確認し、コンパイルできない場合はテストを実行せずにエラーを返す
+        print("COMPILING")
+        compile_result = self.repository.compile_tests()
+        if compile_result.is_success:
+            # テストを実行. テストが失敗したら終了
+            print("TESTING ON ORIGINAL")
+            tests = [get_test_class_name(test_code_path)] if self.targeted_tests else None
+            report = self.repository.run_tests(tests=tests, fallback_to_full_suite=self.fallback_to_full_suite)
+            if report.is_success:
+                print(f"OK TEST")
+                return None
+
+            print(f"NG TEST")
+            # 失敗したテストケースの要約だけをLLMに渡す
+            error_message = report.summary()
+        else:
+            print(f"NG COMPILE")
+            # テストコードのエラーだけをLLMに渡す
+            error_message = compile_result.summary(test_code_path)
 
         mutated_test_code = test_code_path.read_text()
 
@@ -132,7 +147,7 @@ Please output the diff snippet showing the changes relative to the current test
                 "diffs": diffs,
                 "suggested_test_code_diff": new_diff,
                 "current_test_class": mutated_test_code,
-                "error_message": stderr,
+                "error_message": error_message,
             }
         )
 
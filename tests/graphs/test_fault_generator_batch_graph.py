@@ -0,0 +1,75 @@
+import asyncio
+import pytest
+import subprocess
+from pathlib import Path
+from unittest.mock import patch
+from graphs.fault_generator_batch_graph import build_fault_generator_batch_graph, initial_batch_state
+from utils.repository import Repository, WorktreePool
+
+
+class FakeFaultGraph:
+    """build_fault_generator_graphの代わりに、ソースコードの内容からFAULTを返すグラフ"""
+    running = 0
+    peak = 0
+
+    def __init__(self, repository: Repository):
+        self.repository = repository
+
+    async def ainvoke(self, state):
+        # worktree内のファイルが渡されることを確認する
+        assert Path(state["source_code_path"]).resolve().is_relative_to(self.repository.path.resolve())
+        FakeFaultGraph.running += 1
+        FakeFaultGraph.peak = max(FakeFaultGraph.peak, FakeFaultGraph.running)
+        await asyncio.sleep(0.01)
+        FakeFaultGraph.running -= 1
+
+        if "broken" in state["source_code"]:
+            raise RuntimeError("tests failed")
+        return {**state, "faults": [{"diff": state["source_code"], "is_equivalent": False, "reason": None}]}
+
+
+class TestFaultGeneratorBatchGraph:
+    @pytest.fixture
+    def repository(self, tmp_path: Path) -> Repository:
+        root = tmp_path / "origin"
+        sources = {"A": "class A", "B": "class B", "C": "class C broken", "D": "class D"}
+        for name, code in sources.items():
+            (root / "src/main/kotlin/com/example").mkdir(parents=True, exist_ok=True)
+            (root / "src/test/kotlin/com/example").mkdir(parents=True, exist_ok=True)
+            (root / f"src/main/kotlin/com/example/{name}.kt").write_text(code)
+            (root / f"src/test/kotlin/com/example/{name}Test.kt").write_text(f"class {name}Test")
+
+        def git(*args):
+            subprocess.run(["git", *args], cwd=root, check=True, capture_output=True)
+
+        git("init")
+        git("add", "-A")
+        git("-c", "user.name=test", "-c", "user.email=test@example.com", "commit", "-m", "init")
+        return Repository(root)
+
+    def test_fan_out(self, repository, tmp_path):
+        """全てのファイルが並列に処理され、結果が結合されることを確認"""
+        FakeFaultGraph.peak = 0
+        state = initial_batch_state(repository)
+        assert len(state["targets"]) == 4
+
+        with patch("graphs.fault_generator_batch_graph.build_fault_generator_graph", side_effect=lambda llm, worktree, **_: FakeFaultGraph(worktree)):
+            with WorktreePool(repository, 2, root=tmp_path / "pool") as pool:
+                graph = build_fault_generator_batch_graph(None, pool)
+                result = asyncio.run(graph.ainvoke(state))
+
+        results = {Path(r["source_code_path"]).stem: r for r in result["results"]}
+        assert sorted(results) == ["A", "B", "C", "D"]
+        assert results["A"]["faults"][0]["diff"] == "class A"
+        assert results["A"]["error"] is None
+        # 失敗したファイルはエラーとして記録され、他のファイルの結果は失われない
+        assert results["C"]["faults"] == []
+        assert "tests failed" in results["C"]["error"]
+        # 同時に処理されるファイルの数はworktreeの数まで
+        assert 2 == FakeFaultGraph.peak
+
+    def test_initial_batch_state_with_filter(self, repository):
+        """対象のソースコードを指定できることを確認"""
+        source_code_path = repository.path / "src/main/kotlin/com/example/B.kt"
+        state = initial_batch_state(repository, [source_code_path])
+        assert [target["source_code_path"] for target in state["targets"]] == [source_code_path]
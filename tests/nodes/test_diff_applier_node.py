@@ -1,7 +1,16 @@
 import pytest
 from nodes.diff_applier_node import DiffApplierNode
 from utils.repository import Repository
-from unittest.mock import Mock
+from utils.test_outcome_cache import TestOutcomeCache
+from utils.test_results import TestCaseResult, TestFailure, TestReport, TestTimeout
+from utils.gradle_runner import GradleResult
+from utils.kill_history import KillHistory
+from unittest.mock import Mock, patch
+from contextlib import asynccontextmanager
+from functools import partial
+from pathlib import Path
+import asyncio
+import time
 
 class TestDiffApplierNode:
     @pytest.fixture
@@ -255,4 +264,368 @@ MUTANT <END>"""
         result = diff_applier_node._extract_diff_mutants(diff)
         assert len(result) == 2
         assert result[0] == expected1
-        assert result[1] == expected2 
+        assert result[1] == expected2
+
+
+def mock_repository(**kwargs):
+    """ファイルの置き換え（swap）だけは実際に行うリポジトリのMock"""
+    repository = Mock(spec=Repository, **kwargs)
+    repository.swap.side_effect = partial(Repository.swap, repository)
+    return repository
+
+
+class FakeWorktreePool:
+    """worktreeを作成せずにリポジトリを貸し出すプール"""
+    def __init__(self, repository, size):
+        self.repositories = [Mock(spec=Repository, path=Path(f"/worktree-{i}")) for i in range(size)]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    @asynccontextmanager
+    async def lease(self):
+        yield self.repositories.pop()
+
+    def translate(self, path, repository):
+        return repository.path / path.name
+
+
+class TestDiffApplierNodeParallel:
+    def test_parallel_results_keep_mutant_order(self, tmp_path, monkeypatch):
+        """並列評価でも結果がMUTANTの順番に並ぶことを確認"""
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / "debug").mkdir()
+        source_code_path = tmp_path / "Source.kt"
+        source_code_path.write_text("fun a() = 1\n")
+
+        diff = """--- a/Source.kt
++++ b/Source.kt
+@@ -1,1 +1,1 @@
+MUTANT <START>
+-fun a() = 1
++fun a() = 2
+MUTANT <END>
+MUTANT <START>
+-fun a() = 1
++fun a() = 3
+MUTANT <END>
+MUTANT <START>
+-fun a() = 1
++fun a() = 4
+MUTANT <END>"""
+
+        node = DiffApplierNode(Mock(spec=Repository), parallelism=3)
+
+        def evaluate(repository, target_path, context, diff_mutant):
+            # 後のMUTANTほど早く終わる
+            skipped_before = diff_mutant.count("MUTANT <SKIP>", 0, diff_mutant.index("MUTANT <START>"))
+            time.sleep(0.01 * (3 - skipped_before // 2))
+            return diff_mutant
+
+        with patch("nodes.diff_applier_node.WorktreePool", FakeWorktreePool), \
+             patch.object(node, "_evaluate_mutant", side_effect=evaluate):
+            result = asyncio.run(node._process({"source_code_path": source_code_path, "test_code_path": source_code_path, "diff": diff}))
+
+        assert result["diff_faults"] == node._extract_diff_mutants(diff)
+
+
+
+class TestDiffApplierNodeSchemata:
+    SOURCE = """class Calc {
+    fun add(a: Int, b: Int): Int {
+        return a + b
+    }
+
+    fun sub(a: Int, b: Int): Int {
+        return a - b
+    }
+}"""
+
+    DIFF = """--- a/Calc.kt
++++ b/Calc.kt
+@@ -1,9 +1,13 @@
+ class Calc {
+     fun add(a: Int, b: Int): Int {
++        // MUTANT <START>
+-        return a + b
++        return a - b
++        // MUTANT <END>
+     }
+ 
+     fun sub(a: Int, b: Int): Int {
++        // MUTANT <START>
+-        return a - b
++        return a + b
++        // MUTANT <END>
+     }
+ }"""
+
+    def test_schemata_switches_mutants(self, tmp_path, monkeypatch):
+        """スキーマを1回適用し、MUTANTごとに環境変数を切り替えてテストすることを確認"""
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / "debug").mkdir()
+        source_code_path = tmp_path / "Calc.kt"
+        source_code_path.write_text(self.SOURCE)
+
+        repository = mock_repository()
+        written = []
+
+        def test(tests=None, fallback_to_full_suite=False, env=None, rerun=False, **kwargs):
+            written.append(source_code_path.read_text())
+            # MUTANT 1 はテストで検出される
+            if env["MUTANT_ID"] == "1":
+                raise Exception("test failed")
+
+        repository.test.side_effect = test
+
+        node = DiffApplierNode(repository, schemata=True)
+        result = asyncio.run(node._process({"source_code_path": source_code_path, "test_code_path": source_code_path, "diff": self.DIFF}))
+
+        envs = [call.kwargs["env"]["MUTANT_ID"] for call in repository.test.call_args_list]
+        reruns = [call.kwargs.get("rerun", False) for call in repository.test.call_args_list]
+        assert envs == ["0", "1", "2"]
+        assert reruns == [False, True, True]
+        assert all("sub__mutant2" in code for code in written)
+        # スキーマのテストが終わったら元のソースコードに戻す
+        assert source_code_path.read_text() == self.SOURCE
+        repository.clean.assert_called_once()
+
+        assert len(result["diff_faults"]) == 1
+        assert "+        return a + b" in result["diff_faults"][0]
+        assert "-        return a - b" in result["diff_faults"][0]
+
+    def test_schemata_falls_back_when_schema_fails(self, tmp_path, monkeypatch):
+        """スキーマのテストが失敗した場合は個別に評価することを確認"""
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / "debug").mkdir()
+        source_code_path = tmp_path / "Calc.kt"
+        source_code_path.write_text(self.SOURCE)
+
+        repository = mock_repository()
+        repository.test.side_effect = Exception("compile error")
+
+        node = DiffApplierNode(repository, schemata=True)
+        with patch.object(node, "_evaluate_mutants", return_value=[None, None]) as evaluate_mutants:
+            result = asyncio.run(node._process({"source_code_path": source_code_path, "test_code_path": source_code_path, "diff": self.DIFF}))
+
+        assert len(evaluate_mutants.call_args.args[1]) == 2
+        assert result["diff_faults"] == []
+
+
+class TestDiffApplierNodeCache:
+    def test_cached_outcome_skips_test(self, tmp_path, monkeypatch):
+        """キャッシュ済みのMUTANTはテストを実行しないことを確認"""
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / "debug").mkdir()
+        source_code_path = tmp_path / "Calc.kt"
+        source_code_path.write_text(TestDiffApplierNodeSchemata.SOURCE)
+        test_code_path = tmp_path / "CalcTest.kt"
+        test_code_path.write_text("class CalcTest")
+
+        repository = mock_repository(path=tmp_path)
+        repository.relative_path.side_effect = lambda path: Path(path).relative_to(tmp_path)
+        repository.tree_hash.return_value = "tree"
+        repository.clean.side_effect = lambda: source_code_path.write_text(TestDiffApplierNodeSchemata.SOURCE)
+
+        state = {"source_code_path": source_code_path, "test_code_path": test_code_path, "diff": TestDiffApplierNodeSchemata.DIFF}
+        node = DiffApplierNode(repository, cache=TestOutcomeCache(tmp_path / "cache"))
+
+        first = asyncio.run(node._process(state))
+        assert repository.test.call_count == 2
+
+        second = asyncio.run(node._process(state))
+        assert repository.test.call_count == 2
+        assert second == first
+        assert len(first["diff_faults"]) == 2
+        # treeハッシュはMUTANTごとではなく、実行ごとに1回だけ取得する
+        assert repository.tree_hash.call_count == 2
+
+
+class TestDiffApplierNodeKillHistory:
+    def test_kill_history_orders_tests(self, tmp_path, monkeypatch):
+        """MUTANTを検出したテストが記録され、次のMUTANTで先に実行されることを確認"""
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / "debug").mkdir()
+        source_code_path = tmp_path / "Calc.kt"
+        source_code_path.write_text(TestDiffApplierNodeSchemata.SOURCE)
+
+        repository = mock_repository(path=tmp_path)
+        repository.relative_path.side_effect = lambda path: Path(path).relative_to(tmp_path)
+        killer = TestCaseResult("com.example.CalcTest", "testAdd()", "failed", 0.01)
+        repository.test.side_effect = TestFailure(TestReport([killer]))
+
+        history = KillHistory()
+        node = DiffApplierNode(repository, fail_fast=True, kill_history=history)
+        asyncio.run(node._process({"source_code_path": source_code_path, "test_code_path": source_code_path, "diff": TestDiffApplierNodeSchemata.DIFF}))
+
+        calls = repository.test.call_args_list
+        assert [call.kwargs["priority_tests"] for call in calls] == [[], ["com.example.CalcTest.testAdd()"]]
+        assert all(call.kwargs["fail_fast"] for call in calls)
+        assert history.priority_tests("Calc.kt") == ["com.example.CalcTest.testAdd()"]
+
+
+class TestDiffApplierNodeTimeout:
+    def test_timed_out_mutant_is_killed(self, tmp_path, monkeypatch):
+        """元のソースコードの実行時間からタイムアウトを決め、タイムアウトしたMUTANTは検出されたものとみなすことを確認"""
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / "debug").mkdir()
+        source_code_path = tmp_path / "Calc.kt"
+        source_code_path.write_text(TestDiffApplierNodeSchemata.SOURCE)
+
+        repository = mock_repository(path=tmp_path)
+        repository.relative_path.side_effect = lambda path: Path(path).relative_to(tmp_path)
+        repository.run_tests.return_value = TestReport([], GradleResult(["test"], 0, "", "", elapsed=20.0, warm=False))
+        timed_out = GradleResult(["test"], 130, "", "", elapsed=60.0, warm=True, timed_out=True)
+        repository.test.side_effect = [TestTimeout(TestReport([], timed_out)), TestReport([])]
+
+        node = DiffApplierNode(repository, timeout_factor=3.0, min_timeout=5.0)
+        result = asyncio.run(node._process({"source_code_path": source_code_path, "test_code_path": source_code_path, "diff": TestDiffApplierNodeSchemata.DIFF}))
+
+        assert [call.kwargs["timeout"] for call in repository.test.call_args_list] == [60.0, 60.0]
+        assert len(result["diff_faults"]) == 1
+        assert "+        return a + b" in result["diff_faults"][0]
+
+    def test_timed_out_mutant_is_not_cached(self, tmp_path, monkeypatch):
+        """タイムアウトしたMUTANTの結果はキャッシュされず、次の実行でテストし直すことを確認"""
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / "debug").mkdir()
+        source_code_path = tmp_path / "Calc.kt"
+        source_code_path.write_text(TestDiffApplierNodeSchemata.SOURCE)
+
+        repository = mock_repository(path=tmp_path)
+        repository.relative_path.side_effect = lambda path: Path(path).relative_to(tmp_path)
+        repository.tree_hash.return_value = "tree"
+        timed_out = GradleResult(["test"], 130, "", "", elapsed=60.0, warm=True, timed_out=True)
+        repository.test.side_effect = TestTimeout(TestReport([], timed_out))
+
+        state = {"source_code_path": source_code_path, "test_code_path": source_code_path, "diff": TestDiffApplierNodeSchemata.DIFF}
+        node = DiffApplierNode(repository, cache=TestOutcomeCache(tmp_path / "cache"))
+        asyncio.run(node._process(state))
+        assert repository.test.call_count == 2
+
+        asyncio.run(node._process(state))
+        assert repository.test.call_count == 4
+
+    def test_failed_baseline_disables_timeout(self, tmp_path, monkeypatch):
+        """元のソースコードでテストが失敗した場合はタイムアウトしないことを確認"""
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / "debug").mkdir()
+        source_code_path = tmp_path / "Calc.kt"
+        source_code_path.write_text(TestDiffApplierNodeSchemata.SOURCE)
+
+        repository = mock_repository(path=tmp_path)
+        repository.relative_path.side_effect = lambda path: Path(path).relative_to(tmp_path)
+        repository.run_tests.return_value = TestReport([], GradleResult(["test"], 1, "", "", elapsed=20.0, warm=False))
+
+        node = DiffApplierNode(repository, timeout_factor=3.0)
+        asyncio.run(node._process({"source_code_path": source_code_path, "test_code_path": source_code_path, "diff": TestDiffApplierNodeSchemata.DIFF}))
+
+        assert all(call.kwargs["timeout"] is None for call in repository.test.call_args_list)
+
+
+class TestDiffApplierNodeDeduplicate:
+    SOURCE = "fun f0() = 1\nfun f1() = 1\n"
+
+    # 2番目は1番目と書式だけが異なり、3番目は元のソースコードと書式だけが異なる
+    DIFF = "--- a/Source.kt\n+++ b/Source.kt\n" + "".join(
+        f"@@ -{line},1 +{line},3 @@\n+// MUTANT <START>\n-fun f{line - 1}() = 1\n+{mutated}\n+// MUTANT <END>\n"
+        for line, mutated in [
+            (1, "fun f0() = 2"),
+            (1, "fun f0() =  2 // same as the first mutant"),
+            (2, "fun f1() = (1)"),
+            (2, "fun f1() = 3"),
+        ]
+    )
+
+    def test_duplicates_and_noops_are_not_tested(self, tmp_path, monkeypatch, capsys):
+        """重複したMUTANTと変更のないMUTANTは、テストを実行せずに除かれることを確認"""
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / "debug").mkdir()
+        source_code_path = tmp_path / "Source.kt"
+        source_code_path.write_text(self.SOURCE)
+
+        repository = mock_repository()
+        written = []
+        repository.test.side_effect = lambda **kwargs: written.append(source_code_path.read_text())
+
+        node = DiffApplierNode(repository)
+        result = asyncio.run(node._process({"source_code_path": source_code_path, "test_code_path": source_code_path, "diff": self.DIFF}))
+
+        assert repository.test.call_count == 2
+        assert written == ["fun f0() = 2\nfun f1() = 1\n", "fun f0() = 1\nfun f1() = 3\n"]
+        assert len(result["diff_faults"]) == 2
+        assert "mutant dedup: 2 unique, 1 duplicates, 1 no-ops, 2 test runs saved" in capsys.readouterr().out
+
+    def test_deduplicate_disabled(self, tmp_path, monkeypatch):
+        """deduplicateがFalseの場合は全てのMUTANTをテストすることを確認"""
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / "debug").mkdir()
+        source_code_path = tmp_path / "Source.kt"
+        source_code_path.write_text(self.SOURCE)
+
+        repository = mock_repository()
+        node = DiffApplierNode(repository, deduplicate=False)
+        asyncio.run(node._process({"source_code_path": source_code_path, "test_code_path": source_code_path, "diff": self.DIFF}))
+
+        assert repository.test.call_count == 4
+
+
+class TestDiffApplierNodeFormat:
+    def test_fault_diff_uses_formatted_code(self, tmp_path, monkeypatch):
+        """テストを通過したMUTANTのdiffがフォーマット後のソースコードから作成され、リポジトリ全体はクリーンしないことを確認"""
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / "debug").mkdir()
+        source_code_path = tmp_path / "Source.kt"
+        source_code_path.write_text(TestDiffApplierNodeDeduplicate.SOURCE)
+
+        repository = mock_repository()
+        # フォーマットでMUTANTの行の空白が整えられる
+        repository.format.side_effect = lambda: source_code_path.write_text(source_code_path.read_text().replace("=  ", "= "))
+        diff = "--- a/Source.kt\n+++ b/Source.kt\n@@ -1,1 +1,3 @@\n+// MUTANT <START>\n-fun f0() = 1\n+fun f0() =  2\n+// MUTANT <END>\n"
+
+        node = DiffApplierNode(repository)
+        result = asyncio.run(node._process({"source_code_path": source_code_path, "test_code_path": source_code_path, "diff": diff}))
+
+        assert "+fun f0() = 2" in result["diff_faults"][0]
+        repository.restore_changed_files.assert_called_once_with(keep=[source_code_path])
+        # cleanはprepare_contextでの1回だけ
+        repository.clean.assert_called_once()
+        assert source_code_path.read_text() == TestDiffApplierNodeDeduplicate.SOURCE
+
+    def test_schemata_survivors_are_formatted(self, tmp_path, monkeypatch):
+        """スキーマで評価した場合も、テストを通過したMUTANTのdiffがフォーマット後のソースコードから作成されることを確認"""
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / "debug").mkdir()
+        source_code_path = tmp_path / "Calc.kt"
+        source_code_path.write_text(TestDiffApplierNodeSchemata.SOURCE)
+        test_code_path = tmp_path / "CalcTest.kt"
+        test_code_path.write_text("class CalcTest")
+
+        repository = mock_repository(path=tmp_path)
+        repository.relative_path.side_effect = lambda path: Path(path).relative_to(tmp_path)
+        repository.tree_hash.return_value = "tree"
+        formatted = []
+
+        def format():
+            formatted.append(source_code_path.read_text())
+            source_code_path.write_text(source_code_path.read_text().replace("a - b", "a-b"))
+
+        repository.format.side_effect = format
+        diff = TestDiffApplierNodeSchemata.DIFF.replace("-        return a - b\n+        return a + b\n", "-        return a - b\n+        return a * b\n")
+        state = {"source_code_path": source_code_path, "test_code_path": test_code_path, "diff": diff}
+
+        individual = asyncio.run(DiffApplierNode(repository)._process(state))
+        cache = TestOutcomeCache(tmp_path / "cache")
+        schemata = asyncio.run(DiffApplierNode(repository, schemata=True, cache=cache)._process(state))
+        # キャッシュにはフォーマット後のソースコードが保存される
+        cached = asyncio.run(DiffApplierNode(repository, schemata=True, cache=cache)._process(state))
+
+        assert schemata == individual
+        assert cached == individual
+        assert any("+        return a-b" in diff_fault for diff_fault in schemata["diff_faults"])
+        # フォーマットはスキーマではなくMUTANTを適用したソースコードに対して行う
+        assert not any("__mutant" in code for code in formatted)
+        assert source_code_path.read_text() == TestDiffApplierNodeSchemata.SOURCE
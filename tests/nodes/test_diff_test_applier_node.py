@@ -0,0 +1,78 @@
+import asyncio
+import pytest
+from nodes.diff_test_applier_node import DiffTestApplierNode
+from utils.compile_errors import CompileError, CompileResult
+from utils.repository import Repository
+from utils.test_outcome_cache import TestOutcomeCache
+from unittest.mock import Mock
+from pathlib import Path
+
+
+TEST_CODE = """package com.example
+
+class CalcTest {
+    fun testAdd() {
+    }
+}
+"""
+
+DIFF = """--- CalcTest.kt
++++ CalcTest.kt
+@@ -3,4 +3,6 @@
+ class CalcTest {
+     fun testAdd() {
+     }
++    fun testSub() {
++    }
+ }
+"""
+
+
+class TestDiffTestApplierNodeCompile:
+    @pytest.fixture
+    def state(self, tmp_path: Path):
+        source_code_path = tmp_path / "Calc.kt"
+        source_code_path.write_text("package com.example\n\nclass Calc\n")
+        test_code_path = tmp_path / "CalcTest.kt"
+        test_code_path.write_text(TEST_CODE)
+        return {
+            "source_code_path": source_code_path,
+            "test_code_path": test_code_path,
+            "faults": [{"diff": "", "is_equivalent": False, "reason": None}],
+            "diff": DIFF,
+        }
+
+    def test_uncompilable_test_code_is_rejected(self, state, tmp_path):
+        """コンパイルできないテストコードはテストを実行せずに除外されることを確認"""
+        repository = Mock(spec=Repository)
+        repository.path = tmp_path
+        repository.tree_hash.return_value = "tree"
+        repository.relative_path.side_effect = lambda path: Path(path).relative_to(tmp_path)
+        repository.clean.side_effect = lambda: state["test_code_path"].write_text(TEST_CODE)
+        error = CompileError(state["test_code_path"], 6, 5, "Unresolved reference 'sub'.")
+        repository.compile_tests.return_value = CompileResult(False, [error], "")
+
+        cache = TestOutcomeCache(tmp_path / "cache")
+        node = DiffTestApplierNode(repository, cache=cache)
+        asyncio.run(node.process(state))
+
+        repository.compile_tests.assert_called_once()
+        repository.test.assert_not_called()
+
+        # コンパイルエラーはテストの失敗としてキャッシュされ、次は再コンパイルしない
+        repository.compile_tests.reset_mock()
+        asyncio.run(node.process(state))
+        repository.compile_tests.assert_not_called()
+        assert cache.hits == 1
+
+    def test_compilable_test_code_is_tested(self, state, tmp_path):
+        """コンパイルできるテストコードはテストが実行されることを確認"""
+        repository = Mock(spec=Repository)
+        repository.compile_tests.return_value = CompileResult(True, [], "")
+        repository.test.side_effect = Exception("stop")
+
+        node = DiffTestApplierNode(repository)
+        asyncio.run(node.process(state))
+
+        repository.compile_tests.assert_called_once()
+        repository.test.assert_called_once()
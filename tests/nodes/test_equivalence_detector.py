@@ -0,0 +1,131 @@
+import asyncio
+import difflib
+import json
+import re
+from nodes.equivalence_detector import EquivalenceDetectorNode
+from unittest.mock import Mock
+
+
+def shown_indexes(invoke_args) -> list:
+    return [int(index) for index in re.findall(r"DIFF #(\d+):", invoke_args["diffs_with_index"])]
+
+
+class TestEquivalenceDetectorNode:
+    def make_node(self, tmp_path, monkeypatch, respond, **kwargs):
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / "debug").mkdir()
+        node = EquivalenceDetectorNode(Mock(), **kwargs)
+        calls = []
+
+        async def call(prompt_template, invoke_args):
+            indexes = shown_indexes(invoke_args)
+            calls.append(indexes)
+            return json.dumps({"results": respond(indexes, len(calls))})
+
+        node.caller = Mock()
+        node.caller.call.side_effect = call
+        return node, calls
+
+    def test_results_are_merged_by_index(self, tmp_path, monkeypatch):
+        """結果の順番が入れ替わっても、DIFFの番号で対応付けられることを確認"""
+        def respond(indexes, _):
+            return [{"index": index, "is_equivalent": index == 2, "reason": f"r{index}"} for index in reversed(indexes)]
+
+        node, calls = self.make_node(tmp_path, monkeypatch, respond)
+        faults = asyncio.run(node.detect("class A", ["d1", "d2", "d3"]))
+
+        assert calls == [[1, 2, 3]]
+        assert [(fault["diff"], fault["is_equivalent"], fault["reason"]) for fault in faults] == [
+            ("d1", False, "r1"), ("d2", True, "r2"), ("d3", False, "r3"),
+        ]
+
+    def test_shards_by_size_and_chars(self, tmp_path, monkeypatch):
+        """DIFFの数と文字数の上限でDIFFが分割されることを確認"""
+        def respond(indexes, _):
+            return [{"index": index, "is_equivalent": False, "reason": ""} for index in indexes]
+
+        node, calls = self.make_node(tmp_path, monkeypatch, respond, shard_size=2, max_shard_chars=10)
+        faults = asyncio.run(node.detect("class A", ["a", "b", "c" * 10, "d", "e"]))
+
+        assert sorted(calls) == [[1, 2], [3], [4, 5]]
+        assert [fault["diff"] for fault in faults] == ["a", "b", "c" * 10, "d", "e"]
+
+    def test_missing_results_are_retried(self, tmp_path, monkeypatch):
+        """結果が返ってこなかったDIFFだけが判定し直されることを確認"""
+        def respond(indexes, call_count):
+            # 最初の呼び出しでは最後のDIFFの結果が欠ける
+            if call_count == 1:
+                indexes = indexes[:-1]
+            return [{"index": index, "is_equivalent": True, "reason": ""} for index in indexes]
+
+        node, calls = self.make_node(tmp_path, monkeypatch, respond)
+        faults = asyncio.run(node.detect("class A", ["d1", "d2", "d3"]))
+
+        assert calls == [[1, 2, 3], [3]]
+        assert all(fault["is_equivalent"] for fault in faults)
+
+    def test_unresolved_diff_is_not_equivalent(self, tmp_path, monkeypatch):
+        """判定し直しても結果がないDIFFは、等価でないものとして残ることを確認"""
+        node, calls = self.make_node(tmp_path, monkeypatch, lambda indexes, _: [], max_retries=1)
+        faults = asyncio.run(node.detect("class A", ["d1"]))
+
+        assert calls == [[1], [1]]
+        assert faults == [{"diff": "d1", "is_equivalent": False, "reason": None}]
+
+    def test_invalid_output_is_retried(self, tmp_path, monkeypatch):
+        """壊れた出力のシャードは結果がないものとして判定し直され、他のシャードの結果は残ることを確認"""
+        node, _ = self.make_node(tmp_path, monkeypatch, None, shard_size=1)
+        calls = []
+
+        async def call(prompt_template, invoke_args):
+            indexes = shown_indexes(invoke_args)
+            calls.append(indexes)
+            if indexes == [2] and calls.count([2]) == 1:
+                return "{not json"
+            if indexes == [3] and calls.count([3]) == 1:
+                return json.dumps({"results": [{"index": 3, "reason": "no verdict"}]})
+            return json.dumps({"results": [{"index": index, "is_equivalent": True, "reason": ""} for index in indexes]})
+
+        node.caller.call.side_effect = call
+        faults = asyncio.run(node.detect("class A", ["d1", "d2", "d3"]))
+
+        assert sorted(calls) == [[1], [2], [2], [3], [3]]
+        assert all(fault["is_equivalent"] for fault in faults)
+        # シャードごとにデバッグ用の出力が分かれる
+        assert sorted(path.name for path in (tmp_path / "debug").iterdir()) == [
+            "last_equivalence_detector_0.json", "last_equivalence_detector_1.json", "last_equivalence_detector_2.json",
+        ]
+
+    def test_results_without_index_use_order(self, tmp_path, monkeypatch):
+        """番号のない結果は、数が一致する場合に順番で対応付けられることを確認"""
+        def respond(indexes, _):
+            return [{"is_equivalent": index == 1, "reason": ""} for index in indexes]
+
+        node, _ = self.make_node(tmp_path, monkeypatch, respond)
+        faults = asyncio.run(node.detect("class A", ["d1", "d2"]))
+
+        assert [fault["is_equivalent"] for fault in faults] == [True, False]
+
+    def test_token_identical_diffs_skip_llm(self, tmp_path, monkeypatch):
+        """書式だけを変更したDIFFはLLMを呼び出さずに等価と判定されることを確認"""
+        def respond(indexes, _):
+            return [{"index": index, "is_equivalent": False, "reason": "changed"} for index in indexes]
+
+        source = "fun f(a: Int): Int {\n    return a + 1\n}\n"
+        formatted = source.replace("return a + 1", "return (a)+1 // inc")
+        changed = source.replace("a + 1", "a - 1")
+        diffs = [
+            "\n".join(difflib.unified_diff(source.splitlines(), mutated.splitlines(), lineterm=""))
+            for mutated in (changed, formatted)
+        ]
+
+        node, calls = self.make_node(tmp_path, monkeypatch, respond)
+        faults = asyncio.run(node.detect(source, diffs))
+
+        assert calls == [[1]]
+        assert [fault["is_equivalent"] for fault in faults] == [False, True]
+
+        # 全てのDIFFが等価と判定された場合はLLMを呼び出さない
+        calls.clear()
+        assert asyncio.run(node.detect(source, diffs[1:]))[0]["is_equivalent"]
+        assert calls == []
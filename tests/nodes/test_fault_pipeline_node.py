@@ -0,0 +1,178 @@
+import asyncio
+import threading
+import time
+from nodes.diff_applier_node import DiffApplierNode
+from nodes.fault_pipeline_node import FaultPipelineNode
+from utils.mutant_diff_generator import iter_mutant_diffs
+from utils.repository import Repository
+from unittest.mock import Mock, patch
+from pathlib import Path
+
+
+SOURCE = "".join(f"fun f{i}() = 1\n" for i in range(8))
+
+
+def make_diff(count: int) -> str:
+    """i番目のMUTANTがi行目を `fun fi() = i + 2` に変更するdiffを作成する"""
+    hunks = "".join(
+        f"@@ -{i + 1},1 +{i + 1},3 @@\n+// MUTANT <START>\n-fun f{i}() = 1\n+fun f{i}() = {i + 2}\n+// MUTANT <END>\n"
+        for i in range(count)
+    )
+    return f"--- a/Source.kt\n+++ b/Source.kt\n{hunks}"
+
+
+def mutant_value(mutated_code: str) -> int:
+    changed = [line for line in mutated_code.splitlines() if not line.endswith("= 1")]
+    return int(changed[0].rsplit(" ", 1)[1])
+
+
+class FakeEquivalenceDetector:
+    """呼び出された時刻とdiffを記録し、全てのFAULTを等価でないと判定する"""
+    def __init__(self):
+        self.calls = []
+
+    async def detect(self, source_code, diff_faults):
+        self.calls.append((time.perf_counter(), list(diff_faults)))
+        await asyncio.sleep(0.01)
+        return [{"diff": diff, "is_equivalent": False, "reason": "changed"} for diff in diff_faults]
+
+
+class TestFaultPipelineNode:
+    def run(self, tmp_path, monkeypatch, count, evaluate, batch_size=2):
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / "debug").mkdir()
+        source_code_path = tmp_path / "Source.kt"
+        source_code_path.write_text(SOURCE)
+
+        diff_applier = DiffApplierNode(Mock(spec=Repository))
+        detector = FakeEquivalenceDetector()
+        node = FaultPipelineNode(diff_applier, detector, queue_size=1, equivalence_batch_size=batch_size)
+        with patch.object(diff_applier, "evaluate_mutated_code", side_effect=evaluate):
+            result = asyncio.run(node._process({"source_code_path": source_code_path, "test_code_path": source_code_path, "diff": make_diff(count)}))
+        return result, detector
+
+    def test_results_keep_mutant_order(self, tmp_path, monkeypatch):
+        """テストを通過したMUTANTだけが、MUTANTの順番で等価性を判定されることを確認"""
+        def evaluate(repository, target_path, context, mutated_code):
+            # 偶数番目のMUTANTはテストで検出される
+            value = mutant_value(mutated_code)
+            return None if value % 2 == 0 else f"diff {value}"
+
+        result, detector = self.run(tmp_path, monkeypatch, 6, evaluate)
+
+        assert result["diff_faults"] == ["diff 3", "diff 5", "diff 7"]
+        assert [fault["diff"] for fault in result["faults"]] == ["diff 3", "diff 5", "diff 7"]
+        assert [len(diffs) for _, diffs in detector.calls] == [2, 1]
+
+    def test_equivalence_overlaps_tests(self, tmp_path, monkeypatch):
+        """先に通過したMUTANTの等価性の判定が、後のMUTANTのテスト中に始まることを確認"""
+        finished = []
+
+        def evaluate(repository, target_path, context, mutated_code):
+            # テストはイベントループとは別のスレッドで実行される
+            assert threading.current_thread() is not threading.main_thread()
+            time.sleep(0.05)
+            finished.append(time.perf_counter())
+            return mutated_code
+
+        result, detector = self.run(tmp_path, monkeypatch, 4, evaluate, batch_size=1)
+
+        assert len(result["faults"]) == 4
+        first_call = detector.calls[0][0]
+        assert first_call < finished[-1]
+
+    def test_no_mutants(self, tmp_path, monkeypatch):
+        """MUTANTがない場合はテストも判定も行わないことを確認"""
+        evaluate = Mock()
+        result, detector = self.run(tmp_path, monkeypatch, 0, evaluate)
+
+        assert result == {"diff_faults": [], "faults": []}
+        evaluate.assert_not_called()
+        assert detector.calls == []
+
+
+class FakeDiffGenerator:
+    """MUTANTのdiffを1つずつ間隔をあけて返し、生成が終わった時刻を記録する"""
+    def __init__(self, count: int):
+        self.diff_mutants = list(iter_mutant_diffs(make_diff(count)))
+        self.finished = None
+
+    async def stream_mutant_diffs(self, global_state):
+        for diff_mutant in self.diff_mutants:
+            await asyncio.sleep(0.05)
+            yield diff_mutant
+        self.finished = time.perf_counter()
+
+
+class TestFaultPipelineNodeStreaming:
+    def test_tests_start_before_generation_finishes(self, tmp_path, monkeypatch):
+        """生成中のdiffから取り出したMUTANTのテストが、生成が終わる前に始まることを確認"""
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / "debug").mkdir()
+        source_code_path = tmp_path / "Source.kt"
+        source_code_path.write_text(SOURCE)
+
+        diff_applier = DiffApplierNode(Mock(spec=Repository))
+        generator = FakeDiffGenerator(3)
+        node = FaultPipelineNode(diff_applier, FakeEquivalenceDetector(), diff_generator=generator)
+        started = []
+
+        def evaluate(repository, target_path, context, mutated_code):
+            started.append(time.perf_counter())
+            return f"diff {mutant_value(mutated_code)}"
+
+        with patch.object(diff_applier, "evaluate_mutated_code", side_effect=evaluate):
+            # 状態にはまだdiffがない
+            result = asyncio.run(node.process({"source_code_path": source_code_path, "test_code_path": source_code_path}))
+
+        assert result["diff_faults"] == ["diff 2", "diff 3", "diff 4"]
+        assert len(result["faults"]) == 3
+        assert started[0] < generator.finished
+
+    def test_generation_overlaps_prepare_context(self, tmp_path, monkeypatch):
+        """diffの受信が、元のソースコードでのテストなどの準備の完了を待たずに始まることを確認"""
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / "debug").mkdir()
+        source_code_path = tmp_path / "Source.kt"
+        source_code_path.write_text(SOURCE)
+
+        diff_applier = DiffApplierNode(Mock(spec=Repository))
+        generator = FakeDiffGenerator(3)
+        node = FaultPipelineNode(diff_applier, FakeEquivalenceDetector(), diff_generator=generator)
+        prepared = []
+        prepare_context = diff_applier.prepare_context
+
+        def slow_prepare_context(state):
+            time.sleep(0.3)
+            prepared.append(time.perf_counter())
+            return prepare_context(state)
+
+        with (
+            patch.object(diff_applier, "prepare_context", side_effect=slow_prepare_context),
+            patch.object(diff_applier, "evaluate_mutated_code", side_effect=lambda *args: None),
+        ):
+            asyncio.run(node.process({"source_code_path": source_code_path, "test_code_path": source_code_path}))
+
+        # 3つのMUTANTの生成（0.15秒）が準備（0.3秒）の間に終わる
+        assert generator.finished < prepared[0]
+
+    def test_worktrees_created_on_demand(self, tmp_path, monkeypatch):
+        """MUTANTが生成されない場合はworktreeを作成しないことを確認"""
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / "debug").mkdir()
+        source_code_path = tmp_path / "Source.kt"
+        source_code_path.write_text(SOURCE)
+
+        diff_applier = DiffApplierNode(Mock(spec=Repository), parallelism=4)
+        node = FaultPipelineNode(diff_applier, FakeEquivalenceDetector(), diff_generator=FakeDiffGenerator(0))
+
+        with (
+            patch("nodes.fault_pipeline_node.WorktreePool.open", autospec=True, side_effect=lambda pool: pool) as open_pool,
+            patch("nodes.fault_pipeline_node.WorktreePool.close", autospec=True),
+            patch("nodes.fault_pipeline_node.WorktreePool._add_worktree") as add_worktree,
+        ):
+            result = asyncio.run(node.process({"source_code_path": source_code_path, "test_code_path": source_code_path}))
+
+        assert result["diff_faults"] == []
+        assert open_pool.call_args.args[0].lazy
+        add_worktree.assert_not_called()
@@ -2,10 +2,13 @@ import unittest
 from typing import List
 
 from utils.detect_diff_hunks import DiffHunk
+from utils.diff_applier import apply_diff_for_mutant
 from utils.mutant_diff_generator import (
     MutantDiffGenerator,
+    MutantDiffStream,
     generate_mutant_diff,
-    generate_mutant_diff_from_hunks
+    generate_mutant_diff_from_hunks,
+    iter_mutant_diffs
 )
 
 
@@ -280,5 +283,101 @@ line5"""
         self.assertEqual(result, [])
 
 
+class TestIterMutantDiffs(unittest.TestCase):
+    """iter_mutant_diffsのテストクラス"""
+
+    def test_each_block_is_enabled_once(self):
+        """MUTANTブロックごとに、そのブロック以外のタグがSKIPに置換されることのテスト"""
+        diff = "A\nMUTANT <START>\n-x\n+y\nMUTANT <END>\nB\nMUTANT <START>\n-z\n+w\nMUTANT <END>\n"
+
+        result = list(iter_mutant_diffs(diff))
+
+        self.assertEqual(result, [
+            "A\nMUTANT <START>\n-x\n+y\nMUTANT <END>\nB\nMUTANT <SKIP>\n-z\n+w\nMUTANT <SKIP>\n",
+            "A\nMUTANT <SKIP>\n-x\n+y\nMUTANT <SKIP>\nB\nMUTANT <START>\n-z\n+w\nMUTANT <END>\n",
+        ])
+
+    def test_block_ending_at_next_start(self):
+        """ENDタグがない場合は次のSTARTタグがENDに置換され、最後のブロックはEOFまでとなることのテスト"""
+        diff = "MUTANT <START>\n-a\nMUTANT <START>\n-b\n"
+
+        result = list(iter_mutant_diffs(diff))
+
+        self.assertEqual(result, [
+            "MUTANT <START>\n-a\nMUTANT <END>\n-b\n",
+            "MUTANT <SKIP>\n-a\nMUTANT <START>\n-b\n",
+        ])
+
+    def test_is_lazy(self):
+        """MUTANTのDIFFが1つずつ生成されることのテスト"""
+        diff = "MUTANT <START>\n-a\nMUTANT <END>\n" * 1000
+
+        iterator = iter_mutant_diffs(diff)
+
+        self.assertTrue(next(iterator).startswith("MUTANT <START>\n-a\nMUTANT <END>\nMUTANT <SKIP>"))
+        self.assertEqual(sum(1 for _ in iterator), 999)
+
+    def test_no_mutant(self):
+        """STARTタグがない場合は何も生成しないことのテスト"""
+        self.assertEqual(list(iter_mutant_diffs("-a\n+b\nMUTANT <END>\n")), [])
+
+
+class TestMutantDiffStream(unittest.TestCase):
+    """MutantDiffStreamのテスト"""
+
+    DIFF = (
+        "@@ -1,5 +1,9 @@\n"
+        " A\n"
+        "+// MUTANT <START>\n"
+        "-x\n"
+        "+y\n"
+        "+// MUTANT <END>\n"
+        "-z\n"
+        " B\n"
+        "+// MUTANT <START>\n"
+        "-c\n"
+        "+d\n"
+        "+// MUTANT <END>\n"
+        " C\n"
+    )
+
+    def test_blocks_are_emitted_when_completed(self):
+        """ENDタグの後に削除行以外の行が届いた時点でMUTANTが返されることのテスト"""
+        stream = MutantDiffStream()
+        end = self.DIFF.index("+// MUTANT <END>")
+
+        self.assertEqual(stream.feed(self.DIFF[:end + len("+// MUTANT <END>\n")]), [])
+        # 削除行はまだブロックに含まれる可能性がある
+        self.assertEqual(stream.feed(self.DIFF[:self.DIFF.index(" B")]), [])
+        # 行の途中までしか届いていない
+        self.assertEqual(stream.feed(self.DIFF[:self.DIFF.index(" B") + 1]), [])
+        first = stream.feed(self.DIFF[:self.DIFF.index(" B") + 3])
+
+        self.assertEqual(len(first), 1)
+        self.assertIn("+// MUTANT <START>\n-x\n+y\n+// MUTANT <END>\n-z\n B", first[0])
+        self.assertEqual(stream.finish(self.DIFF), [list(iter_mutant_diffs(self.DIFF))[1]])
+        self.assertEqual(stream.finish(self.DIFF), [])
+
+    def test_streamed_diffs_apply_like_full_diff(self):
+        """1文字ずつ届いたDIFFから取り出したMUTANTが、DIFF全体から取り出したMUTANTと同じ結果になることのテスト"""
+        source = "A\nx\nz\nB\nc\nC\n"
+        stream = MutantDiffStream()
+        streamed = []
+        for end in range(len(self.DIFF) + 1):
+            streamed += stream.feed(self.DIFF[:end])
+        self.assertEqual(len(streamed), 2)
+        streamed += stream.finish(self.DIFF)
+
+        self.assertEqual(
+            [apply_diff_for_mutant(source, diff) for diff in streamed],
+            [apply_diff_for_mutant(source, diff) for diff in iter_mutant_diffs(self.DIFF)],
+        )
+
+    def test_rearrange(self):
+        """MUTANTを取り出す前にrearrangeが適用されることのテスト"""
+        stream = MutantDiffStream(lambda diff: diff.replace("+y", "+w"))
+        self.assertIn("+w", stream.finish(self.DIFF)[0])
+
+
 if __name__ == "__main__":
     unittest.main()
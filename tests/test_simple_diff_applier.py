@@ -378,5 +378,57 @@ class TestSimpleDiffApplier(unittest.TestCase):
         self.assertEqual(result2, expected2)
 
 
+    def test_apply_hunks_matches_sequential_apply_hunk(self):
+        """apply_hunksの結果が、apply_hunkを1つずつ適用した場合と一致するかテスト"""
+        source_code = "\n".join(f"line{i}" for i in range(1, 21))
+
+        def apply_sequentially(source_code, hunks):
+            result = source_code
+            line_offset = 0
+            for hunk in sorted(hunks, key=lambda h: h.source_start_line):
+                adjusted = DiffHunk(hunk.diff_lines, hunk.source_start_line + line_offset, hunk.source_end_line + line_offset)
+                before = result
+                result = apply_hunk(result, adjusted)
+                added, deleted = _calculate_line_changes(before, result)
+                line_offset += added - deleted
+            return result
+
+        cases = [
+            # 離れた位置のハンク
+            [
+                DiffHunk([" line2", "+a", "+b", " line3"], 2, 3),
+                DiffHunk([" line10", "-line11", "-line12", " line13"], 10, 13),
+                DiffHunk([" line19", "-line20", "+z"], 19, 20),
+            ],
+            # 前のハンクと重なるハンク
+            [
+                DiffHunk([" line4", "+x", " line5", " line6"], 4, 6),
+                DiffHunk([" line5", "-line6", "+y"], 5, 6),
+            ],
+            # ソースコードの行数が足りないハンク
+            [
+                DiffHunk([" line1", "-line2", "+b"], 1, 2),
+                DiffHunk([" line20", " line21", "+never"], 20, 20),
+            ],
+        ]
+        for hunks in cases:
+            self.assertEqual(apply_hunks(source_code, hunks), apply_sequentially(source_code, hunks))
+
+        # 範囲外のハンクは同じくエラーになる
+        with self.assertRaises(ValueError):
+            apply_hunks(source_code, [DiffHunk([" line1", "-line2"], 1, 2), DiffHunk([" line20"], 20, 21)])
+
+    def test_apply_hunks_after_all_lines_deleted(self):
+        """前のハンクで全ての行が削除された後のハンクが、空のファイルの1行目として適用されるかテスト"""
+        source_code = "line1\nline2"
+        hunks = [
+            DiffHunk(["-line1"], 1, 1),
+            DiffHunk(["-line2"], 2, 2),
+            DiffHunk(["+new"], 3, 2),
+        ]
+        # 空のファイルは空文字列の1行として扱われ、その後に追加される
+        self.assertEqual(apply_hunks(source_code, hunks), "\nnew")
+        self.assertEqual(apply_hunks(source_code, hunks[:2] + [DiffHunk(["+new"], 2, 2)]), "new\n")
+
 if __name__ == "__main__":
     unittest.main() 
\ No newline at end of file
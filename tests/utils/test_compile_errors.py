@@ -0,0 +1,52 @@
+import subprocess
+from pathlib import Path
+from unittest.mock import patch
+from utils.compile_errors import CompileError, parse_compile_errors
+from utils.repository import Repository
+
+
+OUTPUT = """
+> Task :compileKotlin UP-TO-DATE
+
+> Task :compileTestKotlin FAILED
+e: file:///work/src/test/kotlin/com/example/FooTest.kt:12:5 Unresolved reference 'bar'.
+e: file:///work/src/test/kotlin/com/example/FooTest.kt:20:9 Type mismatch: inferred type is String but Int was expected
+e: file:///work/src/test/kotlin/com/example/FooTest.kt:12:5 Unresolved reference 'bar'.
+w: file:///work/src/main/kotlin/com/example/Foo.kt:3:1 Parameter 'x' is never used
+e: /work/src/main/kotlin/com/example/Foo.kt: (7, 13): Unresolved reference: baz
+
+FAILURE: Build failed with an exception.
+"""
+
+
+class TestCompileErrors:
+    def test_parse_compile_errors(self):
+        """新旧の形式のエラーが解析され、警告と重複が除かれることを確認"""
+        errors = parse_compile_errors(OUTPUT)
+        assert errors == [
+            CompileError(Path("/work/src/test/kotlin/com/example/FooTest.kt"), 12, 5, "Unresolved reference 'bar'."),
+            CompileError(Path("/work/src/test/kotlin/com/example/FooTest.kt"), 20, 9, "Type mismatch: inferred type is String but Int was expected"),
+            CompileError(Path("/work/src/main/kotlin/com/example/Foo.kt"), 7, 13, "Unresolved reference: baz"),
+        ]
+
+    def test_compile_tests(self, tmp_path: Path):
+        """compileTestKotlinのみが実行され、エラーが指定したファイルに絞り込めることを確認"""
+        repository = Repository(tmp_path)
+        completed = subprocess.CompletedProcess([], 1, OUTPUT, "")
+        with patch("utils.gradle_runner.subprocess.run", return_value=completed) as run:
+            result = repository.compile_tests()
+
+        assert run.call_args.args[0][-1] == "compileTestKotlin"
+        assert not result.is_success
+        assert len(result.errors) == 3
+
+        summary = result.summary(Path("/work/src/test/kotlin/com/example/FooTest.kt"))
+        assert summary == "FooTest.kt:12:5 Unresolved reference 'bar'.\nFooTest.kt:20:9 Type mismatch: inferred type is String but Int was expected"
+
+    def test_compile_tests_success(self, tmp_path: Path):
+        """コンパイルが成功した場合はエラーがないことを確認"""
+        repository = Repository(tmp_path)
+        with patch("utils.gradle_runner.subprocess.run", return_value=subprocess.CompletedProcess([], 0, "BUILD SUCCESSFUL", "")):
+            result = repository.compile_tests()
+        assert result.is_success
+        assert result.errors == []
@@ -1,6 +1,8 @@
 import pytest
 from pathlib import Path
-from utils.diff_applier import apply_diff_to_file, apply_diff_to_file_for_mutant
+from utils.diff_applier import apply_diff_to_file, apply_diff_to_file_for_mutant, apply_diffs_for_mutant, apply_diffs_to_file_for_mutant, apply_unified_diff
+from utils.prepared_source import PreparedSource
+import difflib
 import tempfile
 import os
 
@@ -109,3 +111,77 @@ class TestDiffApplier:
     print("end")
 """
         assert result == expected_mutant
+
+    def test_batch_matches_single_application(self):
+        """複数のDIFFをまとめて適用した結果が、1つずつ適用した結果と一致することを確認"""
+        source = """def calculate(x, y):
+    print("start")
+    return x + y
+"""
+        diffs = [
+            """--- a/test.py
++++ b/test.py
+@@ -1,3 +1,5 @@
+ def calculate(x, y):
+     print("start")
++    // MUTANT <START>
+-    return x + y
++    return x - y
++    // MUTANT <END>
+""",
+            """--- a/test.py
++++ b/test.py
+@@ -1,3 +1,5 @@
+ def calculate(x, y):
++    // MUTANT <START>
+-    print("start")
++    print("begin")
++    // MUTANT <END>
+     return x + y
+""",
+        ]
+        source_path = self.write_source(source)
+
+        batch = apply_diffs_to_file_for_mutant(source_path, diffs)
+        single = [apply_diff_to_file_for_mutant(source_path, diff) for diff in diffs]
+
+        assert [path.read_text() for path in batch] == [path.read_text() for path in single]
+        assert "return x - y" in batch[0].read_text()
+        assert 'print("begin")' in batch[1].read_text()
+
+    def test_batch_shares_prepared_source(self):
+        """PreparedSourceの行の索引が全てのDIFFで共有されることを確認"""
+        source = PreparedSource("fun a() = 1\nfun b() = 2\n")
+        # 行番号が誤っているため、位置の推測に索引が使われる
+        diff = """@@ -9,1 +9,3 @@
++// MUTANT <START>
+-fun b() = 2
++fun b() = 3
++// MUTANT <END>
+"""
+        results = apply_diffs_for_mutant(source, [diff, diff])
+        index = source._line_index
+
+        assert results == ["fun a() = 1\nfun b() = 3\n"] * 2
+        assert index is not None
+        assert source.line_index is index
+        # 元の行は変更されない
+        assert source.lines == ["fun a() = 1", "fun b() = 2", ""]
+
+
+class TestApplyUnifiedDiff:
+    def test_restores_mutated_code(self):
+        """difflibで作成したDIFFから変更後のソースコードが復元されることを確認"""
+        source = "".join(f"fun f{i}() = {i}\n" for i in range(10))
+        mutated = source.replace("f2() = 2", "f2() = 3").replace("fun f8() = 8\n", "")
+        mutated += "fun g() = 0\n"
+        for context in (0, 3):
+            diff = "\n".join(difflib.unified_diff(source.splitlines(), mutated.splitlines(), lineterm="", n=context))
+            assert apply_unified_diff(source, diff) == mutated
+
+    def test_rejects_mismatch(self):
+        """元のソースコードと一致しないDIFFや、変更のないDIFFは適用できないことを確認"""
+        with pytest.raises(ValueError):
+            apply_unified_diff("fun a() = 1\n", "@@ -1 +1 @@\n-fun a() = 2\n+fun a() = 3")
+        with pytest.raises(ValueError):
+            apply_unified_diff("fun a() = 1\n", "d1")
@@ -0,0 +1,46 @@
+import sqlite3
+from pathlib import Path
+from utils.fault_store import FaultStore
+
+
+def fault(diff: str, is_equivalent: bool = False, reason: str = None):
+    return {"diff": diff, "is_equivalent": is_equivalent, "reason": reason}
+
+
+class TestFaultStore:
+    def test_append_and_iter(self, tmp_path: Path):
+        """追記したFAULTが条件で絞り込んで読み出せることを確認"""
+        with FaultStore(tmp_path / "faults.sqlite3") as store:
+            run1 = store.start_run()
+            store.append(run1, Path("src/A.kt"), Path("test/ATest.kt"), fault("a1"))
+            store.append(run1, Path("src/B.kt"), Path("test/BTest.kt"), fault("b1", True, "same"))
+            run2 = store.start_run()
+            store.append(run2, Path("src/A.kt"), Path("test/ATest.kt"), fault("a2"))
+
+            assert store.latest_run_id() == run2
+            assert [f["diff"] for f in store.iter_faults()] == ["a1", "b1", "a2"]
+            assert [f["diff"] for f in store.iter_faults(run_id=run1)] == ["a1", "b1"]
+            assert [f["diff"] for f in store.iter_faults(source_code_path=Path("src/A.kt"))] == ["a1", "a2"]
+
+            equivalent = list(store.iter_faults(is_equivalent=True))
+            assert len(equivalent) == 1
+            assert equivalent[0]["is_equivalent"] is True
+            assert equivalent[0]["reason"] == "same"
+            assert equivalent[0]["test_code_path"] == "test/BTest.kt"
+
+    def test_appended_faults_survive_without_close(self, tmp_path: Path):
+        """closeせずに終了しても、追記したFAULTが別の接続から読めることを確認"""
+        path = tmp_path / "faults.sqlite3"
+        store = FaultStore(path)
+        run_id = store.start_run()
+        store.append(run_id, Path("src/A.kt"), None, fault("a1"))
+
+        with FaultStore(path) as reader:
+            assert [f["diff"] for f in reader.iter_faults(run_id=run_id)] == ["a1"]
+        store.close()
+
+    def test_wal_mode(self, tmp_path: Path):
+        """WALモードで作成されることを確認"""
+        path = tmp_path / "faults.sqlite3"
+        FaultStore(path).close()
+        assert sqlite3.connect(path).execute("PRAGMA journal_mode").fetchone()[0] == "wal"
@@ -0,0 +1,128 @@
+import pytest
+import subprocess
+import time
+from pathlib import Path
+from unittest.mock import patch
+from utils.gradle_runner import GradleRunner, DaemonGradleRunner
+from utils.repository import Repository
+from utils.test_results import TestTimeout
+
+
+def completed(args, returncode=0, stdout="", stderr=""):
+    return subprocess.CompletedProcess(args, returncode, stdout, stderr)
+
+
+class TestGradleRunner:
+    def test_run_uses_mise(self, tmp_path: Path):
+        """従来通りmise経由でgradleを起動することを確認"""
+        runner = GradleRunner()
+        with patch("utils.gradle_runner.subprocess.run", return_value=completed([])) as run:
+            result = runner.run(tmp_path, ["test"])
+
+        assert run.call_args.args[0] == ["mise", "x", "gradle", "--", "gradle", "test"]
+        assert result.is_success
+        assert not result.warm
+
+    def test_run_records_warm_runs(self, tmp_path: Path):
+        """同じディレクトリでの2回目以降の実行がwarmとして記録されることを確認"""
+        runner = GradleRunner()
+        with patch("utils.gradle_runner.subprocess.run", return_value=completed([])):
+            runner.run(tmp_path, ["test"])
+            runner.run(tmp_path, ["test"])
+
+        assert [result.warm for result in runner.results] == [False, True]
+        assert "cold: 1 runs" in runner.report()
+        assert "warm: 1 runs" in runner.report()
+
+    def test_run_check_raises(self, tmp_path: Path):
+        """check=Trueで失敗した場合はCalledProcessErrorが送出されることを確認"""
+        runner = GradleRunner()
+        with patch("utils.gradle_runner.subprocess.run", return_value=completed([], returncode=1)):
+            with pytest.raises(subprocess.CalledProcessError):
+                runner.run(tmp_path, ["test"], check=True)
+
+
+def is_running(pid: int) -> bool:
+    """プロセスが実行中かどうかを返します。回収されていないゾンビは終了したものとみなします。"""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            return f.read().rsplit(")", 1)[1].split()[0] != "Z"
+    except FileNotFoundError:
+        return False
+
+
+class SleepRunner(GradleRunner):
+    """Gradleの代わりに、子プロセスを残すシェルを起動するランナー"""
+    kill_grace_period = 0.5
+
+    def _command(self, path: Path):
+        return ["sh", "-c"]
+
+
+class TestGradleRunnerTimeout:
+    def test_timeout_kills_process_group(self, tmp_path: Path):
+        """タイムアウトした場合に子プロセスを含めて終了し、timed_outの結果を返すことを確認"""
+        runner = SleepRunner()
+        pid_file = tmp_path / "child.pid"
+        # SIGINTを無視する子プロセス（テストのワーカーの代わり）を起動する
+        result = runner.run(tmp_path, [f"trap '' INT; sleep 30 & echo $! > {pid_file}; wait"], capture_output=True, timeout=0.5)
+
+        assert result.timed_out
+        assert not result.is_success
+        assert result.elapsed < 10
+        assert "timed out" in str(result)
+
+        child_pid = int(pid_file.read_text())
+        for _ in range(50):
+            if not is_running(child_pid):
+                break
+            time.sleep(0.1)
+        assert not is_running(child_pid)
+
+    def test_finishes_within_timeout(self, tmp_path: Path):
+        """タイムアウト内に終了した場合は通常の結果を返すことを確認"""
+        runner = SleepRunner()
+        result = runner.run(tmp_path, ["echo done"], capture_output=True, timeout=10)
+
+        assert result.is_success
+        assert not result.timed_out
+        assert result.stdout.strip() == "done"
+
+class TestDaemonGradleRunner:
+    def test_mise_env_is_resolved_once(self, tmp_path: Path):
+        """miseの環境変数の解決がディレクトリごとに一度だけ行われることを確認"""
+        runner = DaemonGradleRunner()
+
+        def run(args, **kwargs):
+            if args[:2] == ["mise", "env"]:
+                return completed(args, stdout='{"PATH": "/mise/bin"}')
+            return completed(args)
+
+        with patch("utils.gradle_runner.subprocess.run", side_effect=run) as mock_run:
+            runner.run(tmp_path, ["test"])
+            runner.run(tmp_path, ["ktlintFormat"])
+
+        commands = [call.args[0] for call in mock_run.call_args_list]
+        assert commands.count(["mise", "env", "--json"]) == 1
+        assert commands[1][:2] == ["gradle", "--daemon"]
+        assert commands[1][-1] == "test"
+        assert mock_run.call_args.kwargs["env"]["PATH"] == "/mise/bin"
+
+
+class TestRepositoryWithRunner:
+    def test_run_tests_returns_output(self, tmp_path: Path):
+        """run_testsがランナーの結果を返すことを確認"""
+        repository = Repository(tmp_path)
+        with patch("utils.gradle_runner.subprocess.run", return_value=completed([], returncode=1, stdout="out", stderr="err")):
+            report = repository.run_tests()
+        assert not report.is_success
+        assert (report.gradle_result.stdout, report.gradle_result.stderr) == ("out", "err")
+
+    def test_test_raises_timeout(self, tmp_path: Path):
+        """テストがタイムアウトした場合はTestTimeoutを送出することを確認"""
+        repository = Repository(tmp_path, runner=SleepRunner())
+        with patch.object(SleepRunner, "_command", return_value=["sh", "-c", "sleep 30", "--"]):
+            with pytest.raises(TestTimeout) as e:
+                repository.test(timeout=0.5)
+        assert e.value.report.timed_out
+        assert "TIMED OUT" in e.value.report.summary()
@@ -0,0 +1,56 @@
+from pathlib import Path
+from utils.kill_history import KillHistory, KillMatrix
+from utils.test_results import TestCaseResult
+
+
+def case(test_id: str, status: str = "passed", duration: float = 0.1) -> TestCaseResult:
+    class_name, name = test_id.rsplit(".", 1)
+    return TestCaseResult(class_name, name, status, duration)
+
+
+class TestKillHistory:
+    def test_priority_tests(self):
+        """MUTANTを検出した回数の多いテストから順に返されることを確認"""
+        history = KillHistory()
+        history.record("A.kt", "m1", [case("ATest.b()", "failed"), case("ATest.c()", "failed")])
+        history.record("A.kt", "m2", [case("ATest.c()", "failed"), case("ATest.a()")])
+        history.record("A.kt", "m3", [case("ATest.a()", "error")])
+        history.record("B.kt", "m4", [case("BTest.x()", "failed")])
+
+        assert history.priority_tests("A.kt") == ["ATest.c()", "ATest.a()", "ATest.b()"]
+        assert history.priority_tests("A.kt", limit=1) == ["ATest.c()"]
+        assert history.priority_tests("C.kt") == []
+
+    def test_same_mutant_is_counted_once(self):
+        """同じMUTANTを再びテストした場合は、最新の結果で置き換えられることを確認"""
+        history = KillHistory()
+        history.record("A.kt", "m1", [case("ATest.a()", "failed")])
+        history.record("A.kt", "m1", [case("ATest.a()", "failed")])
+        history.record("A.kt", "m2", [case("ATest.b()", "failed")])
+        assert history.priority_tests("A.kt") == ["ATest.a()", "ATest.b()"]
+
+        history.record("A.kt", "m1", [case("ATest.a()")])
+        assert history.priority_tests("A.kt") == ["ATest.b()"]
+
+
+class TestKillMatrix:
+    def test_priority_tests(self, tmp_path: Path):
+        """検出した回数の多い順、同じ回数なら実行時間の短い順に返され、次の実行でも使えることを確認"""
+        path = tmp_path / "kill_matrix.sqlite3"
+        matrix = KillMatrix(path)
+        matrix.record("A.kt", "m1", [case("ATest.slow()", "failed", 2.0), case("ATest.fast()", "failed", 0.1), case("ATest.never()")])
+        matrix.record("A.kt", "m2", [case("ATest.slow()", "failed", 2.0), case("ATest.fast()", "passed", 0.1), case("ATest.skip()", "skipped")])
+        matrix.record("A.kt", "m3", [case("ATest.other()", "failed", 0.5)])
+        matrix.close()
+
+        matrix = KillMatrix(path)
+        assert matrix.priority_tests("A.kt") == ["ATest.slow()", "ATest.fast()", "ATest.other()"]
+        assert matrix.kill_rate("A.kt") == {"ATest.fast()": 0.5, "ATest.never()": 0.0, "ATest.other()": 1.0, "ATest.slow()": 1.0}
+        assert matrix.priority_tests("B.kt") == []
+
+    def test_same_mutant_is_replaced(self, tmp_path: Path):
+        """同じMUTANTとテストの組は最新の結果で置き換えられることを確認"""
+        matrix = KillMatrix(tmp_path / "kill_matrix.sqlite3")
+        matrix.record("A.kt", "m1", [case("ATest.a()", "failed")])
+        matrix.record("A.kt", "m1", [case("ATest.a()", "passed")])
+        assert matrix.priority_tests("A.kt") == []
@@ -0,0 +1,56 @@
+from utils.kotlin_tokens import is_token_equivalent, normalize_kotlin, token_hash
+
+
+class TestNormalizeKotlin:
+    def test_drops_comments_and_whitespace(self):
+        """空白、行コメント、入れ子のブロックコメントが除かれることを確認"""
+        code = "val x  =  1 // comment\n/* outer /* inner */ */\nfun f() = x"
+        assert normalize_kotlin(code) == ["val", "x", "=", "1", "<NL>", "fun", "f", "(", ")", "=", "x"]
+
+    def test_comments_in_strings_are_kept(self):
+        """文字列の中のコメント記号や文字列テンプレートは文字列の一部として扱われることを確認"""
+        assert not is_token_equivalent('val s = "a // b"', 'val s = "a "')
+        assert normalize_kotlin('val s = "x${"}"}y"') == ["val", "s", "=", '"x${"}"}y"']
+
+    def test_newlines_inside_expressions(self):
+        """式の途中の改行は無視され、文の区切りになる改行は残ることを確認"""
+        assert is_token_equivalent("foo(\n    a,\n    b,\n)", "foo(a, b)")
+        assert is_token_equivalent("val y = x\n    .map { it }\n    ?: 0", "val y = x.map { it } ?: 0")
+        assert is_token_equivalent("a = 1; b = 2", "a = 1\nb = 2")
+        # 改行の後の単項演算子は別の文になる
+        assert not is_token_equivalent("val x = a\n-b", "val x = a - b")
+
+    def test_non_ascii_identifiers(self):
+        """ASCII以外の文字を含む識別子が1つのトークンになることを確認"""
+        assert normalize_kotlin("val café = 1") == ["val", "café", "=", "1"]
+        assert normalize_kotlin("val 平均 = a1") == ["val", "平均", "=", "a1"]
+        assert not is_token_equivalent("val 平均 = 1", "val 合計 = 1")
+
+    def test_literals(self):
+        """同じ値と型を表す数値リテラルが同一視されることを確認"""
+        assert is_token_equivalent("val x = 1_000", "val x = 1000")
+        assert is_token_equivalent("val x = 0xFF", "val x = 255")
+        assert is_token_equivalent("val x = 0b101L", "val x = 5l")
+        assert is_token_equivalent("val x = 1.50f", "val x = 1.5F")
+        assert is_token_equivalent("val x = 1e3", "val x = 1000.0")
+        # 型の異なるリテラルは区別する
+        assert not is_token_equivalent("val x = 1", "val x = 1L")
+        assert not is_token_equivalent("val x = 1", "val x = 1.0")
+        assert normalize_kotlin("1..2") == ["1", "..", "2"]
+
+    def test_redundant_parentheses(self):
+        """1つの値だけを囲む括弧は除かれ、関数呼び出しや制御構文の括弧は残ることを確認"""
+        assert is_token_equivalent("return (x)", "return x")
+        assert is_token_equivalent("val y = ((1)) + a", "val y = 1 + a")
+        assert not is_token_equivalent("f(x)", "f x")
+        assert not is_token_equivalent("val y = (a + b) * c", "val y = a + b * c")
+        # ラムダの引数や for の分解宣言の括弧は component1() を呼ぶため残す
+        assert not is_token_equivalent("list.map { (p) -> p }", "list.map { p -> p }")
+        assert not is_token_equivalent("list.map { a, (p) -> p }", "list.map { a, p -> p }")
+        assert not is_token_equivalent("list.map { (p): Pair<Int, Int> -> p }", "list.map { p: Pair<Int, Int> -> p }")
+        assert not is_token_equivalent("for ((a) in xs) f(a)", "for (a in xs) f(a)")
+
+    def test_token_hash(self):
+        """書式だけが異なるソースコードのハッシュ値が一致することを確認"""
+        assert token_hash("fun f(a: Int) = a + 1") == token_hash("fun f(\n    a: Int,\n) = a+1 // inc")
+        assert token_hash("fun f(a: Int) = a + 1") != token_hash("fun f(a: Int) = a - 1")
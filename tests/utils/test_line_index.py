@@ -0,0 +1,73 @@
+import unittest
+
+from utils.detect_diff_hunks import DiffHunkProcessor
+from utils.line_index import LineIndex
+
+
+SOURCE_LINES = [
+    "class Calc {",
+    "    fun add(a: Int, b: Int): Int {",
+    "        return a + b",
+    "    }",
+    "",
+    "    fun sub(a: Int, b: Int): Int {",
+    "        return a - b",
+    "    }",
+    "}",
+]
+
+
+class TestLineIndex(unittest.TestCase):
+    def test_find_line(self):
+        """空白を除いた内容で行が検索できることを確認"""
+        index = LineIndex(SOURCE_LINES)
+        self.assertEqual(index.find_line("return a - b"), [7])
+        self.assertEqual(index.find_line("  }  "), [4, 8, 9])
+        self.assertEqual(index.find_line("return a * b"), [])
+
+    def test_similar_lines(self):
+        """内容が似ている行が検索できることを確認"""
+        index = LineIndex(SOURCE_LINES)
+        similar = index.similar_lines("fun sub(a: Int, c: Int): Int {")
+        self.assertIn(6, similar)
+        self.assertGreater(similar[6], similar.get(2, 0))
+
+    def test_candidate_starts(self):
+        """一致しない行を含むハンクでも開始位置が候補の先頭になることを確認"""
+        index = LineIndex(SOURCE_LINES)
+        original_lines = ["fun sub(a: Int, c: Int): Int {", "return a - b", "}"]
+        self.assertEqual(index.candidate_starts(original_lines)[0], 6)
+
+    def test_candidate_starts_without_clues(self):
+        """手がかりがない場合は候補が空になることを確認"""
+        index = LineIndex(SOURCE_LINES)
+        self.assertEqual(index.candidate_starts(["xyz"]), [])
+
+
+class TestFindBestMatchPosition(unittest.TestCase):
+    def test_matches_linear_scan(self):
+        """索引による位置の推測が全ての位置を調べた場合と一致することを確認"""
+        source_lines = []
+        for i in range(50):
+            source_lines += [
+                f"    fun f{i}(x: Int): Int {{",
+                f"        val y{i} = x * {i}",
+                f"        return y{i} + {i}",
+                "    }",
+                "",
+            ]
+        processor = DiffHunkProcessor("\n".join(source_lines), "")
+
+        for i in [0, 17, 49]:
+            original_lines = [f"fun f{i}(x: Long): Int {{", f"val y{i} = x * {i}", f"return y{i} + {i}", "}"]
+            expected = max(
+                range(1, len(source_lines) + 1),
+                key=lambda start: (processor._similarity_score(original_lines, start, len(original_lines)), -start),
+            )
+            start, _ = processor._find_best_match_position(original_lines)
+            self.assertEqual(start, expected)
+            self.assertEqual(start, i * 5 + 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,25 @@
+from langchain_core.prompts import ChatPromptTemplate
+from utils.llm import CACHE_POINT, CLAUDE_3_5_SONNET, CLAUDE_3_7_SONNET, cached_message
+
+
+class FakeLLM:
+    def __init__(self, model_id: str):
+        self.model_id = model_id
+
+
+class TestCachedMessage:
+    def test_cache_point_for_supported_model(self):
+        """プロンプトキャッシュに対応するモデルでは、メッセージの後にキャッシュポイントが置かれることを確認"""
+        prompt = ChatPromptTemplate.from_messages([
+            ("system", "INSTRUCTION"),
+            cached_message(FakeLLM(CLAUDE_3_7_SONNET), "user", "SOURCE_CODE: {source_code}"),
+            ("user", "{diffs}"),
+        ])
+        messages = prompt.format_messages(source_code="class A", diffs="DIFF #1")
+
+        assert messages[1].content == [{"type": "text", "text": "SOURCE_CODE: class A"}, CACHE_POINT]
+        assert messages[2].content == "DIFF #1"
+
+    def test_no_cache_point_for_unsupported_model(self):
+        """プロンプトキャッシュに対応しないモデルでは、通常のメッセージになることを確認"""
+        assert cached_message(FakeLLM(CLAUDE_3_5_SONNET), "user", "{source_code}") == ("user", "{source_code}")
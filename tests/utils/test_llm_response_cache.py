@@ -0,0 +1,99 @@
+import asyncio
+import os
+import pytest
+from pathlib import Path
+from langchain_core.messages import AIMessage
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import RunnableLambda
+from tools.apply_to_file import apply_to_file
+from utils.llm import CACHE_POINT
+from utils.llm_response_cache import LLMResponseCache, LLMResponseCacheMiss, OFF, RECORD, REPLAY
+from utils.llm_scheduler import LLMCallScheduler
+from utils.single_tool_caller import SingleToolCaller
+
+
+class FakeLLM:
+    def __init__(self, diff: str = "--- a\n+++ b\n", temperature: float = 0.0):
+        self.model_id = "fake-model"
+        self.temperature = temperature
+        self.diff = diff
+        self.calls = 0
+
+    def bind_tools(self, tools, tool_choice=None):
+        def respond(_):
+            self.calls += 1
+            return AIMessage(content="", tool_calls=[{"name": tool_choice, "args": {"diff": self.diff}, "id": "1"}])
+        return RunnableLambda(respond)
+
+
+class OfflineLLM(FakeLLM):
+    def bind_tools(self, tools, tool_choice=None):
+        raise AssertionError("LLMが呼び出されました")
+
+
+PROMPT = ChatPromptTemplate.from_messages([("system", "mutate"), ("user", "{source_code}")])
+
+
+class TestLLMResponseCache:
+    def call(self, llm, cache, source_code="fun main() {}"):
+        caller = SingleToolCaller(llm, apply_to_file, scheduler=LLMCallScheduler(), cache=cache)
+        return asyncio.run(caller.call(PROMPT, {"source_code": source_code}))
+
+    def test_record_and_replay(self, tmp_path: Path):
+        """recordモードで保存した応答が、replayモードでLLMを呼び出さずに返されることを確認"""
+        llm = FakeLLM()
+        record = LLMResponseCache(tmp_path, mode=RECORD)
+        assert self.call(llm, record) == llm.diff
+        assert self.call(llm, record) == llm.diff
+        assert llm.calls == 1
+        assert (record.hits, record.misses) == (1, 1)
+
+        replay = LLMResponseCache(tmp_path, mode=REPLAY)
+        assert self.call(OfflineLLM(), replay) == llm.diff
+
+    def test_replay_miss(self, tmp_path: Path):
+        """replayモードでキャッシュがない場合はエラーになることを確認"""
+        with pytest.raises(LLMResponseCacheMiss):
+            self.call(OfflineLLM(), LLMResponseCache(tmp_path, mode=REPLAY))
+
+    def test_off(self, tmp_path: Path):
+        """offモードではキャッシュが使われないことを確認"""
+        llm = FakeLLM()
+        cache = LLMResponseCache(tmp_path, mode=OFF)
+        self.call(llm, cache)
+        self.call(llm, cache)
+        assert llm.calls == 2
+        assert not list(tmp_path.glob("*/*.json"))
+
+    def test_key(self, tmp_path: Path):
+        """プロンプト、temperature、Toolが変わるとキーが変わることを確認"""
+        cache = LLMResponseCache(tmp_path)
+        messages = PROMPT.format_messages(source_code="a")
+        key = cache.key(FakeLLM(), messages, apply_to_file)
+        assert key == cache.key(FakeLLM(), PROMPT.format_messages(source_code="a"), apply_to_file)
+        assert key != cache.key(FakeLLM(), PROMPT.format_messages(source_code="b"), apply_to_file)
+        assert key != cache.key(FakeLLM(temperature=1.0), messages, apply_to_file)
+
+    def test_key_ignores_cache_points(self, tmp_path: Path):
+        """プロンプトキャッシュのキャッシュポイントの有無でキーが変わらないことを確認"""
+        cache = LLMResponseCache(tmp_path)
+        plain = ChatPromptTemplate.from_messages([("user", "SOURCE_CODE: {source_code}")])
+        cached = ChatPromptTemplate.from_messages([("user", [{"type": "text", "text": "SOURCE_CODE: {source_code}"}, CACHE_POINT])])
+        assert cache.key(FakeLLM(), plain.format_messages(source_code="a"), apply_to_file) == \
+            cache.key(FakeLLM(), cached.format_messages(source_code="a"), apply_to_file)
+
+    def test_eviction(self, tmp_path: Path):
+        """合計サイズが上限を超えると、最後に使われた時刻が古いものから削除されることを確認"""
+        cache = LLMResponseCache(tmp_path, max_bytes=250)
+        keys = [f"{i:02d}" + "0" * 62 for i in range(3)]
+        for i, key in enumerate(keys[:2]):
+            cache.put(key, "x" * 80)
+            os.utime(cache._path(key), (i, i))
+
+        # 最初のキャッシュを使うと、2番目のキャッシュが先に削除される
+        assert cache.get(keys[0]) == "x" * 80
+        cache.put(keys[2], "x" * 80)
+
+        assert cache._path(keys[0]).exists()
+        assert not cache._path(keys[1]).exists()
+        assert cache._path(keys[2]).exists()
@@ -0,0 +1,120 @@
+import asyncio
+import pytest
+from types import SimpleNamespace
+from utils.llm_scheduler import LLMCallScheduler, is_throttling_error
+
+
+class ThrottlingException(Exception):
+    pass
+
+
+class FakeLLM:
+    def __init__(self, model_id: str = "model-a"):
+        self.model_id = model_id
+
+
+class TestLLMCallScheduler:
+    def test_record_usage(self):
+        """トークン数とプロンプトキャッシュのトークン数がモデルごとに集計されることを確認"""
+        scheduler = LLMCallScheduler()
+        llm = FakeLLM()
+        scheduler.record_usage(llm, {"input_tokens": 1200, "output_tokens": 50, "input_token_details": {"cache_read": 0, "cache_creation": 1100}})
+        scheduler.record_usage(llm, {"input_tokens": 1210, "output_tokens": 40, "input_token_details": {"cache_read": 1100, "cache_creation": 0}})
+        scheduler.record_usage(llm, {"input_tokens": 10, "output_tokens": 5})
+        scheduler.record_usage(llm, None)
+
+        assert scheduler.usage == {"model-a": {"input": 2420, "output": 95, "cache_read": 1100, "cache_write": 1100}}
+        assert "model-a: 2420 input tokens (cache read: 1100, cache write: 1100), 95 output tokens" in scheduler.report()
+
+    def test_chain_is_cached_per_llm_and_tool(self):
+        """同じLLMとToolの組み合わせではチェーンが再利用されることを確認"""
+        scheduler = LLMCallScheduler()
+        llm = FakeLLM()
+        tool = SimpleNamespace(name="apply_to_file")
+        built = []
+
+        def build():
+            built.append(object())
+            return built[-1]
+
+        first = scheduler.chain(llm, tool, build)
+        assert scheduler.chain(llm, tool, build) is first
+        assert scheduler.chain(FakeLLM(), tool, build) is not first
+        assert len(built) == 2
+
+    def test_in_flight_limits(self):
+        """全体とモデルごとの同時実行数が制限されることを確認"""
+        scheduler = LLMCallScheduler(max_in_flight=3, max_in_flight_per_model=2, timeout=None)
+        llm_a = FakeLLM("model-a")
+        llm_b = FakeLLM("model-b")
+        running = {"model-a": 0, "model-b": 0, "total": 0}
+        peaks = {"model-a": 0, "model-b": 0, "total": 0}
+
+        async def call(model):
+            for key in [model, "total"]:
+                running[key] += 1
+                peaks[key] = max(peaks[key], running[key])
+            await asyncio.sleep(0.01)
+            for key in [model, "total"]:
+                running[key] -= 1
+            return model
+
+        async def run():
+            calls = [scheduler.run(llm, lambda llm=llm: call(llm.model_id)) for llm in [llm_a, llm_b] * 4]
+            return await asyncio.gather(*calls)
+
+        results = asyncio.run(run())
+        assert results == ["model-a", "model-b"] * 4
+        assert peaks["model-a"] <= 2
+        assert peaks["model-b"] <= 2
+        assert peaks["total"] <= 3
+        assert scheduler.calls == 8
+        assert 0 < scheduler.max_queue_depth
+        assert sum(scheduler.histogram("model-a").values()) == 4
+
+    def test_retry_throttling(self):
+        """スロットリングの場合は再試行されることを確認"""
+        scheduler = LLMCallScheduler(base_delay=0.001, max_delay=0.001)
+        attempts = []
+
+        async def call():
+            attempts.append(1)
+            if len(attempts) < 3:
+                raise ThrottlingException("rate exceeded")
+            return "ok"
+
+        assert asyncio.run(scheduler.run(FakeLLM(), call)) == "ok"
+        assert len(attempts) == 3
+        assert scheduler.retries == 2
+
+    def test_no_retry_for_other_errors(self):
+        """スロットリング以外のエラーは再試行されないことを確認"""
+        scheduler = LLMCallScheduler(base_delay=0.001)
+        attempts = []
+
+        async def call():
+            attempts.append(1)
+            raise ValueError("invalid")
+
+        with pytest.raises(ValueError):
+            asyncio.run(scheduler.run(FakeLLM(), call))
+        assert len(attempts) == 1
+        assert scheduler.failures == 1
+
+    def test_timeout(self):
+        """タイムアウトした呼び出しは再試行の上限を超えるとエラーになることを確認"""
+        scheduler = LLMCallScheduler(max_retries=1, base_delay=0.001, timeout=0.01)
+
+        async def call():
+            await asyncio.sleep(1)
+
+        with pytest.raises(asyncio.TimeoutError):
+            asyncio.run(scheduler.run(FakeLLM(), call))
+        assert scheduler.calls == 2
+
+    def test_is_throttling_error(self):
+        """botocoreのClientErrorのエラーコードからスロットリングが判定されることを確認"""
+        error = Exception("error")
+        error.response = {"Error": {"Code": "ThrottlingException"}}
+        assert is_throttling_error(error)
+        assert not is_throttling_error(Exception("error"))
@@ -0,0 +1,28 @@
+from unittest.mock import patch
+from utils.mutant_deduplicator import MutantDeduplicator
+
+
+class TestMutantDeduplicator:
+    def test_add(self):
+        """書式だけが異なるMUTANTは重複、元のソースコードと同じMUTANTは変更なしとして数えることを確認"""
+        deduplicator = MutantDeduplicator("fun f(a: Int) = a + 1\n")
+
+        assert deduplicator.add("fun f(a: Int) = a - 1\n")
+        assert not deduplicator.add("fun f(a: Int) = a-1 // mutant\n")
+        assert not deduplicator.add("fun f(a: Int) =\n    a + 1\n")
+        assert deduplicator.add("fun f(a: Int) = a * 1\n")
+
+        assert (deduplicator.unique, deduplicator.duplicates, deduplicator.noops) == (2, 1, 1)
+        assert deduplicator.report() == "mutant dedup: 2 unique, 1 duplicates, 1 no-ops, 2 test runs saved"
+
+    def test_falls_back_to_raw_hash(self):
+        """トークン列の正規化に失敗した場合は、ソースコードそのもので比較して続けることを確認"""
+        with patch("utils.mutant_deduplicator.token_hash", side_effect=AttributeError("broken")):
+            deduplicator = MutantDeduplicator("fun f() = 1\n")
+            assert not deduplicator.add("fun f() = 1\n")
+            assert deduplicator.add("fun f() = 2\n")
+            assert not deduplicator.add("fun f() = 2\n")
+            # 書式だけが異なるMUTANTは区別される
+            assert deduplicator.add("fun f() =  2\n")
+
+        assert (deduplicator.unique, deduplicator.duplicates, deduplicator.noops) == (2, 1, 1)
@@ -0,0 +1,108 @@
+import unittest
+
+from utils.mutant_schemata import build_mutant_schema, find_functions, mask_lines, SWITCH_NAME
+
+
+SOURCE = """package com.example
+
+import kotlin.math.abs
+
+class Calc {
+    /**
+     * 足し算
+     */
+    fun add(a: Int, b: Int): Int {
+        val s = "{"
+        return a + b
+    }
+
+    override fun toString(): String = "Calc"
+
+    fun sum(vararg values: Int): Int {
+        var total = 0
+        for (v in values) {
+            total += v
+        }
+        return total
+    }
+}"""
+
+
+class TestMutantSchemata(unittest.TestCase):
+    def test_mask_lines(self):
+        """文字列とコメントがマスクされ、行の長さが維持されることを確認"""
+        lines = ['val s = "{" // }', "val c = '{'"]
+        masked = mask_lines(lines)
+        self.assertEqual(masked[0].strip(), "val s =")
+        self.assertEqual(masked[1].strip(), "val c =")
+        self.assertEqual([len(line) for line in masked], [len(line) for line in lines])
+
+    def test_find_functions(self):
+        """ブロック形式と式形式の関数が検出されることを確認"""
+        functions = {function.name: function for function in find_functions(SOURCE.split("\n"))}
+
+        self.assertEqual(functions["add"].start, 8)
+        self.assertEqual(functions["add"].body_start, 8)
+        self.assertEqual(functions["add"].end, 11)
+        self.assertEqual(functions["add"].params, ["a", "b"])
+
+        self.assertIsNone(functions["toString"].body_start)
+        self.assertEqual(functions["sum"].params, ["*values"])
+        self.assertEqual(functions["sum"].end, 21)
+
+    def test_build_schema(self):
+        """関数内のMUTANTがコピーされ、切り替えられることを確認"""
+        mutant1 = SOURCE.replace("return a + b", "return a - b")
+        mutant2 = SOURCE.replace("total += v", "total -= v")
+        schema = build_mutant_schema(SOURCE, [mutant1, mutant2])
+
+        self.assertEqual(schema.mutant_ids, {0: 1, 1: 2})
+        self.assertEqual(schema.unsupported, [])
+        self.assertIn(f"private val {SWITCH_NAME}: Int = System.getenv(\"MUTANT_ID\")?.toIntOrNull() ?: 0", schema.code)
+        self.assertIn(f"        if ({SWITCH_NAME} == 1) return add__mutant1(a, b)", schema.code)
+        self.assertIn(f"        if ({SWITCH_NAME} == 2) return sum__mutant2(*values)", schema.code)
+        self.assertIn("    private fun add__mutant1(a: Int, b: Int): Int {\n        val s = \"{\"\n        return a - b\n    }", schema.code)
+        self.assertIn("        total -= v", schema.code)
+        # 元の関数は変更されない
+        self.assertIn("        return a + b", schema.code)
+
+        # 切り替え用の変数はimportの後に宣言される
+        lines = schema.code.split("\n")
+        self.assertLess(lines.index("import kotlin.math.abs"), lines.index(f"private val {SWITCH_NAME}: Int = System.getenv(\"MUTANT_ID\")?.toIntOrNull() ?: 0"))
+
+    def test_multiple_mutants_in_same_function(self):
+        """同じ関数に複数のMUTANTがある場合、それぞれコピーされることを確認"""
+        mutant1 = SOURCE.replace("return a + b", "return a - b")
+        mutant2 = SOURCE.replace("return a + b", "return a * b")
+        schema = build_mutant_schema(SOURCE, [mutant1, mutant2])
+
+        self.assertEqual(schema.mutant_ids, {0: 1, 1: 2})
+        self.assertIn("private fun add__mutant1(", schema.code)
+        self.assertIn("private fun add__mutant2(", schema.code)
+
+    def test_unsupported_mutants(self):
+        """関数本体の外側やスキーマにできないMUTANTがunsupportedになることを確認"""
+        # 式形式の関数
+        mutant1 = SOURCE.replace('= "Calc"', '= "calc"')
+        # シグネチャの変更
+        mutant2 = SOURCE.replace("fun add(a: Int, b: Int): Int {", "fun add(a: Int, b: Int): Int  {")
+        # 複数の関数にまたがる変更
+        mutant3 = SOURCE.replace("return a + b", "return a - b").replace("total += v", "total -= v")
+        schema = build_mutant_schema(SOURCE, [mutant1, mutant2, mutant3, None])
+
+        self.assertEqual(schema.mutant_ids, {})
+        self.assertEqual(schema.unsupported, [0, 1, 2, 3])
+        self.assertEqual(schema.code, SOURCE)
+
+    def test_override_is_removed_from_copy(self):
+        """コピーした関数からoverrideなどの修飾子が取り除かれることを確認"""
+        source = "class A : B {\n    override fun f(x: Int): Int {\n        return x\n    }\n}"
+        mutant = source.replace("return x", "return -x")
+        schema = build_mutant_schema(source, [mutant])
+
+        self.assertIn("    private fun f__mutant1(x: Int): Int {", schema.code)
+        self.assertIn("    override fun f(x: Int): Int {", schema.code)
+
+
+if __name__ == "__main__":
+    unittest.main()
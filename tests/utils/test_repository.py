@@ -0,0 +1,206 @@
+import pytest
+import asyncio
+import subprocess
+from pathlib import Path
+from unittest.mock import patch
+from utils.repository import Repository, WorktreePool, get_test_class_name
+
+
+class TestWorktreePool:
+    @pytest.fixture
+    def repository(self, tmp_path: Path) -> Repository:
+        """サブディレクトリにプロジェクトを持つgitリポジトリを作成する"""
+        root = tmp_path / "origin"
+        project = root / "project"
+        (project / "src").mkdir(parents=True)
+        (project / "src" / "Main.kt").write_text("fun main() {}\n")
+
+        def git(*args):
+            subprocess.run(["git", *args], cwd=root, check=True, capture_output=True)
+
+        git("init")
+        git("add", "-A")
+        git("-c", "user.name=test", "-c", "user.email=test@example.com", "commit", "-m", "init")
+        return Repository(project)
+
+    def test_open_creates_worktrees(self, repository, tmp_path):
+        """worktreeが作成され、プロジェクトの位置が維持されることを確認"""
+        with WorktreePool(repository, 2, root=tmp_path / "pool") as pool:
+            assert len(pool.repositories) == 2
+            for worktree in pool.repositories:
+                assert worktree.path.name == "project"
+                assert (worktree.path / "src" / "Main.kt").read_text() == "fun main() {}\n"
+
+        assert not (tmp_path / "pool" / "worktree-0").exists()
+        assert not (tmp_path / "pool" / "worktree-1").exists()
+
+    def test_translate(self, repository, tmp_path):
+        """元のリポジトリのパスがworktree内のパスに変換されることを確認"""
+        with WorktreePool(repository, 1, root=tmp_path / "pool") as pool:
+            worktree = pool.repositories[0]
+            translated = pool.translate(repository.path / "src" / "Main.kt", worktree)
+            assert translated == worktree.path / "src" / "Main.kt"
+
+    def test_lease_is_exclusive(self, repository, tmp_path):
+        """同じworktreeが同時に貸し出されないことを確認"""
+        leased = []
+        in_use = set()
+
+        async def work(pool):
+            async with pool.lease() as worktree:
+                assert worktree.path not in in_use
+                in_use.add(worktree.path)
+                leased.append(worktree.path)
+                await asyncio.sleep(0.01)
+                in_use.remove(worktree.path)
+
+        async def run():
+            with WorktreePool(repository, 2, root=tmp_path / "pool") as pool:
+                await asyncio.gather(*[work(pool) for _ in range(6)])
+
+        asyncio.run(run())
+        assert len(leased) == 6
+        assert len(set(leased)) == 2
+
+    def test_lazy_creates_worktrees_on_demand(self, repository, tmp_path):
+        """lazyの場合は、貸し出すときに空きがなければsize個までworktreeが作成されることを確認"""
+        async def run():
+            with WorktreePool(repository, 2, root=tmp_path / "pool", lazy=True) as pool:
+                assert pool.repositories == []
+                async with pool.lease():
+                    assert len(pool.repositories) == 1
+                async with pool.lease() as first:
+                    # 返却されたworktreeがあれば新しく作成しない
+                    assert len(pool.repositories) == 1
+                    async with pool.lease() as second:
+                        assert second is not first
+                        assert len(pool.repositories) == 2
+                assert (second.path / "src" / "Main.kt").read_text() == "fun main() {}\n"
+
+        asyncio.run(run())
+        assert not (tmp_path / "pool" / "worktree-0").exists()
+        assert not (tmp_path / "pool" / "worktree-1").exists()
+
+    def test_invalid_size(self, repository):
+        """worktreeの数が0の場合はエラーになることを確認"""
+        with pytest.raises(ValueError):
+            WorktreePool(repository, 0)
+
+
+class TestTargetedTests:
+    def completed(self, returncode=0, stdout=""):
+        return subprocess.CompletedProcess([], returncode, stdout, "")
+
+    def test_get_test_class_name(self, tmp_path: Path):
+        """package宣言とファイル名から完全修飾名が得られることを確認"""
+        test_code_path = tmp_path / "StatisticsCalculatorTest.kt"
+        test_code_path.write_text("package com.example.math\n\nclass StatisticsCalculatorTest\n")
+        assert get_test_class_name(test_code_path) == "com.example.math.StatisticsCalculatorTest"
+
+    def test_get_test_class_name_without_package(self, tmp_path: Path):
+        """package宣言がない場合はクラス名のみになることを確認"""
+        test_code_path = tmp_path / "CalculatorTest.kt"
+        test_code_path.write_text("class CalculatorTest\n")
+        assert get_test_class_name(test_code_path) == "CalculatorTest"
+
+    def test_test_with_filter(self, tmp_path: Path):
+        """フィルタが --tests として渡されることを確認"""
+        repository = Repository(tmp_path)
+        with patch("utils.gradle_runner.subprocess.run", return_value=self.completed()) as run:
+            repository.test(tests=["com.example.FooTest"])
+        assert run.call_args.args[0][-3:] == ["test", "--tests", "com.example.FooTest"]
+
+    def test_test_fallback_to_full_suite(self, tmp_path: Path):
+        """一致するテストがない場合に全てのテストが実行されることを確認"""
+        repository = Repository(tmp_path)
+        results = [
+            self.completed(1, "No tests found for given includes: [com.example.FooTest](--tests filter)"),
+            self.completed(),
+        ]
+        with patch("utils.gradle_runner.subprocess.run", side_effect=results) as run:
+            repository.test(tests=["com.example.FooTest"], fallback_to_full_suite=True)
+        assert run.call_args.args[0][-1] == "test"
+
+    def test_test_failure_without_fallback(self, tmp_path: Path):
+        """テストが失敗した場合は全てのテストを実行せずにエラーになることを確認"""
+        repository = Repository(tmp_path)
+        with patch("utils.gradle_runner.subprocess.run", return_value=self.completed(1, "FAILED")) as run:
+            with pytest.raises(subprocess.CalledProcessError):
+                repository.test(tests=["com.example.FooTest"], fallback_to_full_suite=True)
+        assert run.call_count == 1
+
+
+class TestSourceTestPairs:
+    def test_source_test_pairs(self, tmp_path: Path):
+        """ソースコードと同じパッケージのテストコードが優先して対応付けられることを確認"""
+        files = [
+            "src/main/kotlin/com/example/Calculator.kt",
+            "src/main/kotlin/com/example/Main.kt",
+            "src/main/kotlin/com/example/util/Strings.kt",
+            "src/test/kotlin/com/example/CalculatorTest.kt",
+            "src/test/kotlin/com/other/CalculatorTest.kt",
+            "src/test/kotlin/com/example/StringsTest.kt",
+        ]
+        for name in files:
+            (tmp_path / name).parent.mkdir(parents=True, exist_ok=True)
+            (tmp_path / name).write_text("")
+
+        pairs = Repository(tmp_path).source_test_pairs()
+        assert pairs == [
+            (tmp_path / "src/main/kotlin/com/example/Calculator.kt", tmp_path / "src/test/kotlin/com/example/CalculatorTest.kt"),
+            (tmp_path / "src/main/kotlin/com/example/util/Strings.kt", tmp_path / "src/test/kotlin/com/example/StringsTest.kt"),
+        ]
+
+
+class TestSwap:
+    def test_swap_restores_original(self, tmp_path: Path):
+        """置き換えたファイルが終了時に元の内容とパーミッションに戻ることを確認"""
+        path = tmp_path / "Main.kt"
+        path.write_text("fun main() {}\n")
+        path.chmod(0o640)
+        repository = Repository(tmp_path)
+
+        with repository.swap(path, "fun main() { mutated() }\n"):
+            assert path.read_text() == "fun main() { mutated() }\n"
+            assert path.stat().st_mode & 0o777 == 0o640
+
+        assert path.read_text() == "fun main() {}\n"
+        assert path.stat().st_mode & 0o777 == 0o640
+        # 一時ファイルが残らないことを確認
+        assert [p.name for p in tmp_path.iterdir()] == ["Main.kt"]
+
+    def test_swap_restores_on_error(self, tmp_path: Path):
+        """例外が発生した場合も元の内容に戻ることを確認"""
+        path = tmp_path / "Main.kt"
+        path.write_text("fun main() {}\n")
+        repository = Repository(tmp_path)
+
+        with pytest.raises(RuntimeError):
+            with repository.swap(path, "broken"):
+                raise RuntimeError("test failed")
+
+        assert path.read_text() == "fun main() {}\n"
+
+
+class TestRestoreChangedFiles:
+    def test_restores_all_but_kept(self, tmp_path: Path):
+        """keepに含まれるファイル以外の変更されたファイルがHEADの内容に戻ることを確認"""
+        root = tmp_path / "origin"
+        project = root / "project"
+        project.mkdir(parents=True)
+        (project / "A.kt").write_text("fun a() {}\n")
+        (project / "B.kt").write_text("fun b() {}\n")
+
+        def git(*args):
+            subprocess.run(["git", *args], cwd=root, check=True, capture_output=True)
+
+        git("init")
+        git("add", "-A")
+        git("-c", "user.name=test", "-c", "user.email=test@example.com", "commit", "-m", "init")
+
+        (project / "A.kt").write_text("fun a() { formatted() }\n")
+        (project / "B.kt").write_text("fun b() { formatted() }\n")
+        Repository(project).restore_changed_files(keep=[project / "A.kt"])
+
+        assert (project / "A.kt").read_text() == "fun a() { formatted() }\n"
+        assert (project / "B.kt").read_text() == "fun b() {}\n"
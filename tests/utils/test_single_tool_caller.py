@@ -0,0 +1,104 @@
+import asyncio
+import json
+import pytest
+from pathlib import Path
+from langchain_core.messages import AIMessageChunk
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import RunnableGenerator
+from tools.apply_to_file import apply_to_file
+from utils.llm_response_cache import LLMResponseCache, OFF
+from utils.llm_scheduler import LLMCallScheduler
+from utils.single_tool_caller import SingleToolCaller
+
+
+PROMPT = ChatPromptTemplate.from_messages([("system", "mutate"), ("user", "{source_code}")])
+
+
+class StreamingLLM:
+    """Toolの引数のJSONを、chunk_size文字ずつに分けて返すLLM"""
+    def __init__(self, diff: str, chunk_size: int = 5):
+        self.model_id = "streaming-model"
+        self.temperature = 0.0
+        self.diff = diff
+        self.chunk_size = chunk_size
+        self.calls = 0
+
+    def bind_tools(self, tools, tool_choice=None):
+        async def respond(inputs):
+            async for _ in inputs:
+                pass
+            self.calls += 1
+            args = json.dumps({"diff": self.diff})
+            for start in range(0, len(args), self.chunk_size):
+                first = start == 0
+                yield AIMessageChunk(content="", tool_call_chunks=[{
+                    "name": tool_choice if first else None,
+                    "args": args[start:start + self.chunk_size],
+                    "id": "1" if first else None,
+                    "index": 0,
+                }])
+            yield AIMessageChunk(content="", usage_metadata={"input_tokens": 10, "output_tokens": 20, "total_tokens": 30})
+        return RunnableGenerator(respond)
+
+
+async def no_tool_call(inputs):
+    async for _ in inputs:
+        pass
+    yield AIMessageChunk(content="no tool")
+
+
+class TestSingleToolCallerStream:
+    def collect(self, caller):
+        async def run():
+            return [value async for value in caller.stream(PROMPT, {"source_code": "fun main() {}"}, "diff")]
+        return asyncio.run(run())
+
+    def test_partial_arguments(self, tmp_path: Path):
+        """Toolの引数が生成されるたびに途中までの値が返され、最後にToolの結果が返されることを確認"""
+        diff = "--- a\n+++ b\n@@ -1 +1 @@\n-\"a\"\n+\"b\"\n"
+        scheduler = LLMCallScheduler()
+        caller = SingleToolCaller(StreamingLLM(diff), apply_to_file, scheduler=scheduler, cache=LLMResponseCache(tmp_path, mode=OFF))
+
+        values = self.collect(caller)
+
+        assert 2 < len(values)
+        assert values[-1] == diff
+        # 途中までの値は最後の値の先頭部分
+        assert all(diff.startswith(value) for value in values)
+        assert scheduler.calls == 1
+        assert scheduler.usage["streaming-model"]["output"] == 20
+
+    def test_reuses_scheduler_chain(self, tmp_path: Path):
+        """bind_toolsしたLLMを、callと同じスケジューラーのチェーンから再利用することを確認"""
+        llm = StreamingLLM("--- a\n+++ b\n")
+        bound = []
+        bind_tools = llm.bind_tools
+        llm.bind_tools = lambda tools, tool_choice=None: bound.append(tools) or bind_tools(tools, tool_choice)
+        scheduler = LLMCallScheduler()
+        caller = SingleToolCaller(llm, apply_to_file, scheduler=scheduler, cache=LLMResponseCache(tmp_path, mode=OFF))
+
+        self.collect(caller)
+        self.collect(caller)
+
+        assert llm.calls == 2
+        assert len(bound) == 1
+
+    def test_cached_response(self, tmp_path: Path):
+        """キャッシュがある場合は、LLMを呼び出さずにToolの結果だけを返すことを確認"""
+        llm = StreamingLLM("--- a\n+++ b\n")
+        caller = SingleToolCaller(llm, apply_to_file, scheduler=LLMCallScheduler(), cache=LLMResponseCache(tmp_path))
+
+        first = self.collect(caller)
+        second = self.collect(caller)
+
+        assert llm.calls == 1
+        assert second == [first[-1]]
+
+    def test_no_tool_call(self, tmp_path: Path):
+        """Toolが呼び出されなかった場合はエラーになることを確認"""
+        llm = StreamingLLM("")
+        llm.bind_tools = lambda tools, tool_choice=None: RunnableGenerator(no_tool_call)
+        caller = SingleToolCaller(llm, apply_to_file, scheduler=LLMCallScheduler(), cache=LLMResponseCache(tmp_path, mode=OFF))
+
+        with pytest.raises(ValueError):
+            self.collect(caller)
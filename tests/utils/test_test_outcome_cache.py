@@ -0,0 +1,59 @@
+import pytest
+from pathlib import Path
+from unittest.mock import Mock
+from utils.repository import Repository
+from utils.test_outcome_cache import TestOutcomeCache
+
+
+class TestTestOutcomeCache:
+    @pytest.fixture
+    def repository(self, tmp_path: Path):
+        path = tmp_path / "project"
+        path.mkdir()
+        (path / "build.gradle.kts").write_text("plugins {}\n")
+        repository = Mock(spec=Repository, path=path)
+        repository.tree_hash.return_value = "tree"
+        return repository
+
+    @pytest.fixture
+    def cache(self, tmp_path: Path):
+        return TestOutcomeCache(tmp_path / "cache")
+
+    def test_put_and_get(self, cache, repository):
+        """保存した結果が取得できることを確認"""
+        key = cache.key(repository, {Path("src/A.kt"): "class A"})
+        assert cache.get(key) is None
+
+        cache.put(key, True)
+        assert cache.get(key) == {"passed": True}
+        assert (cache.hits, cache.misses) == (1, 1)
+
+    def test_key_is_stable(self, cache, repository):
+        """同じ入力からは同じキーが作成されることを確認"""
+        sources = {Path("src/A.kt"): "class A", Path("src/ATest.kt"): "class ATest"}
+        assert cache.key(repository, sources) == cache.key(repository, dict(reversed(list(sources.items()))))
+
+    def test_key_depends_on_inputs(self, cache, repository):
+        """ソースコード、テストのフィルタ、ビルドファイル、HEADが変わるとキーが変わることを確認"""
+        sources = {Path("src/A.kt"): "class A"}
+        key = cache.key(repository, sources)
+
+        assert key != cache.key(repository, {Path("src/A.kt"): "class A {}"})
+        assert key != cache.key(repository, sources, ["com.example.ATest"])
+
+        (repository.path / "build.gradle.kts").write_text("plugins { kotlin }\n")
+        assert key != cache.key(repository, sources)
+
+        key = cache.key(repository, sources)
+        repository.tree_hash.return_value = "other"
+        assert key != cache.key(repository, sources)
+
+    def test_key_with_tree_hash(self, cache, repository):
+        """treeハッシュを渡した場合はgitを実行せずに同じキーが作成されることを確認"""
+        sources = {Path("src/A.kt"): "class A"}
+        key = cache.key(repository, sources)
+        repository.tree_hash.reset_mock()
+
+        assert cache.key(repository, sources, tree_hash="tree") == key
+        assert cache.key(repository, sources, tree_hash="other") != key
+        repository.tree_hash.assert_not_called()
@@ -0,0 +1,200 @@
+import subprocess
+import pytest
+from pathlib import Path
+from unittest.mock import patch
+from utils.repository import Repository
+from utils.test_results import TestFailure, TestReport, parse_junit_xml
+
+
+XML = """<?xml version="1.0" encoding="UTF-8"?>
+<testsuite name="com.example.CalcTest" tests="4" skipped="1" failures="1" errors="1" time="0.05">
+  <testcase name="testAdd()" classname="com.example.CalcTest" time="0.01"/>
+  <testcase name="testSub()" classname="com.example.CalcTest" time="0.02">
+    <failure message="expected: &lt;1&gt; but was: &lt;3&gt;" type="org.opentest4j.AssertionFailedError">org.opentest4j.AssertionFailedError: expected: &lt;1&gt; but was: &lt;3&gt;
+	at org.junit.jupiter.api.AssertionUtils.fail(AssertionUtils.java:151)
+	at com.example.CalcTest.testSub(CalcTest.kt:15)
+	at java.base/java.lang.reflect.Method.invoke(Method.java:580)
+</failure>
+  </testcase>
+  <testcase name="testDiv()" classname="com.example.CalcTest" time="0.003">
+    <error message="/ by zero" type="java.lang.ArithmeticException">java.lang.ArithmeticException: / by zero
+	at com.example.Calc.div(Calc.kt:8)
+</error>
+  </testcase>
+  <testcase name="testMul()" classname="com.example.CalcTest" time="0">
+    <skipped/>
+  </testcase>
+  <system-out><![CDATA[]]></system-out>
+</testsuite>
+"""
+
+PRIORITY_XML = """<?xml version="1.0" encoding="UTF-8"?>
+<testsuite name="com.example.CalcTest" tests="1" skipped="0" failures="0" errors="0" time="0.01">
+  <testcase name="testSub()" classname="com.example.CalcTest" time="0.01"/>
+</testsuite>
+"""
+
+REMAINING_XML = """<?xml version="1.0" encoding="UTF-8"?>
+<testsuite name="com.example.CalcTest" tests="1" skipped="0" failures="0" errors="0" time="0.01">
+  <testcase name="testAdd()" classname="com.example.CalcTest" time="0.01"/>
+</testsuite>
+"""
+
+
+def write_report(repository: Repository, name: str = "TEST-com.example.CalcTest.xml", content: str = XML):
+    repository.test_results_dir.mkdir(parents=True, exist_ok=True)
+    (repository.test_results_dir / name).write_text(content)
+
+
+class TestJUnitXml:
+    def test_parse_junit_xml(self, tmp_path: Path):
+        """テストケースごとの状態、実行時間、メッセージが取り出されることを確認"""
+        path = tmp_path / "report.xml"
+        path.write_text(XML)
+        cases = parse_junit_xml(path)
+
+        assert [(case.name, case.status) for case in cases] == [
+            ("testAdd()", "passed"),
+            ("testSub()", "failed"),
+            ("testDiv()", "error"),
+            ("testMul()", "skipped"),
+        ]
+        assert cases[1].id == "com.example.CalcTest.testSub()"
+        assert cases[1].duration == 0.02
+        assert cases[1].message == "expected: <1> but was: <3>"
+
+    def test_summary(self, tmp_path: Path):
+        """要約に失敗したテストと、フレームワーク以外のスタックトレースのみが含まれることを確認"""
+        path = tmp_path / "report.xml"
+        path.write_text(XML)
+        summary = TestReport(parse_junit_xml(path)).summary()
+
+        assert "FAILED com.example.CalcTest.testSub() (0.020s)" in summary
+        assert "at com.example.CalcTest.testSub(CalcTest.kt:15)" in summary
+        assert "org.junit" not in summary
+        assert "ERROR com.example.CalcTest.testDiv()" in summary
+        assert "testAdd" not in summary
+        assert summary.endswith("2 of 4 tests failed")
+
+
+class TestRepositoryTestReport:
+    def test_failure_contains_report(self, tmp_path: Path):
+        """テストが失敗した場合、失敗したテストケースを含むTestFailureが送出されることを確認"""
+        repository = Repository(tmp_path)
+
+        def run(*args, **kwargs):
+            write_report(repository)
+            return subprocess.CompletedProcess([], 1, "", "")
+
+        with patch("utils.gradle_runner.subprocess.run", side_effect=run):
+            with pytest.raises(subprocess.CalledProcessError) as e:
+                repository.test(tests=["com.example.CalcTest"])
+
+        assert isinstance(e.value, TestFailure)
+        assert e.value.report.failed_tests == ["com.example.CalcTest.testSub()", "com.example.CalcTest.testDiv()"]
+
+    def test_failed_test_cases_fail_even_if_gradle_succeeds(self, tmp_path: Path):
+        """Gradleが成功しても、レポートに失敗したテストケースがあれば失敗とすることを確認"""
+        repository = Repository(tmp_path)
+
+        def run(*args, **kwargs):
+            write_report(repository)
+            return subprocess.CompletedProcess([], 0, "", "")
+
+        with patch("utils.gradle_runner.subprocess.run", side_effect=run):
+            with pytest.raises(TestFailure):
+                repository.test()
+
+    def test_stale_reports_are_removed(self, tmp_path: Path):
+        """前回の実行のレポートが読み込まれないことを確認"""
+        repository = Repository(tmp_path)
+        write_report(repository)
+
+        with patch("utils.gradle_runner.subprocess.run", return_value=subprocess.CompletedProcess([], 0, "", "")):
+            report = repository.test()
+
+        assert report.cases == []
+        assert report.is_success
+
+    def test_fail_fast(self, tmp_path: Path):
+        """fail_fastの場合は --fail-fast が渡されることを確認"""
+        repository = Repository(tmp_path)
+        with patch("utils.gradle_runner.subprocess.run", return_value=subprocess.CompletedProcess([], 0, "", "")) as run:
+            repository.test(tests=["com.example.CalcTest"], fail_fast=True)
+        assert run.call_args.args[0][-4:] == ["test", "--fail-fast", "--tests", "com.example.CalcTest"]
+
+    def test_priority_tests_kill(self, tmp_path: Path):
+        """優先するテストが失敗した場合は、残りのテストを実行しないことを確認"""
+        repository = Repository(tmp_path)
+
+        def run(*args, **kwargs):
+            write_report(repository)
+            return subprocess.CompletedProcess([], 1, "", "")
+
+        with patch("utils.gradle_runner.subprocess.run", side_effect=run) as run:
+            with pytest.raises(TestFailure):
+                repository.test(tests=["com.example.CalcTest"], priority_tests=["com.example.CalcTest.testSub()"])
+        assert run.call_count == 1
+        assert run.call_args.args[0][-3:] == ["test", "--tests", "com.example.CalcTest.testSub"]
+
+    def test_priority_tests_pass(self, tmp_path: Path):
+        """優先するテストが成功した場合、または一致しない場合は残りのテストを実行することを確認"""
+        repository = Repository(tmp_path)
+        results = [
+            subprocess.CompletedProcess([], 0, "", ""),
+            subprocess.CompletedProcess([], 0, "", ""),
+            subprocess.CompletedProcess([], 1, "No tests found for given includes: [x]", ""),
+            subprocess.CompletedProcess([], 0, "", ""),
+        ]
+        with patch("utils.gradle_runner.subprocess.run", side_effect=results) as run:
+            repository.test(tests=["com.example.CalcTest"], priority_tests=["com.example.CalcTest.testSub()"])
+            repository.test(tests=["com.example.CalcTest"], priority_tests=["com.example.Removed.test()"])
+        assert run.call_count == 4
+        assert run.call_args.args[0][-3:] == ["test", "--tests", "com.example.CalcTest"]
+
+    def test_priority_tests_excluded_from_remaining_run(self, tmp_path: Path):
+        """成功した優先するテストが残りのテストの実行から除かれ、結果がまとめられることを確認"""
+        repository = Repository(tmp_path)
+        reports = [PRIORITY_XML, REMAINING_XML]
+
+        def run(*args, **kwargs):
+            write_report(repository, content=reports.pop(0))
+            return subprocess.CompletedProcess([], 0, "", "")
+
+        with patch("utils.gradle_runner.subprocess.run", side_effect=run) as run:
+            report = repository.test(tests=["com.example.CalcTest"], priority_tests=["com.example.CalcTest.testSub()"])
+        assert run.call_count == 2
+        args = run.call_args.args[0]
+        assert "--init-script" in args
+        assert "-PexcludeTests=com.example.CalcTest.testSub" in args
+        assert [case.id for case in report.cases] == ["com.example.CalcTest.testSub()", "com.example.CalcTest.testAdd()"]
+
+    def test_priority_tests_cover_whole_suite(self, tmp_path: Path):
+        """優先するテストで全てのテストを実行済みの場合は、その結果を返すことを確認"""
+        repository = Repository(tmp_path)
+        results = [
+            subprocess.CompletedProcess([], 0, "", ""),
+            subprocess.CompletedProcess([], 1, "No tests found for given includes: [com.example.CalcTest](--tests filter)", ""),
+        ]
+
+        def run(*args, **kwargs):
+            if len(results) == 2:
+                write_report(repository, content=PRIORITY_XML)
+            return results.pop(0)
+
+        with patch("utils.gradle_runner.subprocess.run", side_effect=run) as run:
+            report = repository.test(tests=["com.example.CalcTest"], fallback_to_full_suite=True, priority_tests=["com.example.CalcTest.testSub()"])
+        assert run.call_count == 2
+        assert [case.id for case in report.cases] == ["com.example.CalcTest.testSub()"]
+
+    def test_priority_gradle_failure_without_test_failures(self, tmp_path: Path):
+        """優先するテストの実行がテスト以外の理由で失敗した場合は、残りのテストで判定することを確認"""
+        repository = Repository(tmp_path)
+        results = [
+            subprocess.CompletedProcess([], 1, "Could not resolve dependencies", ""),
+            subprocess.CompletedProcess([], 0, "", ""),
+        ]
+        with patch("utils.gradle_runner.subprocess.run", side_effect=results) as run:
+            report = repository.test(tests=["com.example.CalcTest"], priority_tests=["com.example.CalcTest.testSub()"])
+        assert run.call_count == 2
+        assert report.is_success
@@ -6,6 +6,7 @@ import json
 
 class EquivalenceResult(TypedDict):
     """Type representing the result of code equivalence detection"""
+    index: Annotated[int, 'The index number N of the DIFF ("DIFF #N") this result is for']
     is_equivalent: Annotated[bool, 'True if the code changes are equivalent, False otherwise']
     reason: Annotated[str, 'Explanation of why the changes are equivalent or not equivalent']
 
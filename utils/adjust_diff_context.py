@@ -17,9 +17,10 @@ DiffHunkは推測で選ばれた範囲であるため、ソースコードにな
     adjusted_diff = adjust_diff_context(source_code, diff)
 """
 
-from typing import List, Optional
+from typing import List, Optional, Union
 import difflib
 from utils.detect_diff_hunks import DiffHunk, DiffHunkProcessor
+from utils.prepared_source import PreparedSource
 
 
 class DiffContextAdjuster:
@@ -28,14 +29,17 @@ class DiffContextAdjuster:
     ソースコードにないがdiff_linesにあるコンテキスト行を"+"に変換します。
     """
     
-    def __init__(self, source_code: str):
+    def __init__(self, source_code: Union[str, PreparedSource]):
         """
         DiffContextAdjusterを初期化します。
         
         Args:
-            source_code: 元のソースコード
+            source_code: 元のソースコード。PreparedSourceを渡した場合は行の分割を共有する
         """
-        self.source_lines = source_code.split("\n")
+        if isinstance(source_code, PreparedSource):
+            self.source_lines = source_code.lines
+        else:
+            self.source_lines = source_code.split("\n")
     
     def adjust_hunk(self, hunk: DiffHunk) -> DiffHunk:
         """
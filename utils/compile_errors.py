@@ -0,0 +1,115 @@
+"""
+Kotlinコンパイラ（kotlinc）のエラー出力を解析するモジュール。
+
+Gradleの出力から以下の形式のエラーを取り出します。
+
+    e: file:///path/to/FooTest.kt:12:5 Unresolved reference 'bar'.
+    e: /path/to/FooTest.kt: (12, 5): Unresolved reference: bar
+
+使用例:
+    result = repository.compile_tests()
+    if not result.is_success:
+        print(result.summary(test_code_path))
+"""
+
+from pathlib import Path
+from typing import List, Optional
+from urllib.parse import unquote, urlparse
+import re
+
+# Kotlin 1.9以降の形式: e: file:///path/Foo.kt:12:5 message
+URI_ERROR_PATTERN = re.compile(r"^e: (file:[^\s]+?\.kts?):(\d+):(\d+) (.*)$")
+# Kotlin 1.8以前の形式: e: /path/Foo.kt: (12, 5): message
+LEGACY_ERROR_PATTERN = re.compile(r"^e: (.+?\.kts?): \((\d+), (\d+)\): (.*)$")
+
+
+class CompileError:
+    def __init__(self, file: Path, line: int, column: int, message: str):
+        """
+        Args:
+            file: エラーのあるファイルのパス
+            line: 行番号（1-indexed）
+            column: 列番号（1-indexed）
+            message: エラーメッセージ
+        """
+        self.file = file
+        self.line = line
+        self.column = column
+        self.message = message
+
+    def __eq__(self, other):
+        if not isinstance(other, CompileError):
+            return NotImplemented
+        return (self.file, self.line, self.column, self.message) == (other.file, other.line, other.column, other.message)
+
+    def __repr__(self):
+        return f"CompileError({self.file}:{self.line}:{self.column} {self.message!r})"
+
+    def __str__(self):
+        return f"{self.file.name}:{self.line}:{self.column} {self.message}"
+
+
+def parse_compile_errors(output: str) -> List[CompileError]:
+    """Gradleの出力からKotlinのコンパイルエラーを取り出します。
+
+    Args:
+        output: Gradleの標準出力と標準エラー出力
+
+    Returns:
+        コンパイルエラーのリスト（重複は除く）
+    """
+    errors = []
+    for line in output.splitlines():
+        line = line.strip()
+        match = URI_ERROR_PATTERN.match(line)
+        if match is not None:
+            file = Path(unquote(urlparse(match.group(1)).path))
+        else:
+            match = LEGACY_ERROR_PATTERN.match(line)
+            if match is None:
+                continue
+            file = Path(match.group(1))
+
+        error = CompileError(file, int(match.group(2)), int(match.group(3)), match.group(4).strip())
+        if error not in errors:
+            errors.append(error)
+    return errors
+
+
+class CompileResult:
+    def __init__(self, is_success: bool, errors: List[CompileError], output: str):
+        """
+        Args:
+            is_success: コンパイルが成功した場合はTrue
+            errors: コンパイルエラーのリスト
+            output: Gradleの出力
+        """
+        self.is_success = is_success
+        self.errors = errors
+        self.output = output
+
+    def errors_for(self, path: Path) -> List[CompileError]:
+        """指定したファイルのコンパイルエラーを返します。"""
+        path = Path(path).resolve()
+        return [error for error in self.errors if error.file.resolve() == path]
+
+    def summary(self, path: Optional[Path] = None, limit: int = 20) -> str:
+        """LLMに渡すためのコンパイルエラーの要約を返します。
+
+        Args:
+            path: 指定した場合、このファイルのエラーを優先する
+            limit: 含めるエラーの最大数
+
+        Returns:
+            1行に1つのエラーを書いた文字列。エラーを解析できなかった場合はGradleの出力の末尾
+        """
+        errors = self.errors_for(path) if path is not None else []
+        if not errors:
+            errors = self.errors
+        if not errors:
+            return "\n".join(self.output.splitlines()[-limit:])
+
+        lines = [str(error) for error in errors[:limit]]
+        if limit < len(errors):
+            lines.append(f"... and {len(errors) - limit} more errors")
+        return "\n".join(lines)
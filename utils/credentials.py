@@ -34,3 +34,12 @@ def get_credentials(aws_account_id:str, system_admin_role:str) -> Credentials:
     )
     credentials = assumed_role_object['Credentials']
     return Credentials(credentials)
+
+
+def get_replay_credentials() -> Credentials:
+    # LLMの応答をキャッシュから再生する場合はBedrockを呼び出さないため、認証情報は使われない
+    return Credentials({
+        'AccessKeyId': 'replay',
+        'SecretAccessKey': 'replay',
+        'SessionToken': 'replay',
+    })
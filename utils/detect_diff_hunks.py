@@ -1,6 +1,8 @@
-from typing import List, Optional, Tuple
+from typing import List, Optional, Tuple, Union
 import re
 import difflib
+from utils.line_index import LineIndex
+from utils.prepared_source import PreparedSource
 
 class DiffHunk:
     def __init__(self, diff_lines: List[str], source_start_line: int, source_end_line: int):
@@ -21,19 +23,35 @@ class DiffHunk:
 
 
 class DiffHunkProcessor:
-    def __init__(self, code: str, diff: str):
+    def __init__(self, code: Union[str, PreparedSource], diff: str):
         """DIFFを処理するためのクラスを初期化します。
 
         Args:
-            code: 対応するソースコード
+            code: 対応するソースコード。同じソースコードに多数のDIFFを処理する場合はPreparedSourceを渡す
             diff: 分割するDIFF文字列
         """
-        self.source_lines = code.split("\n")
+        self.source = code if isinstance(code, PreparedSource) else PreparedSource(code)
+        self.source_lines = self.source.lines
+        self.stripped_lines = self.source.stripped_lines
         self.diff_lines = diff.split("\n") if diff else []
         # 標準的なdiffフォーマットの行番号情報を解析するための正規表現
         # 例: @@ -1,3 +1,3 @@ の形式
         self.hunk_header_pattern = re.compile(r'^@@ -(\d+),(\d+) \+(\d+),(\d+) @@')
 
+    @property
+    def line_index(self) -> LineIndex:
+        """ソースコードの行の索引。位置の推測が必要になった時点で作成し、PreparedSourceで共有します。"""
+        return self.source.line_index
+
+    def _similarity_score(self, original_lines: List[str], start: int, length: int) -> float:
+        """ハンクの元のコードと、ソースコードの指定範囲の類似度を計算します。"""
+        end = min(start + length - 1, len(self.source_lines))
+        segment = self.stripped_lines[start-1:end]
+        matcher = difflib.SequenceMatcher(None, 
+                                        "\n".join(original_lines), 
+                                        "\n".join(segment))
+        return matcher.ratio()
+
     def _is_diff_numbers_reliable(self, original_lines: List[str], expected_code_segment: List[str]) -> bool:
         """diffの行番号情報が信頼できるかどうかを判断します。
 
@@ -74,29 +92,22 @@ class DiffHunkProcessor:
         if not original_lines:
             raise ValueError("元のコードの行リストが空です")
             
-        # まず最初の行が一致する位置を探す
-        first_line = original_lines[0].strip()
-        matching_positions = []
-        
-        for i, line in enumerate(self.source_lines):
-            if line.strip() == first_line:
-                matching_positions.append(i + 1)  # 1-indexedに変換
+        # まず最初の行が一致する位置を探す（1-indexed）
+        matching_positions = self.line_index.find_line(original_lines[0])
         
         if not matching_positions:
-            # 最初の行が一致する位置がない場合は、類似度で探す
+            # 最初の行が一致する位置がない場合は、索引で絞り込んだ候補の中から類似度で探す
+            candidates = sorted(self.line_index.candidate_starts(original_lines))
+            if not candidates:
+                # 手がかりがない場合は全ての位置を調べる
+                candidates = range(1, len(self.source_lines) + 1)
+
             best_start = 1
             best_score = 0
             
-            for i in range(1, len(self.source_lines) + 1):
-                end = min(i + len(original_lines), len(self.source_lines) + 1)
-                segment = self.source_lines[i-1:end-1]
-                segment = [line.strip() for line in segment]
-                
+            for i in candidates:
                 # 一致度を計算
-                matcher = difflib.SequenceMatcher(None, 
-                                                "\n".join(original_lines), 
-                                                "\n".join(segment))
-                score = matcher.ratio()
+                score = self._similarity_score(original_lines, i, len(original_lines))
                 
                 if score > best_score:
                     best_score = score
@@ -114,7 +125,7 @@ class DiffHunkProcessor:
             last_line_match = False
             for length in range(len(original_lines), min(len(original_lines) + 5, len(self.source_lines) - pos + 2)):
                 if pos + length - 1 <= len(self.source_lines):
-                    if (self.source_lines[pos + length - 2].strip() == 
+                    if (self.stripped_lines[pos + length - 2] == 
                         original_lines[-1].strip()):
                         last_line_match = True
                         best_length = length
@@ -122,8 +133,7 @@ class DiffHunkProcessor:
             
             # 範囲全体の類似度を計算
             end = min(pos + best_length - 1, len(self.source_lines))
-            segment = self.source_lines[pos-1:end]
-            segment = [line.strip() for line in segment]
+            segment = self.stripped_lines[pos-1:end]
             
             matcher = difflib.SequenceMatcher(None, 
                                             "\n".join(original_lines), 
@@ -1,28 +1,26 @@
 import os
+import re
 from pathlib import Path
 import tempfile
-from typing import Optional, List, Tuple
+from typing import Optional, List, Tuple, Union
 from utils.detect_diff_hunks import DiffHunkProcessor
+from utils.prepared_source import PreparedSource
 from utils.simple_diff_applier import apply_hunks
 from utils.mutant_diff_generator import generate_mutant_diff_from_hunks
 from utils.adjust_diff_context import DiffContextAdjuster
 
 
-def apply_diff_to_file(source_path: Path, diff: str) -> Optional[Path]:
+def apply_diff(source_code: Union[str, PreparedSource], diff: str) -> str:
     """
-    DIFFをソースコードに適用して新しいファイルを生成します。
+    DIFFをソースコードに適用した結果を返します。
     
     Args:
-        source_path: 元のソースコードのパス
+        source_code: 元のソースコード。同じソースコードに多数のDIFFを適用する場合はPreparedSourceを渡す
         diff: 適用するDIFF文字列
         
     Returns:
-        生成されたファイルのパス
+        変更後のソースコード
     """
-    # ソースコードを読み込み
-    with open(source_path, 'r') as f:
-        source_code = f.read()
-    
     # DIFFをハンクに分割
     processor = DiffHunkProcessor(source_code, diff)
     hunks = processor.hunking()
@@ -32,33 +30,20 @@ def apply_diff_to_file(source_path: Path, diff: str) -> Optional[Path]:
     adjusted_hunks = adjuster.adjust_hunks(hunks)
     
     # ハンクを適用
-    result_code = apply_hunks(source_code, adjusted_hunks)
-    
-    # 結果を一時ファイルに書き込み
-    temp_file = tempfile.NamedTemporaryFile(delete=False)
-    temp_file_path = Path(temp_file.name)
-    
-    with open(temp_file_path, 'w') as f:
-        f.write(result_code)
-    
-    return temp_file_path
+    return apply_hunks(source_code, adjusted_hunks)
 
 
-def apply_diff_to_file_for_mutant(source_path: Path, diff: str) -> Optional[Path]:
+def apply_diff_for_mutant(source_code: Union[str, PreparedSource], diff: str) -> str:
     """
-    DIFFをソースコードに適用して新しいファイルを生成します（MUTANTモード）。
+    DIFFをソースコードに適用した結果を返します（MUTANTモード）。
     
     Args:
-        source_path: 元のソースコードのパス
+        source_code: 元のソースコード。同じソースコードに多数のDIFFを適用する場合はPreparedSourceを渡す
         diff: 適用するDIFF文字列
         
     Returns:
-        生成されたファイルのパス
+        変更後のソースコード
     """
-    # ソースコードを読み込み
-    with open(source_path, 'r') as f:
-        source_code = f.read()
-    
     # DIFFをハンクに分割
     processor = DiffHunkProcessor(source_code, diff)
     hunks = processor.hunking()
@@ -71,13 +56,168 @@ def apply_diff_to_file_for_mutant(source_path: Path, diff: str) -> Optional[Path
     mutant_hunks = generate_mutant_diff_from_hunks(adjusted_hunks)
     
     # ハンクを適用
-    result_code = apply_hunks(source_code, mutant_hunks)
+    return apply_hunks(source_code, mutant_hunks)
+
+
+def apply_diffs_for_mutant(source_code: Union[str, PreparedSource], diffs: List[str]) -> List[Optional[str]]:
+    """
+    同じソースコードに複数のDIFFを適用した結果を返します（MUTANTモード）。
+    
+    ソースコードの行の分割と索引の作成は最初に一度だけ行い、全てのDIFFで共有します。
+    
+    Args:
+        source_code: 元のソースコード
+        diffs: 適用するDIFF文字列のリスト
+        
+    Returns:
+        DIFFごとの変更後のソースコードのリスト（diffsと同じ順番）。適用できなかったDIFFはNone
+    """
+    source = source_code if isinstance(source_code, PreparedSource) else PreparedSource(source_code)
+    
+    results = []
+    for diff in diffs:
+        try:
+            results.append(apply_diff_for_mutant(source, diff))
+        except ValueError as e:
+            print(f"Failed to apply diff to file: {e}")
+            results.append(None)
+    return results
+
+
+
+HUNK_HEADER_PATTERN = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+
+
+def apply_unified_diff(source_code: str, diff: str) -> str:
+    """
+    difflib.unified_diffで作成したDIFFを、位置の推測なしにそのまま適用した結果を返します。
+    
+    FAULTのdiffのように元のソースコードから正確に作成したDIFFから、変更後のソースコードを復元するために使います。
+    
+    Args:
+        source_code: DIFFの作成元のソースコード
+        diff: unified形式のDIFF文字列
+        
+    Returns:
+        変更後のソースコード
+        
+    Raises:
+        ValueError: ハンクがない場合、または行が元のソースコードと一致しない場合
+    """
+    source_lines = source_code.splitlines()
+    result: List[str] = []
+    position = 0
+    changed = False
+    
+    diff_lines = diff.splitlines()
+    i = 0
+    while i < len(diff_lines):
+        match = HUNK_HEADER_PATTERN.match(diff_lines[i])
+        i += 1
+        if match is None:
+            # ファイルのヘッダーなど、ハンクの外の行
+            continue
+        
+        old_start, old_count = int(match.group(1)), int(match.group(2) or 1)
+        new_count = int(match.group(4) or 1)
+        # 削除行のない追加だけのハンクは、old_startの行の後に挿入される
+        start = old_start if old_count == 0 else old_start - 1
+        if start < position or len(source_lines) < start:
+            raise ValueError(f"Hunk out of range: {diff_lines[i - 1]}")
+        result.extend(source_lines[position:start])
+        position = start
+        
+        while (0 < old_count or 0 < new_count) and i < len(diff_lines):
+            line = diff_lines[i]
+            i += 1
+            marker, content = line[:1], line[1:]
+            if marker == "\\":
+                continue
+            if marker == "+":
+                result.append(content)
+                new_count -= 1
+                changed = True
+                continue
+            if marker not in (" ", "-", ""):
+                raise ValueError(f"Invalid diff line: {line}")
+            if len(source_lines) <= position or source_lines[position] != content:
+                raise ValueError(f"Line {position + 1} does not match: {line}")
+            position += 1
+            old_count -= 1
+            if marker == "-":
+                changed = True
+            else:
+                result.append(content)
+                new_count -= 1
+    
+    if not changed:
+        raise ValueError("No changes in diff")
     
+    result.extend(source_lines[position:])
+    mutated_code = "\n".join(result)
+    return mutated_code + "\n" if source_code.endswith("\n") else mutated_code
+
+
+def _write_temp_file(code: str) -> Path:
     # 結果を一時ファイルに書き込み
     temp_file = tempfile.NamedTemporaryFile(delete=False)
     temp_file_path = Path(temp_file.name)
     
     with open(temp_file_path, 'w') as f:
-        f.write(result_code)
+        f.write(code)
     
     return temp_file_path
+
+
+def apply_diff_to_file(source_path: Path, diff: str) -> Optional[Path]:
+    """
+    DIFFをソースコードに適用して新しいファイルを生成します。
+    
+    Args:
+        source_path: 元のソースコードのパス
+        diff: 適用するDIFF文字列
+        
+    Returns:
+        生成されたファイルのパス
+    """
+    # ソースコードを読み込み
+    with open(source_path, 'r') as f:
+        source_code = f.read()
+    
+    return _write_temp_file(apply_diff(source_code, diff))
+
+
+def apply_diff_to_file_for_mutant(source_path: Path, diff: str) -> Optional[Path]:
+    """
+    DIFFをソースコードに適用して新しいファイルを生成します（MUTANTモード）。
+    
+    Args:
+        source_path: 元のソースコードのパス
+        diff: 適用するDIFF文字列
+        
+    Returns:
+        生成されたファイルのパス
+    """
+    # ソースコードを読み込み
+    with open(source_path, 'r') as f:
+        source_code = f.read()
+    
+    return _write_temp_file(apply_diff_for_mutant(source_code, diff))
+
+
+def apply_diffs_to_file_for_mutant(source_path: Path, diffs: List[str]) -> List[Optional[Path]]:
+    """
+    ソースコードを一度だけ読み込み、複数のDIFFを適用したファイルを生成します（MUTANTモード）。
+    
+    Args:
+        source_path: 元のソースコードのパス
+        diffs: 適用するDIFF文字列のリスト
+        
+    Returns:
+        DIFFごとの生成されたファイルのパスのリスト（diffsと同じ順番）。適用できなかったDIFFはNone
+    """
+    source = PreparedSource.from_file(source_path)
+    return [
+        _write_temp_file(code) if code is not None else None
+        for code in apply_diffs_for_mutant(source, diffs)
+    ]
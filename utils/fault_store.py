@@ -0,0 +1,165 @@
+"""
+生成したFAULTをSQLiteに追記して保存するモジュール。
+
+FAULTは生成されるたびに1件ずつコミットするため、実行が途中で止まっても
+それまでのFAULTは失われません。実行ごとにrun_idを割り当て、
+ソースコードのパス、等価かどうか、run_idで絞り込んで順に読み出せます。
+
+使用例:
+    with FaultStore() as store:
+        run_id = store.start_run()
+        store.append(run_id, source_code_path, test_code_path, fault)
+
+        for record in store.iter_faults(run_id=run_id, is_equivalent=False):
+            ...
+"""
+
+from nodes.state import Fault
+from pathlib import Path
+from typing import Iterator, Optional, TypedDict
+from datetime import datetime, timezone
+import sqlite3
+import uuid
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    started_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS faults (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id TEXT NOT NULL REFERENCES runs(run_id),
+    source_code_path TEXT NOT NULL,
+    test_code_path TEXT,
+    diff TEXT NOT NULL,
+    is_equivalent INTEGER NOT NULL,
+    reason TEXT,
+    created_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS faults_source_code_path ON faults(source_code_path);
+CREATE INDEX IF NOT EXISTS faults_is_equivalent ON faults(is_equivalent);
+CREATE INDEX IF NOT EXISTS faults_run_id ON faults(run_id);
+"""
+
+
+class StoredFault(TypedDict):
+    id: int
+    run_id: str
+    source_code_path: str
+    test_code_path: Optional[str]
+    diff: str
+    is_equivalent: bool
+    reason: Optional[str]
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+class FaultStore:
+    def __init__(self, path: Path = Path("results/faults.sqlite3")):
+        """
+        Args:
+            path: SQLiteのデータベースファイル
+        """
+        self.path = path
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.connection = sqlite3.connect(path)
+        # 読み出し中も書き込めるようにし、書き込みごとのfsyncを減らす
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(SCHEMA)
+
+    def __enter__(self) -> "FaultStore":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        self.connection.close()
+
+    def start_run(self) -> str:
+        """新しい実行を登録し、そのrun_idを返します。"""
+        run_id = f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        with self.connection:
+            self.connection.execute("INSERT INTO runs (run_id, started_at) VALUES (?, ?)", (run_id, _now()))
+        return run_id
+
+    def latest_run_id(self) -> Optional[str]:
+        """最後に開始した実行のrun_idを返します。実行がない場合はNone"""
+        row = self.connection.execute("SELECT run_id FROM runs ORDER BY started_at DESC, rowid DESC LIMIT 1").fetchone()
+        return row[0] if row else None
+
+    def append(self, run_id: str, source_code_path: Path, test_code_path: Optional[Path], fault: Fault) -> int:
+        """FAULTを1件追記し、すぐにコミットします。
+
+        Args:
+            run_id: 実行のID
+            source_code_path: FAULTを生成したソースコードのパス
+            test_code_path: テストコードのパス
+            fault: FAULT
+
+        Returns:
+            追記した行のID
+        """
+        with self.connection:
+            cursor = self.connection.execute(
+                "INSERT INTO faults (run_id, source_code_path, test_code_path, diff, is_equivalent, reason, created_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    run_id,
+                    str(source_code_path),
+                    str(test_code_path) if test_code_path is not None else None,
+                    fault["diff"],
+                    int(bool(fault["is_equivalent"])),
+                    fault.get("reason"),
+                    _now(),
+                ),
+            )
+        return cursor.lastrowid
+
+    def iter_faults(
+        self,
+        run_id: Optional[str] = None,
+        source_code_path: Optional[Path] = None,
+        is_equivalent: Optional[bool] = None,
+    ) -> Iterator[StoredFault]:
+        """条件に一致するFAULTを追記した順に1件ずつ返します。
+
+        Args:
+            run_id: 実行のID。Noneの場合は全ての実行
+            source_code_path: ソースコードのパス。Noneの場合は全てのソースコード
+            is_equivalent: 等価かどうか。Noneの場合は両方
+
+        Returns:
+            FAULTのイテレーター
+        """
+        conditions = []
+        params = []
+        if run_id is not None:
+            conditions.append("run_id = ?")
+            params.append(run_id)
+        if source_code_path is not None:
+            conditions.append("source_code_path = ?")
+            params.append(str(source_code_path))
+        if is_equivalent is not None:
+            conditions.append("is_equivalent = ?")
+            params.append(int(is_equivalent))
+
+        query = "SELECT id, run_id, source_code_path, test_code_path, diff, is_equivalent, reason FROM faults"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY id"
+
+        # 全件をメモリに読み込まず、カーソルから順に読み出す
+        for row in self.connection.execute(query, params):
+            yield StoredFault(
+                id=row[0],
+                run_id=row[1],
+                source_code_path=row[2],
+                test_code_path=row[3],
+                diff=row[4],
+                is_equivalent=bool(row[5]),
+                reason=row[6],
+            )
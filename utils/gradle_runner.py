@@ -0,0 +1,229 @@
+"""
+Gradleの実行方法を切り替えるためのモジュール。
+
+主な機能:
+- GradleRunner: `mise x gradle -- gradle ...` を毎回起動するランナー（従来の動作）
+- DaemonGradleRunner: miseの解決結果をキャッシュし、常駐するGradleデーモンを再利用するランナー
+
+どちらのランナーも呼び出しごとの実行時間を記録するため、warm/coldの差を確認できます。
+"""
+
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import json
+import os
+import signal
+import subprocess
+import threading
+import time
+
+
+class GradleResult:
+    def __init__(self, args: List[str], returncode: int, stdout: str, stderr: str, elapsed: float, warm: bool, timed_out: bool = False):
+        """
+        Gradleの実行結果を表すクラスを初期化します。
+
+        Args:
+            args: 実行したGradleの引数
+            returncode: 終了コード
+            stdout: 標準出力（capture_output=Falseの場合は空文字列）
+            stderr: 標準エラー出力（capture_output=Falseの場合は空文字列）
+            elapsed: 実行時間（秒）
+            warm: 同じディレクトリで2回目以降の実行であればTrue
+            timed_out: タイムアウトして強制終了した場合はTrue
+        """
+        self.args = args
+        self.returncode = returncode
+        self.stdout = stdout
+        self.stderr = stderr
+        self.elapsed = elapsed
+        self.warm = warm
+        self.timed_out = timed_out
+
+    @property
+    def is_success(self) -> bool:
+        return self.returncode == 0 and not self.timed_out
+
+    def __str__(self):
+        timed_out = ", timed out" if self.timed_out else ""
+        return f"gradle {' '.join(self.args)}: {self.elapsed:.2f}s ({'warm' if self.warm else 'cold'}{timed_out})"
+
+
+class GradleRunner:
+    """`mise x gradle -- gradle ...` を毎回起動するランナー"""
+
+    # タイムアウト時にSIGINTを送ってからSIGKILLを送るまでの猶予（秒）
+    kill_grace_period = 10.0
+
+    def __init__(self):
+        self.results: List[GradleResult] = []
+        self._used_paths = set()
+        self._lock = threading.Lock()
+
+    def _command(self, path: Path) -> List[str]:
+        return ["mise", "x", "gradle", "--", "gradle"]
+
+    def _env(self, path: Path) -> Optional[Dict[str, str]]:
+        return None
+
+    def run(
+        self,
+        path: Path,
+        args: List[str],
+        check: bool = False,
+        capture_output: bool = False,
+        env: Optional[Dict[str, str]] = None,
+        timeout: Optional[float] = None,
+    ) -> GradleResult:
+        """Gradleを実行します。
+
+        Args:
+            path: Gradleプロジェクトのディレクトリ
+            args: Gradleに渡す引数
+            check: Trueの場合、失敗時にsubprocess.CalledProcessErrorを送出する
+            capture_output: Trueの場合、標準出力と標準エラー出力を取得する
+            env: 追加する環境変数（テストのワーカーにも引き継がれる）
+            timeout: タイムアウト（秒）。超えた場合はプロセスグループごと終了し、timed_outの結果を返す
+
+        Returns:
+            Gradleの実行結果
+        """
+        command = self._command(path) + args
+        base_env = self._env(path)
+        if env:
+            env = {**(base_env if base_env is not None else os.environ), **env}
+        else:
+            env = base_env
+
+        with self._lock:
+            key = str(Path(path).resolve())
+            warm = key in self._used_paths
+            self._used_paths.add(key)
+
+        started = time.perf_counter()
+        timed_out = False
+        if timeout is None:
+            completed = subprocess.run(command, cwd=path, check=False, capture_output=capture_output, text=True, env=env)
+        else:
+            completed, timed_out = self._run_with_timeout(command, path, capture_output, env, timeout)
+        elapsed = time.perf_counter() - started
+
+        result = GradleResult(
+            args=args,
+            returncode=completed.returncode,
+            stdout=completed.stdout or "",
+            stderr=completed.stderr or "",
+            elapsed=elapsed,
+            warm=warm,
+            timed_out=timed_out,
+        )
+        with self._lock:
+            self.results.append(result)
+        print(f"GRADLE {result}")
+
+        if check and not result.is_success:
+            raise subprocess.CalledProcessError(result.returncode, command, result.stdout, result.stderr)
+
+        return result
+
+    def _run_with_timeout(
+        self,
+        command: List[str],
+        path: Path,
+        capture_output: bool,
+        env: Optional[Dict[str, str]],
+        timeout: float,
+    ) -> Tuple[subprocess.CompletedProcess, bool]:
+        """新しいプロセスグループでGradleを起動し、タイムアウトした場合はグループごと終了します。
+
+        まずSIGINTを送り、Gradleにビルド（デーモン上のテストのワーカーを含む）をキャンセルさせます。
+        猶予時間内に終了しない場合はSIGKILLでグループごと終了します。
+
+        Returns:
+            (実行結果, タイムアウトした場合はTrue)
+        """
+        pipe = subprocess.PIPE if capture_output else None
+        process = subprocess.Popen(command, cwd=path, stdout=pipe, stderr=pipe, text=True, env=env, start_new_session=True)
+        try:
+            stdout, stderr = process.communicate(timeout=timeout)
+            return subprocess.CompletedProcess(command, process.returncode, stdout, stderr), False
+        except subprocess.TimeoutExpired:
+            pass
+
+        print(f"GRADLE TIMED OUT after {timeout:.1f}s: {' '.join(command)}")
+        self._kill_group(process, signal.SIGINT)
+        try:
+            stdout, stderr = process.communicate(timeout=self.kill_grace_period)
+        except subprocess.TimeoutExpired:
+            self._kill_group(process, signal.SIGKILL)
+            stdout, stderr = process.communicate()
+        return subprocess.CompletedProcess(command, process.returncode, stdout, stderr), True
+
+    def _kill_group(self, process: subprocess.Popen, sig: int):
+        try:
+            os.killpg(process.pid, sig)
+        except ProcessLookupError:
+            pass
+
+    def report(self) -> str:
+        """これまでの実行時間をwarm/coldごとに集計した文字列を返します。"""
+        lines = []
+        for warm in [False, True]:
+            elapsed = [result.elapsed for result in self.results if result.warm == warm]
+            if not elapsed:
+                continue
+            label = "warm" if warm else "cold"
+            lines.append(f"{label}: {len(elapsed)} runs, total {sum(elapsed):.2f}s, mean {sum(elapsed) / len(elapsed):.2f}s")
+        return "\n".join(lines)
+
+    def close(self):
+        """ランナーが保持しているリソースを解放します。"""
+        pass
+
+
+class DaemonGradleRunner(GradleRunner):
+    """常駐するGradleデーモンを再利用するランナー
+
+    miseが解決する環境変数（PATHなど）をディレクトリごとに一度だけ取得してキャッシュし、
+    以降は `gradle --daemon` を直接起動します。worktreeごとに最初の呼び出しでデーモンが温まり、
+    2回目以降はmiseの解決とデーモンの起動を省略できます。
+    """
+
+    def __init__(self, idle_timeout_ms: int = 3 * 60 * 60 * 1000):
+        """
+        Args:
+            idle_timeout_ms: デーモンが使われない場合に終了するまでの時間（ミリ秒）
+        """
+        super().__init__()
+        self.idle_timeout_ms = idle_timeout_ms
+        self._envs: Dict[str, Dict[str, str]] = {}
+
+    def _command(self, path: Path) -> List[str]:
+        return ["gradle", "--daemon", f"-Dorg.gradle.daemon.idletimeout={self.idle_timeout_ms}"]
+
+    def _env(self, path: Path) -> Dict[str, str]:
+        key = str(Path(path).resolve())
+        with self._lock:
+            if key in self._envs:
+                return self._envs[key]
+
+        # miseの解決は重いため、ディレクトリごとに一度だけ実行する
+        output = subprocess.run(["mise", "env", "--json"], cwd=path, check=True, capture_output=True, text=True).stdout
+        env = {**os.environ, **json.loads(output)}
+
+        with self._lock:
+            self._envs[key] = env
+        return env
+
+    def close(self):
+        """起動したGradleデーモンを停止します。"""
+        with self._lock:
+            paths = list(self._envs.keys())
+            envs = dict(self._envs)
+            self._envs = {}
+
+        for path in paths:
+            # 削除済みのworktreeでは実行できない
+            if not Path(path).exists():
+                continue
+            subprocess.run(["gradle", "--stop"], cwd=path, check=False, env=envs[path])
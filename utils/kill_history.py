@@ -0,0 +1,143 @@
+"""
+MUTANTを検出した（killした）テストケースの履歴を記録するモジュール。
+
+同じソースコードのMUTANTは、過去に他のMUTANTを検出したテストケースで検出されることが多いため、
+それらのテストケースを先に実行すると、多くのMUTANTを全てのテストを実行せずに判定できます。
+
+主な機能:
+- KillHistory: 実行中のプロセスのメモリ上に、テストケースがMUTANTを検出した回数を記録する
+- KillMatrix: MUTANTとテストケースの組ごとの結果（検出したか、実行時間）をSQLiteに保存し、
+  次回以降の実行でも使えるようにする
+
+使用例:
+    history = KillMatrix()
+    history.record("src/main/kotlin/Foo.kt", mutant_hash, report.cases)
+    repository.test(tests, fail_fast=True, priority_tests=history.priority_tests("src/main/kotlin/Foo.kt"))
+"""
+
+from collections import Counter
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Set, Tuple
+from utils.test_results import TestCaseResult, SKIPPED
+import hashlib
+import sqlite3
+import threading
+
+
+def mutant_hash(code: str) -> str:
+    """MUTANTを適用したソースコードのハッシュ値を返します。"""
+    return hashlib.sha256(code.encode()).hexdigest()
+
+
+class KillHistory:
+    """実行中のプロセスのメモリ上に、ソースコードごとにテストケースがMUTANTを検出した回数を記録します。"""
+
+    def __init__(self):
+        self._counts: Dict[str, Counter] = {}
+        # (ソースコード, MUTANTのハッシュ値) -> MUTANTを検出したテストケースのID
+        self._kills: Dict[Tuple[str, str], Set[str]] = {}
+        # worktreeごとのスレッドから記録されるため、ロックで守る
+        self._lock = threading.Lock()
+
+    def record(self, source: str, mutant: str, cases: List[TestCaseResult]):
+        """MUTANTに対して実行したテストケースの結果を記録します。
+
+        同じMUTANTを再びテストした場合は、回数を重ねて数えずに最新の結果で置き換えます。
+
+        Args:
+            source: MUTANTを作成したソースコード（リポジトリのルートからの相対パス）
+            mutant: MUTANTのハッシュ値（mutant_hash）
+            cases: MUTANTに対して実行したテストケースの結果
+        """
+        killers = {case.id for case in cases if case.is_failure}
+        with self._lock:
+            counts = self._counts.setdefault(source, Counter())
+            counts.subtract(self._kills.get((source, mutant), set()))
+            counts.update(killers)
+            self._kills[(source, mutant)] = killers
+
+    def priority_tests(self, source: str, limit: int = 5) -> List[str]:
+        """先に実行するテストケースを、MUTANTを検出した回数の多い順に返します。
+
+        Args:
+            source: ソースコード（リポジトリのルートからの相対パス）
+            limit: 返すテストケースの最大数
+
+        Returns:
+            テストケースのIDのリスト
+        """
+        with self._lock:
+            counts = [(test, count) for test, count in self._counts.get(source, Counter()).items() if 0 < count]
+        # 回数が同じ場合はIDの順にし、実行ごとに順番が変わらないようにする
+        ranked = sorted(counts, key=lambda item: (-item[1], item[0]))
+        return [test for test, _ in ranked[:limit]]
+
+
+KILL_MATRIX_SCHEMA = """
+CREATE TABLE IF NOT EXISTS kills (
+    source TEXT NOT NULL,
+    mutant TEXT NOT NULL,
+    test_id TEXT NOT NULL,
+    killed INTEGER NOT NULL,
+    duration REAL NOT NULL,
+    recorded_at TEXT NOT NULL,
+    PRIMARY KEY (source, mutant, test_id)
+);
+CREATE INDEX IF NOT EXISTS kills_source_test_id ON kills(source, test_id);
+"""
+
+
+class KillMatrix(KillHistory):
+    """MUTANT × テストケースの結果をSQLiteに保存し、実行をまたいでテストの順番に使います。"""
+
+    def __init__(self, path: Path = Path("results/kill_matrix.sqlite3")):
+        """
+        Args:
+            path: SQLiteのデータベースファイル
+        """
+        super().__init__()
+        self.path = path
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # worktreeごとのスレッドから記録されるため、接続を共有してロックで守る
+        self._lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.executescript(KILL_MATRIX_SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def record(self, source: str, mutant: str, cases: List[TestCaseResult]):
+        now = datetime.now(timezone.utc).isoformat()
+        rows = [
+            (source, mutant, case.id, int(case.is_failure), case.duration, now)
+            for case in cases if case.status != SKIPPED
+        ]
+        with self._lock, self.connection:
+            # 同じMUTANTを再びテストした場合は最新の結果で置き換える
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO kills (source, mutant, test_id, killed, duration, recorded_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+
+    def priority_tests(self, source: str, limit: int = 5) -> List[str]:
+        """MUTANTを検出した回数の多い順に、同じ回数なら平均の実行時間が短い順にテストケースを返します。"""
+        with self._lock:
+            rows = self.connection.execute(
+                "SELECT test_id FROM kills WHERE source = ?"
+                " GROUP BY test_id HAVING SUM(killed) > 0"
+                " ORDER BY SUM(killed) DESC, AVG(duration) ASC, test_id ASC LIMIT ?",
+                (source, limit),
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def kill_rate(self, source: str) -> Dict[str, float]:
+        """テストケースごとに、実行したMUTANTのうち検出した割合を返します。"""
+        with self._lock:
+            rows = self.connection.execute(
+                "SELECT test_id, AVG(killed) FROM kills WHERE source = ? GROUP BY test_id ORDER BY test_id",
+                (source,),
+            ).fetchall()
+        return {test_id: rate for test_id, rate in rows}
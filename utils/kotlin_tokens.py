@@ -0,0 +1,325 @@
+"""
+Kotlinのソースコードをトークン列に正規化するモジュール。
+
+テストを通過したMUTANTの中には、空白、コメント、書式、リテラルの書き方だけが元のソースコードと
+異なるものが多くあります。このモジュールはソースコードを以下のように正規化したトークン列にし、
+それが一致すれば構文上等価とみなせるようにします。
+
+- 空白、行コメント、ブロックコメント（入れ子を含む）を除く
+- 改行は文の区切りになる場合のみ残し、`;` も改行として扱う
+- 閉じ括弧の直前の末尾のカンマを除く
+- 1つのリテラルか識別子だけを囲む冗長な括弧を除く（関数呼び出しや分解宣言の括弧は除かない）
+- 数値リテラルを正規化する（`_` の除去、16進数と2進数の10進数への変換、接尾辞の大文字化）
+
+使用例:
+    if is_token_equivalent(source_code, mutated_code):
+        print("等価なMUTANT")
+"""
+
+from typing import List, Optional, Tuple
+import hashlib
+import re
+
+NEWLINE = "<NL>"
+
+# 長いものから順に照合する演算子
+OPERATORS = sorted([
+    "===", "!==", "..<", "...",
+    "?.", "?:", "::", "..", "->", "&&", "||", "==", "!=", "<=", ">=",
+    "+=", "-=", "*=", "/=", "%=", "++", "--", "!!",
+], key=len, reverse=True)
+
+# この後の改行は文の区切りにならない（式や引数が続く）
+NO_NEWLINE_AFTER = {
+    "(", "[", "{", ",", ".", "?.", "::", ":", "=", "+=", "-=", "*=", "/=", "%=",
+    "+", "-", "*", "/", "%", "&&", "||", "==", "!=", "===", "!==", "<=", ">=",
+    "?:", "..", "..<", "->", "!",
+}
+
+# この前の改行は文の区切りにならない（前の式の続きになる）
+NO_NEWLINE_BEFORE = {
+    ")", "]", "}", ",", ".", "?.", "::", ":", "?:", "&&", "||", "->",
+    "==", "!=", "===", "!==", "=", "..", "..<", "else", "catch", "finally",
+}
+
+# 冗長な括弧を除かない直前のトークン（関数呼び出しや、括弧が構文の一部になるもの）
+CALL_LIKE_PREVIOUS = {")", "]", "}", ">", "!!", "?"}
+KEYWORDS_BEFORE_EXPRESSION = {"return", "throw", "in", "is", "as"}
+# 直後にこれらが続く括弧は分解宣言（`{ (p) -> p }` や `for ((a) in xs)`）の可能性があるため除かない。
+# `(p)` は `p.component1()` を呼ぶため、括弧を除くと意味が変わる
+DESTRUCTURING_FOLLOWING = {"->", ":", "in"}
+
+# Kotlinの識別子にはUnicodeの文字も使える（`val 平均 = 1` など）
+IDENTIFIER_PATTERN = re.compile(r"[^\W\d]\w*")
+NUMBER_PATTERN = re.compile(
+    r"0[xX][0-9a-fA-F_]+[uUlL]*"
+    r"|0[bB][01_]+[uUlL]*"
+    r"|(?:[0-9][0-9_]*)?\.[0-9][0-9_]*(?:[eE][+-]?[0-9_]+)?[fF]?"
+    r"|[0-9][0-9_]*(?:[eE][+-]?[0-9_]+[fF]?|[fF]|[uUlL]*)"
+)
+
+
+def _scan_block_comment(code: str, i: int) -> int:
+    """入れ子のブロックコメントの終わりの位置を返します。閉じていない場合は末尾"""
+    depth = 0
+    while i < len(code):
+        if code.startswith("/*", i):
+            depth += 1
+            i += 2
+        elif code.startswith("*/", i):
+            depth -= 1
+            i += 2
+            if depth == 0:
+                return i
+        else:
+            i += 1
+    return i
+
+
+def _scan_string(code: str, i: int) -> int:
+    """文字列リテラル（テンプレートを含む）の終わりの位置を返します。iは開始の `"` の位置"""
+    if code.startswith('"""', i):
+        end = code.find('"""', i + 3)
+        if end == -1:
+            return len(code)
+        # `""""` のように続く引用符は文字列の内容に含まれる
+        end += 3
+        while end < len(code) and code[end] == '"':
+            end += 1
+        return end
+
+    i += 1
+    while i < len(code):
+        char = code[i]
+        if char == "\\":
+            i += 2
+        elif char == '"' or char == "\n":
+            return i + 1
+        elif code.startswith("${", i):
+            i = _scan_template(code, i + 2)
+        else:
+            i += 1
+    return i
+
+
+def _scan_template(code: str, i: int) -> int:
+    """文字列テンプレートの `${...}` の終わりの位置を返します。iは `${` の直後の位置"""
+    depth = 1
+    while i < len(code):
+        char = code[i]
+        if char == '"':
+            i = _scan_string(code, i)
+            continue
+        if char == "{":
+            depth += 1
+        elif char == "}":
+            depth -= 1
+            if depth == 0:
+                return i + 1
+        i += 1
+    return i
+
+
+def _scan_char(code: str, i: int) -> int:
+    """文字リテラルの終わりの位置を返します。iは開始の `'` の位置"""
+    i += 1
+    while i < len(code):
+        if code[i] == "\\":
+            i += 2
+        elif code[i] == "'" or code[i] == "\n":
+            return i + 1
+        else:
+            i += 1
+    return i
+
+
+def _normalize_number(literal: str) -> str:
+    """数値リテラルを、同じ値と型を表す1つの書き方に揃えます。"""
+    text = literal.replace("_", "")
+    lower = text.lower()
+
+    if lower.startswith(("0x", "0b")):
+        digits = lower[2:].rstrip("ul")
+        suffix = lower[2 + len(digits):].upper()
+        try:
+            return str(int(digits, 16 if lower.startswith("0x") else 2)) + suffix
+        except ValueError:
+            return literal
+
+    is_float = lower.endswith("f")
+    body = lower[:-1] if is_float else lower
+    if is_float or "." in body or "e" in body:
+        try:
+            value = repr(float(body))
+        except ValueError:
+            return literal
+        return value + "F" if is_float else value
+
+    digits = body.rstrip("ul")
+    suffix = body[len(digits):].upper()
+    try:
+        return str(int(digits)) + suffix
+    except ValueError:
+        return literal
+
+
+def tokenize_kotlin(code: str) -> List[Tuple[str, str]]:
+    """Kotlinのソースコードを (種類, トークン) のリストに分割します。
+
+    種類は "newline", "identifier", "number", "string", "char", "operator" のいずれかです。
+    空白とコメントは含みません（改行を含むブロックコメントは改行として扱います）。
+    """
+    tokens = []
+    i = 0
+    length = len(code)
+    while i < length:
+        char = code[i]
+
+        if char == "\n" or char == ";":
+            tokens.append(("newline", NEWLINE))
+            i += 1
+        elif char in " \t\r\f":
+            i += 1
+        elif code.startswith("//", i):
+            end = code.find("\n", i)
+            i = length if end == -1 else end
+        elif code.startswith("/*", i):
+            end = _scan_block_comment(code, i)
+            if "\n" in code[i:end]:
+                tokens.append(("newline", NEWLINE))
+            i = end
+        elif char == '"':
+            end = _scan_string(code, i)
+            tokens.append(("string", code[i:end]))
+            i = end
+        elif char == "'":
+            end = _scan_char(code, i)
+            tokens.append(("char", code[i:end]))
+            i = end
+        elif char == "`":
+            end = code.find("`", i + 1)
+            end = length if end == -1 else end + 1
+            tokens.append(("identifier", code[i:end]))
+            i = end
+        elif char.isdigit() or (char == "." and i + 1 < length and code[i + 1].isdigit() and (i == 0 or code[i - 1] != ".")):
+            match = NUMBER_PATTERN.match(code, i)
+            if match is None:
+                tokens.append(("operator", char))
+                i += 1
+            else:
+                tokens.append(("number", _normalize_number(match.group())))
+                i = match.end()
+        elif char.isalpha() or char == "_":
+            match = IDENTIFIER_PATTERN.match(code, i)
+            if match is None:
+                tokens.append(("operator", char))
+                i += 1
+            else:
+                tokens.append(("identifier", match.group()))
+                i = match.end()
+        else:
+            for operator in OPERATORS:
+                if code.startswith(operator, i):
+                    tokens.append(("operator", operator))
+                    i += len(operator)
+                    break
+            else:
+                tokens.append(("operator", char))
+                i += 1
+    return tokens
+
+
+def _drop_insignificant_newlines(tokens: List[Tuple[str, str]]) -> List[Tuple[str, str]]:
+    # 後ろから走査して、各位置より後にある最初の改行以外のトークンを求めておく
+    following_tokens: List[Optional[str]] = [None] * len(tokens)
+    following = None
+    for index in range(len(tokens) - 1, -1, -1):
+        following_tokens[index] = following
+        kind, token = tokens[index]
+        if kind != "newline":
+            following = token
+
+    result = []
+    for index, (kind, token) in enumerate(tokens):
+        if kind != "newline":
+            result.append((kind, token))
+            continue
+        previous = result[-1][1] if result else None
+        following = following_tokens[index]
+        if previous is None or following is None or previous == NEWLINE:
+            continue
+        if previous in NO_NEWLINE_AFTER or following in NO_NEWLINE_BEFORE:
+            continue
+        result.append((kind, token))
+    return result
+
+
+def _drop_trailing_commas(tokens: List[Tuple[str, str]]) -> List[Tuple[str, str]]:
+    return [
+        token for index, token in enumerate(tokens)
+        if not (token[1] == "," and index + 1 < len(tokens) and tokens[index + 1][1] in (")", "]", ">", "->"))
+    ]
+
+
+def _drop_redundant_parentheses(tokens: List[Tuple[str, str]]) -> List[Tuple[str, str]]:
+    changed = True
+    while changed:
+        changed = False
+        result: List[Tuple[str, str]] = []
+        index = 0
+        while index < len(tokens):
+            if (
+                tokens[index][1] == "("
+                and index + 2 < len(tokens)
+                and tokens[index + 2][1] == ")"
+                and tokens[index + 1][0] in ("identifier", "number", "string", "char")
+                and not (index + 3 < len(tokens) and tokens[index + 3][1] in DESTRUCTURING_FOLLOWING)
+                and _allows_bare_expression(result[-1] if result else None)
+            ):
+                result.append(tokens[index + 1])
+                index += 3
+                changed = True
+            else:
+                result.append(tokens[index])
+                index += 1
+        tokens = result
+    return tokens
+
+
+def _allows_bare_expression(previous: Optional[Tuple[str, str]]) -> bool:
+    """直前のトークンの後の括弧が、式をまとめるだけの括弧になるかどうかを返します。"""
+    if previous is None:
+        return True
+    kind, token = previous
+    if kind == "identifier":
+        # `f(x)` や `if (x)` の括弧は構文の一部
+        return token in KEYWORDS_BEFORE_EXPRESSION
+    if kind in ("number", "string", "char"):
+        return False
+    return token not in CALL_LIKE_PREVIOUS
+
+
+def normalize_kotlin(code: str) -> List[str]:
+    """Kotlinのソースコードを、書式の違いを除いたトークン列に正規化します。
+
+    Args:
+        code: Kotlinのソースコード
+
+    Returns:
+        正規化したトークンのリスト
+    """
+    tokens = tokenize_kotlin(code)
+    tokens = _drop_insignificant_newlines(tokens)
+    tokens = _drop_trailing_commas(tokens)
+    tokens = _drop_redundant_parentheses(tokens)
+    return [token for _, token in tokens]
+
+
+def token_hash(code: str) -> str:
+    """正規化したトークン列のハッシュ値を返します。"""
+    return hashlib.sha256("\x00".join(normalize_kotlin(code)).encode()).hexdigest()
+
+
+def is_token_equivalent(left: str, right: str) -> bool:
+    """2つのソースコードの正規化したトークン列が一致するかどうかを返します。"""
+    return normalize_kotlin(left) == normalize_kotlin(right)
@@ -0,0 +1,119 @@
+"""
+ソースコードの行を索引化し、ハンクの位置の候補を高速に探すモジュール。
+
+DiffHunkProcessorは、ハンクの最初の行がソースコードに見つからない場合に
+ソースコード全体を1行ずつずらしながら類似度を計算していました。
+LineIndexは以下の2つの索引から、ハンクの開始位置の候補を投票で絞り込みます。
+
+- 空白を除いた行の内容 -> 行番号のリスト
+- 行の文字n-gram（shingle） -> 行番号のリスト
+
+類似度の計算は、絞り込んだ候補に対してのみ行います。
+
+使用例:
+    index = LineIndex(source_lines)
+    candidates = index.candidate_starts(original_lines)
+"""
+
+from collections import Counter, defaultdict
+from typing import Dict, List, Set
+
+
+class LineIndex:
+    def __init__(self, source_lines: List[str], shingle_size: int = 3, max_postings_ratio: float = 0.1):
+        """
+        Args:
+            source_lines: ソースコードの行リスト
+            shingle_size: shingleの文字数
+            max_postings_ratio: この割合より多くの行に現れるshingleは、候補の絞り込みに使わない
+        """
+        self.shingle_size = shingle_size
+        self.stripped_lines = [line.strip() for line in source_lines]
+        self.max_postings = max(8, int(len(source_lines) * max_postings_ratio))
+
+        # 行の内容 -> 行番号（1-indexed）
+        self.positions: Dict[str, List[int]] = defaultdict(list)
+        # shingle -> 行番号（1-indexed）
+        self.postings: Dict[str, List[int]] = defaultdict(list)
+
+        for line_number, stripped in enumerate(self.stripped_lines, 1):
+            self.positions[stripped].append(line_number)
+            for shingle in self._shingles(stripped):
+                self.postings[shingle].append(line_number)
+
+    def __len__(self):
+        return len(self.stripped_lines)
+
+    def _shingles(self, stripped: str) -> Set[str]:
+        if len(stripped) < self.shingle_size:
+            return {stripped} if stripped else set()
+        return {stripped[i:i + self.shingle_size] for i in range(len(stripped) - self.shingle_size + 1)}
+
+    def find_line(self, line: str) -> List[int]:
+        """空白を除いた内容が一致する行の行番号（1-indexed, 昇順）を返します。"""
+        return self.positions.get(line.strip(), [])
+
+    def similar_lines(self, line: str, threshold: float = 0.5) -> Dict[int, float]:
+        """内容が似ている行を探します。
+
+        Args:
+            line: 探す行
+            threshold: 共通するshingleの割合の下限
+
+        Returns:
+            行番号（1-indexed）から共通するshingleの割合への対応
+        """
+        shingles = self._shingles(line.strip())
+        if not shingles:
+            return {}
+
+        counts = Counter()
+        for shingle in shingles:
+            postings = self.postings.get(shingle)
+            # 多くの行に現れるshingleは位置の手がかりにならない
+            if not postings or self.max_postings < len(postings):
+                continue
+            counts.update(postings)
+
+        result = {}
+        for line_number, count in counts.items():
+            score = count / len(shingles)
+            if threshold <= score:
+                result[line_number] = score
+        return result
+
+    def candidate_starts(self, original_lines: List[str], limit: int = 8) -> List[int]:
+        """ハンクの元のコードの行から、ソースコード内の開始位置の候補を返します。
+
+        各行について、一致する行や似ている行の位置から開始位置を逆算して投票します。
+        多くの位置に現れる行（`}` など）の票は軽くします。
+
+        Args:
+            original_lines: ハンクから抽出した元のコードの行リスト
+            limit: 返す候補の最大数
+
+        Returns:
+            開始行番号（1-indexed）の候補。票の多い順
+        """
+        votes = Counter()
+        for offset, line in enumerate(original_lines):
+            if not line.strip():
+                continue
+
+            positions = self.find_line(line)
+            if positions:
+                for position in positions:
+                    votes[position - offset] += 1.0 / len(positions)
+                continue
+
+            similar = self.similar_lines(line)
+            for position, score in similar.items():
+                votes[position - offset] += score / len(similar)
+
+        candidates = [
+            (score, start) for start, score in votes.items()
+            if 1 <= start <= len(self.stripped_lines)
+        ]
+        # 票が同じ場合は前の位置を優先する
+        candidates.sort(key=lambda item: (-item[0], item[1]))
+        return [start for _, start in candidates[:limit]]
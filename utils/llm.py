@@ -1,10 +1,24 @@
 from langchain_aws import ChatBedrockConverse
+from typing import Tuple, Union
 from .credentials import Credentials
+from .llm_scheduler import get_model_name
 
 CLAUDE_3_HAIKU = "us.anthropic.claude-3-haiku-20240307-v1:0"
 CLAUDE_3_5_SONNET = "us.anthropic.claude-3-5-sonnet-20241022-v2:0"
 CLAUDE_3_7_SONNET = "us.anthropic.claude-3-7-sonnet-20250219-v1:0"
 
+# Bedrockのプロンプトキャッシュに対応するモデル（モデルIDに含まれる文字列）
+PROMPT_CACHE_MODELS = [
+    "anthropic.claude-3-7-sonnet",
+    "anthropic.claude-3-5-haiku",
+    "anthropic.claude-sonnet-4",
+    "anthropic.claude-opus-4",
+    "amazon.nova",
+]
+
+# このブロックまでのプロンプトをキャッシュするマーカー（Converse APIのcachePoint）
+CACHE_POINT = {"cachePoint": {"type": "default"}}
+
 def get_bedrock_llm(
         credentials:Credentials,
         # model_id:str = CLAUDE_3_HAIKU,
@@ -12,6 +26,11 @@ def get_bedrock_llm(
         model_id:str = CLAUDE_3_7_SONNET,
         region_name:str="us-east-1",
 ):
+    """BedrockのLLMを作成します。
+
+    モデルがプロンプトキャッシュに対応している場合、cached_messageで作成したメッセージの
+    キャッシュポイントまでのプロンプトがキャッシュされます。
+    """
     return ChatBedrockConverse(
         model_id=model_id,
         aws_access_key_id=credentials.access_key_id,
@@ -20,3 +39,29 @@ def get_bedrock_llm(
         region_name=region_name,
         temperature=0.0,
     )
+
+
+def supports_prompt_cache(llm) -> bool:
+    """LLMのモデルがBedrockのプロンプトキャッシュに対応しているかどうかを返します。"""
+    model = get_model_name(llm)
+    return any(name in model for name in PROMPT_CACHE_MODELS)
+
+
+def cached_message(llm, role: str, template: str) -> Tuple[str, Union[str, list]]:
+    """呼び出しごとに変わらないメッセージのプロンプトテンプレートを作成します。
+
+    モデルがプロンプトキャッシュに対応している場合は、メッセージの後にキャッシュポイントを置き、
+    最初のメッセージからこのメッセージまでを次の呼び出しで再利用します。
+    キャッシュされる部分は呼び出しごとに同じである必要があるため、変わるメッセージより前に置いてください。
+
+    Args:
+        llm: LLM
+        role: メッセージの役割（"user"など）
+        template: メッセージのテンプレート
+
+    Returns:
+        ChatPromptTemplate.from_messagesに渡すメッセージ
+    """
+    if not supports_prompt_cache(llm):
+        return (role, template)
+    return (role, [{"type": "text", "text": template}, CACHE_POINT])
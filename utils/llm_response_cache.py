@@ -0,0 +1,196 @@
+"""
+LLMの応答（Toolの出力）をディスクにキャッシュするモジュール。
+
+モデルID、temperature、展開したプロンプトのメッセージ、Toolのスキーマからキーを作り、
+Toolの出力を `results/llm_cache/<キーの先頭2文字>/<キー>.json` に保存します。
+
+モード:
+    off: キャッシュを使わない
+    record: キャッシュがあれば使い、なければLLMを呼び出して結果を保存する
+    replay: キャッシュのみを使う。キャッシュがない場合は LLMResponseCacheMiss を送出する。
+            LLMを呼び出さないため、ネットワークや認証情報がなくてもグラフを実行できる
+
+キャッシュの合計サイズが上限を超えた場合は、最後に使われた時刻（ファイルの更新時刻）が
+古いものから削除します。
+
+使用例:
+    set_default_response_cache(LLMResponseCache(mode=REPLAY))
+"""
+
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from pathlib import Path
+from typing import List, Optional
+import hashlib
+import json
+import os
+import tempfile
+from utils.llm_scheduler import get_model_name
+
+OFF = "off"
+RECORD = "record"
+REPLAY = "replay"
+MODES = [OFF, RECORD, REPLAY]
+
+
+def _content_without_cache_points(content):
+    """メッセージの内容からプロンプトキャッシュのキャッシュポイントを除きます。
+
+    キャッシュポイントは応答を変えないため、キャッシュポイントの有無でキーが変わらないようにします。
+    """
+    if not isinstance(content, list):
+        return content
+    blocks = [block for block in content if not (isinstance(block, dict) and "cachePoint" in block)]
+    if len(blocks) == 1 and isinstance(blocks[0], dict) and blocks[0].get("type") == "text":
+        return blocks[0]["text"]
+    return blocks
+
+
+class LLMResponseCacheMiss(Exception):
+    """replayモードでキャッシュが見つからなかった場合のエラー"""
+
+
+class LLMResponseCache:
+    def __init__(self, root: Path = Path("results/llm_cache"), mode: str = RECORD, max_bytes: int = 256 * 1024 * 1024):
+        """
+        Args:
+            root: キャッシュを保存するディレクトリ
+            mode: off, record, replay のいずれか
+            max_bytes: キャッシュの合計サイズの上限
+        """
+        if mode not in MODES:
+            raise ValueError(f"不明なモードです: {mode}")
+
+        self.root = root
+        self.mode = mode
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        # キャッシュの合計サイズ。最初に保存する時に計算する
+        self._total_bytes: Optional[int] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != OFF
+
+    def key(self, llm, messages: list, tool) -> str:
+        """LLMの応答を一意に決めるキーを作成します。
+
+        Args:
+            llm: LLM
+            messages: プロンプトを展開したメッセージのリスト
+            tool: LLMに呼び出させるTool
+
+        Returns:
+            キャッシュのキー
+        """
+        payload = {
+            "model": get_model_name(llm),
+            "temperature": getattr(llm, "temperature", None),
+            "messages": [{"type": message.type, "content": _content_without_cache_points(message.content)} for message in messages],
+            "tool": convert_to_openai_tool(tool),
+        }
+        encoded = json.dumps(payload, ensure_ascii=False, sort_keys=True, default=str)
+        return hashlib.sha256(encoded.encode()).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.root / key[:2] / f"{key}.json"
+
+    def get(self, key: str) -> Optional[str]:
+        """キャッシュされたToolの出力を取得します。
+
+        Args:
+            key: キャッシュのキー
+
+        Returns:
+            Toolの出力。キャッシュがない場合はNone
+
+        Raises:
+            LLMResponseCacheMiss: replayモードでキャッシュがない場合
+        """
+        path = self._path(key)
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.misses += 1
+            if self.mode == REPLAY:
+                raise LLMResponseCacheMiss(f"LLMの応答がキャッシュにありません: {key}")
+            return None
+
+        # 最後に使われた時刻を更新し、削除される順番を後ろにする
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+
+        self.hits += 1
+        return entry["content"]
+
+    def put(self, key: str, content: str, model: Optional[str] = None):
+        """Toolの出力をキャッシュに保存します。replayモードでは保存しません。
+
+        Args:
+            key: キャッシュのキー
+            content: Toolの出力
+            model: 一緒に保存するモデル名
+        """
+        if self.mode != RECORD:
+            return
+
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        # 途中で中断されても壊れたファイルが残らないように、一時ファイルから置き換える
+        fd, temp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump({"model": model, "content": content}, f, ensure_ascii=False)
+        os.replace(temp_path, path)
+
+        if self._total_bytes is None:
+            self._total_bytes = sum(entry.stat().st_size for entry in self._entries())
+        else:
+            self._total_bytes += path.stat().st_size
+
+        if self.max_bytes < self._total_bytes:
+            self._evict()
+
+    def _entries(self) -> List[Path]:
+        if not self.root.exists():
+            return []
+        return list(self.root.glob("*/*.json"))
+
+    def _evict(self):
+        """合計サイズが上限を下回るまで、最後に使われた時刻が古いものから削除します。"""
+        entries = []
+        for entry in self._entries():
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry))
+        entries.sort()
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry in entries:
+            if total <= self.max_bytes:
+                break
+            entry.unlink(missing_ok=True)
+            total -= size
+        self._total_bytes = total
+
+    def report(self) -> str:
+        return f"llm cache ({self.mode}): {self.hits} hits, {self.misses} misses"
+
+
+_default_response_cache: Optional[LLMResponseCache] = None
+
+
+def get_default_response_cache() -> Optional[LLMResponseCache]:
+    """全てのノードで共有するキャッシュを返します。設定されていない場合はNone"""
+    return _default_response_cache
+
+
+def set_default_response_cache(cache: Optional[LLMResponseCache]):
+    """全てのノードで共有するキャッシュを設定します。"""
+    global _default_response_cache
+    _default_response_cache = cache
@@ -0,0 +1,257 @@
+"""
+LLMの呼び出しを管理するスケジューラーのモジュール。
+
+全てのノードのLLM呼び出しを1つのスケジューラーに通すことで、以下を行います。
+
+- LLMとToolの組み合わせごとに、bind_toolsしたチェーンを再利用する
+- 全体とモデルごとの同時実行数を制限する
+- Bedrockのスロットリングエラーを、ジッター付きの指数バックオフで再試行する
+- 呼び出しごとにタイムアウトを設定する
+- 待ち行列の長さと呼び出しにかかった時間のヒストグラムを記録する
+- 入出力のトークン数と、プロンプトキャッシュの読み込みと書き込みのトークン数を記録する
+
+使用例:
+    scheduler = get_default_scheduler()
+    bound = scheduler.chain(llm, tool, lambda: llm.bind_tools([tool]))
+    response = await scheduler.run(llm, lambda: bound.ainvoke(args))
+    print(scheduler.report())
+"""
+
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, TypeVar
+import asyncio
+import random
+import time
+
+T = TypeVar("T")
+
+# スロットリングとして再試行するエラーコード
+THROTTLING_ERROR_CODES = {
+    "ThrottlingException",
+    "TooManyRequestsException",
+    "ServiceUnavailableException",
+    "ModelNotReadyException",
+}
+
+# 呼び出し時間のヒストグラムの区切り（秒）
+LATENCY_BUCKETS = [1.0, 2.0, 5.0, 10.0, 30.0, 60.0, 120.0]
+
+
+def get_model_name(llm) -> str:
+    """LLMのモデル名を取得します。"""
+    for name in ["model_id", "model", "model_name"]:
+        value = getattr(llm, name, None)
+        if isinstance(value, str) and value:
+            return value
+    return type(llm).__name__
+
+
+def is_throttling_error(error: BaseException) -> bool:
+    """エラーがスロットリングなど、時間を置けば成功する可能性のあるものか判定します。"""
+    if isinstance(error, asyncio.TimeoutError):
+        return True
+
+    # botocore.exceptions.ClientError
+    response = getattr(error, "response", None)
+    if isinstance(response, dict):
+        code = response.get("Error", {}).get("Code")
+        if code in THROTTLING_ERROR_CODES:
+            return True
+
+    name = type(error).__name__
+    if any(code in name for code in THROTTLING_ERROR_CODES):
+        return True
+    return "Too many requests" in str(error) or "ThrottlingException" in str(error)
+
+
+class LLMCallScheduler:
+    def __init__(
+        self,
+        max_in_flight: int = 8,
+        max_in_flight_per_model: int = 4,
+        max_retries: int = 5,
+        base_delay: float = 1.0,
+        max_delay: float = 30.0,
+        timeout: Optional[float] = 300.0,
+    ):
+        """
+        Args:
+            max_in_flight: 全体で同時に実行する呼び出しの最大数
+            max_in_flight_per_model: モデルごとに同時に実行する呼び出しの最大数
+            max_retries: スロットリングの場合に再試行する最大回数
+            base_delay: 再試行までの待ち時間の基準（秒）
+            max_delay: 再試行までの待ち時間の上限（秒）
+            timeout: 1回の呼び出しのタイムアウト（秒）。Noneの場合はタイムアウトしない
+        """
+        if max_in_flight < 1 or max_in_flight_per_model < 1:
+            raise ValueError("同時実行数は1以上である必要があります")
+
+        self.max_in_flight = max_in_flight
+        self.max_in_flight_per_model = max_in_flight_per_model
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.timeout = timeout
+
+        # (id(llm), tool名) -> (llm, チェーン)
+        self._chains: Dict[Tuple[int, str], Tuple[Any, Any]] = {}
+
+        # セマフォはイベントループごとに作成する
+        self._loop = None
+        self._global: Optional[asyncio.Semaphore] = None
+        self._per_model: Dict[str, asyncio.Semaphore] = {}
+
+        self.queue_depth = 0
+        self.max_queue_depth = 0
+        self.in_flight = 0
+        self.calls = 0
+        self.retries = 0
+        self.failures = 0
+        self.latencies: Dict[str, List[float]] = {}
+        # モデル -> トークン数（input, output, cache_read, cache_write）
+        self.usage: Dict[str, Dict[str, int]] = {}
+
+    def chain(self, llm, tool, build: Callable[[], Any]):
+        """LLMとToolの組み合わせごとにチェーンを作成し、再利用します。
+
+        Args:
+            llm: LLM
+            tool: LLMに渡すTool
+            build: チェーンを作成する関数
+
+        Returns:
+            作成済みのチェーン
+        """
+        key = (id(llm), tool.name)
+        cached = self._chains.get(key)
+        # idが再利用された場合に別のLLMのチェーンを返さないように、LLM自体も比較する
+        if cached is None or cached[0] is not llm:
+            cached = (llm, build())
+            self._chains[key] = cached
+        return cached[1]
+
+    def _semaphores(self, model: str) -> Tuple[asyncio.Semaphore, asyncio.Semaphore]:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._global = asyncio.Semaphore(self.max_in_flight)
+            self._per_model = {}
+        if model not in self._per_model:
+            self._per_model[model] = asyncio.Semaphore(self.max_in_flight_per_model)
+        return self._global, self._per_model[model]
+
+    def _backoff(self, attempt: int) -> float:
+        # Full Jitter: 同時にスロットリングされた呼び出しが一斉に再試行しないようにする
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    async def run(self, llm, call: Callable[[], Awaitable[T]]) -> T:
+        """同時実行数の制限の範囲でLLMを呼び出します。
+
+        Args:
+            llm: 呼び出すLLM（同時実行数の制限に使う）
+            call: 呼び出しを行うコルーチンを返す関数。再試行のたびに呼ばれる
+
+        Returns:
+            呼び出しの結果
+        """
+        model = get_model_name(llm)
+        global_semaphore, model_semaphore = self._semaphores(model)
+
+        attempt = 0
+        while True:
+            self.queue_depth += 1
+            self.max_queue_depth = max(self.max_queue_depth, self.queue_depth)
+            try:
+                await model_semaphore.acquire()
+                try:
+                    await global_semaphore.acquire()
+                except BaseException:
+                    model_semaphore.release()
+                    raise
+            finally:
+                self.queue_depth -= 1
+
+            self.in_flight += 1
+            started = time.perf_counter()
+            try:
+                if self.timeout is None:
+                    result = await call()
+                else:
+                    result = await asyncio.wait_for(call(), self.timeout)
+            except Exception as e:
+                error = e
+            else:
+                error = None
+            finally:
+                self.in_flight -= 1
+                global_semaphore.release()
+                model_semaphore.release()
+                self.latencies.setdefault(model, []).append(time.perf_counter() - started)
+                self.calls += 1
+
+            if error is None:
+                return result
+
+            if self.max_retries <= attempt or not is_throttling_error(error):
+                self.failures += 1
+                raise error
+
+            delay = self._backoff(attempt)
+            attempt += 1
+            self.retries += 1
+            print(f"LLM {model}: {type(error).__name__}, retry {attempt}/{self.max_retries} in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+    def record_usage(self, llm, usage_metadata: Optional[dict]):
+        """応答のusage_metadataからトークン数を記録します。
+
+        Args:
+            llm: 呼び出したLLM
+            usage_metadata: AIMessageのusage_metadata。input_tokensはキャッシュのトークンを含む
+        """
+        if not usage_metadata:
+            return
+        details = usage_metadata.get("input_token_details") or {}
+        usage = self.usage.setdefault(get_model_name(llm), {"input": 0, "output": 0, "cache_read": 0, "cache_write": 0})
+        usage["input"] += usage_metadata.get("input_tokens", 0)
+        usage["output"] += usage_metadata.get("output_tokens", 0)
+        usage["cache_read"] += details.get("cache_read", 0) or 0
+        usage["cache_write"] += details.get("cache_creation", 0) or 0
+
+    def histogram(self, model: str) -> Dict[str, int]:
+        """モデルごとの呼び出し時間のヒストグラムを返します。"""
+        buckets = {f"<={bound:g}s": 0 for bound in LATENCY_BUCKETS}
+        buckets[f">{LATENCY_BUCKETS[-1]:g}s"] = 0
+        for latency in self.latencies.get(model, []):
+            for bound in LATENCY_BUCKETS:
+                if latency <= bound:
+                    buckets[f"<={bound:g}s"] += 1
+                    break
+            else:
+                buckets[f">{LATENCY_BUCKETS[-1]:g}s"] += 1
+        return buckets
+
+    def report(self) -> str:
+        """呼び出しの統計を文字列で返します。"""
+        lines = [
+            f"LLM calls: {self.calls} (retries: {self.retries}, failures: {self.failures}, max queue depth: {self.max_queue_depth})"
+        ]
+        for model, latencies in self.latencies.items():
+            histogram = ", ".join(f"{bucket}: {count}" for bucket, count in self.histogram(model).items() if count)
+            lines.append(f"  {model}: {len(latencies)} calls, total {sum(latencies):.1f}s [{histogram}]")
+        for model, usage in self.usage.items():
+            lines.append(
+                f"  {model}: {usage['input']} input tokens (cache read: {usage['cache_read']}, cache write: {usage['cache_write']}), "
+                f"{usage['output']} output tokens"
+            )
+        return "\n".join(lines)
+
+
+_default_scheduler: Optional[LLMCallScheduler] = None
+
+
+def get_default_scheduler() -> LLMCallScheduler:
+    """全てのノードで共有するスケジューラーを返します。"""
+    global _default_scheduler
+    if _default_scheduler is None:
+        _default_scheduler = LLMCallScheduler()
+    return _default_scheduler
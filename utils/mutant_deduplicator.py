@@ -0,0 +1,69 @@
+"""
+テストを実行する前に、重複したMUTANTと変更のないMUTANTを除くモジュール。
+
+LLMが生成したdiffには、同じ変更を繰り返すMUTANTブロックや、空白やコメントだけを変更するMUTANTブロックが
+よく含まれます。MutantDeduplicatorはMUTANTを適用したソースコードを正規化したトークン列のハッシュ値で比較し、
+元のソースコードや先に見つかったMUTANTと同じものを、Gradleのテストを実行する前に除きます。
+
+使用例:
+    deduplicator = MutantDeduplicator(source_code)
+    mutated_codes = [code for code in mutated_codes if deduplicator.add(code)]
+    print(deduplicator.report())
+"""
+
+from utils.kotlin_tokens import token_hash
+import hashlib
+
+
+class MutantDeduplicator:
+    def __init__(self, source_code: str):
+        """
+        Args:
+            source_code: 元のソースコード
+        """
+        self.source_hash = _hash(source_code)
+        self.seen = set()
+        self.unique = 0
+        self.duplicates = 0
+        self.noops = 0
+
+    def add(self, mutated_code: str) -> bool:
+        """MUTANTを記録し、テストする必要があるかどうかを返します。
+
+        Args:
+            mutated_code: MUTANTを適用したソースコード
+
+        Returns:
+            初めて見つかったMUTANTの場合はTrue。元のソースコードや先に記録したMUTANTと同じ場合はFalse
+        """
+        code_hash = _hash(mutated_code)
+        if code_hash == self.source_hash:
+            self.noops += 1
+            return False
+        if code_hash in self.seen:
+            self.duplicates += 1
+            return False
+        self.seen.add(code_hash)
+        self.unique += 1
+        return True
+
+    @property
+    def saved(self) -> int:
+        """除いたMUTANTの数（省略したテストの実行回数）"""
+        return self.duplicates + self.noops
+
+    def report(self) -> str:
+        return f"mutant dedup: {self.unique} unique, {self.duplicates} duplicates, {self.noops} no-ops, {self.saved} test runs saved"
+
+
+def _hash(code: str) -> str:
+    """正規化したトークン列のハッシュ値を返します。
+
+    重複の除去は実行時間を減らすためだけのものなので、正規化に失敗した場合は実行を止めずに、
+    ソースコードそのもののハッシュ値を使います（空白やコメントだけが異なるMUTANTは除けなくなる）。
+    """
+    try:
+        return token_hash(code)
+    except Exception as e:
+        print(f"TOKEN NORMALIZATION FAILED: {e!r}")
+        return "raw:" + hashlib.sha256(code.encode()).hexdigest()
@@ -1,4 +1,4 @@
-from typing import List, Optional, Tuple
+from typing import Callable, Iterator, List, Optional, Tuple
 import re
 from .detect_diff_hunks import DiffHunk, DiffHunkProcessor
 
@@ -152,3 +152,143 @@ def generate_mutant_diff_from_hunks(hunks: List[DiffHunk]) -> List[DiffHunk]:
     """
     generator = MutantDiffGenerator(hunks)
     return generator.generate_hunks()
+
+
+MUTANT_START_TAG = "MUTANT <START>"
+MUTANT_END_TAG = "MUTANT <END>"
+MUTANT_SKIP_TAG = "MUTANT <SKIP>"
+_MUTANT_TAG_PATTERN = re.compile(r"MUTANT <(?:START|END)>")
+
+
+def iter_mutant_diffs(diff: str) -> Iterator[str]:
+    """DIFFから、MUTANTブロックを1つだけ有効にしたDIFFを順に生成します。
+
+    各MUTANTブロックは、STARTタグから次のSTART/END/EOFまでを対象とし、
+    他のブロックのタグは全てSKIPに置換します。次のSTARTで終わるブロックは、そのSTARTをENDに置換します。
+
+    タグの位置はDIFFを1回走査して求め、全てのタグをSKIPに置換したDIFFも1回だけ作成します。
+    各MUTANTのDIFFは、その前後を切り出して連結するだけで作るため、
+    MUTANTの数が多くてもDIFF全体の置換を繰り返しません。
+
+    Args:
+        diff: 元のDIFF文字列
+
+    Returns:
+        MUTANTごとのDIFF文字列のイテレーター
+    """
+    # タグの位置（元のDIFFでの開始位置、終了位置、STARTかどうか）
+    tags = [(match.start(), match.end(), match.group() == MUTANT_START_TAG) for match in _MUTANT_TAG_PATTERN.finditer(diff)]
+    if not any(is_start for _, _, is_start in tags):
+        return
+
+    # 全てのタグをSKIPに置換したDIFFと、各タグの置換後の開始位置と終了位置
+    pieces = []
+    skipped_positions = []
+    skipped_length = 0
+    previous_end = 0
+    for start, end, _ in tags:
+        pieces.append(diff[previous_end:start])
+        skipped_length += start - previous_end
+        skipped_positions.append((skipped_length, skipped_length + len(MUTANT_SKIP_TAG)))
+        pieces.append(MUTANT_SKIP_TAG)
+        skipped_length += len(MUTANT_SKIP_TAG)
+        previous_end = end
+    pieces.append(diff[previous_end:])
+    skipped = "".join(pieces)
+
+    for index, (start, end, is_start) in enumerate(tags):
+        if not is_start:
+            continue
+
+        before = skipped[:skipped_positions[index][0]]
+        if index + 1 == len(tags):
+            # 次のタグがない場合はEOFまで
+            yield before + diff[start:]
+            continue
+
+        next_start, next_end, next_is_start = tags[index + 1]
+        after = skipped[skipped_positions[index + 1][1]:]
+        if next_is_start:
+            # 次のSTARTで終わる場合は、STARTをENDに置換
+            yield before + diff[start:next_start] + MUTANT_END_TAG + after
+        else:
+            yield before + diff[start:next_end] + after
+
+
+class MutantDiffStream:
+    """生成中のDIFFから、完成したMUTANTブロックのDIFFを順に取り出すクラス。
+
+    LLMがDIFFを生成し終わるのを待たずに、ENDタグまで届いたMUTANTのテストを始めるために使います。
+    MUTANTブロックは、閉じるタグ（ENDまたは次のSTART）の後に削除行と空白行以外の行が届いた時点で
+    完成したものとみなします（ENDタグの後の削除行はrearrangeでENDタグの前に移動されるため）。
+    各MUTANTのDIFFはその時点までのDIFFから作成し、同じMUTANTは一度だけ返します。
+
+    使用例:
+        stream = MutantDiffStream()
+        for partial_diff in partial_diffs:
+            for diff_mutant in stream.feed(partial_diff):
+                ...
+        remaining = stream.finish(diff)
+    """
+
+    def __init__(self, rearrange: Optional[Callable[[str], str]] = None):
+        """
+        Args:
+            rearrange: MUTANTを取り出す前にDIFFに適用する変換（タグの位置の調整など）
+        """
+        self.rearrange = rearrange
+        self.emitted = 0
+
+    def feed(self, partial_diff: str) -> List[str]:
+        """生成途中のDIFFを受け取り、新しく完成したMUTANTのDIFFを返します。
+
+        Args:
+            partial_diff: 先頭から生成済みの部分のDIFF
+
+        Returns:
+            新しく完成したMUTANTのDIFFのリスト
+        """
+        # 最後の行は生成途中の可能性があるため、改行で終わる行までを使う
+        text = partial_diff[:partial_diff.rfind("\n") + 1]
+        completed = self._completed_blocks(text)
+        if completed <= self.emitted:
+            return []
+        return self._emit(text, completed)
+
+    def finish(self, diff: str) -> List[str]:
+        """生成が終わったDIFFを受け取り、まだ返していない全てのMUTANTのDIFFを返します。"""
+        return self._emit(diff, None)
+
+    def _emit(self, text: str, completed: Optional[int]) -> List[str]:
+        if self.rearrange is not None:
+            text = self.rearrange(text)
+        diff_mutants = list(iter_mutant_diffs(text))
+        if completed is None:
+            completed = len(diff_mutants)
+        new_diff_mutants = diff_mutants[self.emitted:completed]
+        self.emitted += len(new_diff_mutants)
+        return new_diff_mutants
+
+    def _completed_blocks(self, text: str) -> int:
+        """完成したMUTANTブロックの数を返します。"""
+        completed = 0
+        is_open = False
+        # ENDタグの後に、削除行と空白行以外の行を待っているかどうか
+        waiting = False
+        for line in text.splitlines():
+            if waiting and line.strip() and not line.startswith("-"):
+                completed += 1
+                waiting = False
+
+            match = _MUTANT_TAG_PATTERN.search(line)
+            if match is None:
+                continue
+            if match.group() == MUTANT_START_TAG:
+                if is_open:
+                    # 次のSTARTで終わるブロック
+                    completed += 1
+                is_open = True
+            elif is_open:
+                is_open = False
+                waiting = True
+        return completed
@@ -0,0 +1,403 @@
+"""
+MUTANTのスキーマ（mutant schemata）を生成するモジュール。
+
+全てのMUTANTを1つのソースコードにまとめ、実行時の環境変数で有効なMUTANTを切り替えます。
+これにより、プロジェクトのコンパイルは1回で済み、テストだけをMUTANTの数だけ実行できます。
+
+MUTANTは関数単位で切り替えます。変更を含む関数ごとに、MUTANTを適用した関数のコピーを
+`<関数名>__mutant<ID>` という名前のprivate関数として追加し、元の関数の先頭で
+有効なMUTANTのコピーに処理を委譲します。
+
+    fun mean(numbers: List<Int>): Double {
+        if (__MUTANT_ID == 1) return mean__mutant1(numbers)
+        ...
+    }
+
+    private fun mean__mutant1(numbers: List<Int>): Double {
+        ...
+    }
+
+以下のMUTANTは切り替えられないため、スキーマには含めず unsupported として返します。
+- 変更が関数本体（ブロック形式）の内側に収まらないもの（プロパティ、コンストラクタ、シグネチャの変更など）
+- 変更が複数の関数にまたがるもの
+"""
+
+from typing import Dict, List, Optional, Tuple
+import difflib
+import re
+
+# 有効なMUTANTのIDを指定する環境変数
+MUTANT_ID_ENV = "MUTANT_ID"
+
+# スキーマ内で有効なMUTANTのIDを保持する変数
+SWITCH_NAME = "__MUTANT_ID"
+
+FUN_PATTERN = re.compile(r'\bfun\b\s*(?:<[^>]*>\s*)?(?:\S+\.)?(\w+)\s*\(')
+
+# コピーした関数から取り除く修飾子
+REMOVED_MODIFIERS = {
+    "public", "protected", "internal", "private",
+    "override", "open", "abstract", "final", "operator", "actual", "expect",
+}
+
+
+class KotlinFunction:
+    def __init__(self, name: str, start: int, body_start: Optional[int], end: int, params: List[str]):
+        """
+        Kotlinの関数の位置情報を表すクラスを初期化します。
+
+        Args:
+            name: 関数名
+            start: `fun` を含む行のインデックス（0-indexed）
+            body_start: 本体の開始 `{` を含む行のインデックス。式形式の関数の場合はNone
+            end: 関数の最後の行のインデックス
+            params: 呼び出し時に渡す引数のリスト（varargの場合は `*name`）
+        """
+        self.name = name
+        self.start = start
+        self.body_start = body_start
+        self.end = end
+        self.params = params
+
+    def __str__(self):
+        return f"{self.name}: {self.start + 1}-{self.end + 1}"
+
+
+class MutantSchema:
+    def __init__(self, code: str, mutant_ids: Dict[int, int], unsupported: List[int]):
+        """
+        Args:
+            code: 全てのMUTANTを含むスキーマのソースコード
+            mutant_ids: MUTANTのインデックスからスキーマ上のIDへの対応
+            unsupported: スキーマに含められなかったMUTANTのインデックス
+        """
+        self.code = code
+        self.mutant_ids = mutant_ids
+        self.unsupported = unsupported
+
+
+def mask_lines(lines: List[str]) -> List[str]:
+    """文字列リテラルとコメントを空白に置き換えた行のリストを返します。
+
+    列の位置を維持するため、置き換え後の各行は元の行と同じ長さになります。
+
+    Args:
+        lines: ソースコードの行リスト
+
+    Returns:
+        マスクされた行リスト
+    """
+    masked = []
+    in_block_comment = False
+    in_raw_string = False
+
+    for line in lines:
+        out = []
+        in_string = False
+        i = 0
+        while i < len(line):
+            c = line[i]
+            if in_block_comment:
+                if line.startswith("*/", i):
+                    in_block_comment = False
+                    out.append("  ")
+                    i += 2
+                else:
+                    out.append(" ")
+                    i += 1
+                continue
+            if in_raw_string:
+                if line.startswith('"""', i):
+                    in_raw_string = False
+                    out.append("   ")
+                    i += 3
+                else:
+                    out.append(" ")
+                    i += 1
+                continue
+            if in_string:
+                if c == "\\":
+                    out.append(" " * len(line[i:i + 2]))
+                    i += 2
+                    continue
+                if c == '"':
+                    in_string = False
+                out.append(" ")
+                i += 1
+                continue
+
+            if line.startswith("//", i):
+                out.append(" " * (len(line) - i))
+                break
+            if line.startswith("/*", i):
+                in_block_comment = True
+                out.append("  ")
+                i += 2
+                continue
+            if line.startswith('"""', i):
+                in_raw_string = True
+                out.append("   ")
+                i += 3
+                continue
+            if c == '"':
+                in_string = True
+                out.append(" ")
+                i += 1
+                continue
+            if c == "'":
+                # 文字リテラル（'{', '\n', '\'' など）
+                end = line.find("'", i + 3 if line[i + 1:i + 2] == "\\" else i + 2)
+                if end != -1:
+                    out.append(" " * (end - i + 1))
+                    i = end + 1
+                    continue
+
+            out.append(c)
+            i += 1
+
+        masked.append("".join(out))
+
+    return masked
+
+
+def _scan(masked: List[str], line: int, col: int):
+    """指定位置から順に (行, 列, 文字) を返します。"""
+    while line < len(masked):
+        text = masked[line]
+        while col < len(text):
+            yield line, col, text[col]
+            col += 1
+        line += 1
+        col = 0
+
+
+def _parse_params(params_text: str) -> List[str]:
+    """引数リストの文字列から、呼び出し時に渡す引数のリストを作成します。"""
+    parts = []
+    depth = 0
+    current = []
+    # 関数型の `->` は括弧として扱わない
+    for c in params_text.replace("->", "  "):
+        if c in "(<[{":
+            depth += 1
+        elif c in ")>]}":
+            depth -= 1
+        if c == "," and depth == 0:
+            parts.append("".join(current))
+            current = []
+        else:
+            current.append(c)
+    parts.append("".join(current))
+
+    params = []
+    for part in parts:
+        part = re.sub(r'@[\w.:]+(\([^)]*\))?\s*', '', part).strip()
+        if not part:
+            continue
+        declaration = part.split(":")[0].split()
+        if not declaration:
+            continue
+        name = declaration[-1]
+        params.append(f"*{name}" if "vararg" in declaration[:-1] else name)
+    return params
+
+
+def find_functions(lines: List[str]) -> List[KotlinFunction]:
+    """ソースコードから関数を検出します。
+
+    Args:
+        lines: ソースコードの行リスト
+
+    Returns:
+        検出された関数のリスト（ネストした関数も含む）
+    """
+    masked = mask_lines(lines)
+    functions = []
+
+    for index, text in enumerate(masked):
+        for match in FUN_PATTERN.finditer(text):
+            function = _parse_function(masked, index, match)
+            if function is not None:
+                functions.append(function)
+
+    return functions
+
+
+def _parse_function(masked: List[str], start: int, match: re.Match) -> Optional[KotlinFunction]:
+    name = match.group(1)
+
+    # 引数リストの終わりを探す
+    depth = 0
+    params_text = []
+    position = None
+    for line, col, c in _scan(masked, start, match.end() - 1):
+        if c == "(":
+            depth += 1
+        elif c == ")":
+            depth -= 1
+            if depth == 0:
+                position = (line, col + 1)
+                break
+        if 1 <= depth and not (depth == 1 and c == "("):
+            params_text.append(c)
+        if col == len(masked[line]) - 1:
+            params_text.append(" ")
+    if position is None:
+        return None
+    params = _parse_params("".join(params_text))
+
+    # 本体の開始（ブロック形式の `{` または式形式の `=`）を探す
+    depth = 0
+    body_start = None
+    for line, col, c in _scan(masked, *position):
+        if c in "([":
+            depth += 1
+        elif c in ")]":
+            depth -= 1
+        elif depth == 0 and c == "=":
+            return KotlinFunction(name, start, None, line, params)
+        elif depth == 0 and c == "}":
+            # 本体のない関数（抽象関数など）
+            return None
+        elif depth == 0 and c == "{":
+            body_start = (line, col)
+            break
+    if body_start is None:
+        return None
+
+    # 本体の終わりを探す
+    depth = 0
+    for line, col, c in _scan(masked, *body_start):
+        if c == "{":
+            depth += 1
+        elif c == "}":
+            depth -= 1
+            if depth == 0:
+                # `{` の後ろや `}` の前に同じ行でコードが続く場合は対象外
+                is_block = (
+                    not masked[body_start[0]][body_start[1] + 1:].strip()
+                    and masked[line].strip() == "}"
+                )
+                return KotlinFunction(name, start, body_start[0] if is_block else None, line, params)
+    return None
+
+
+def _find_mutated_function(functions: List[KotlinFunction], original_lines: List[str], mutated_lines: List[str]) -> Optional[KotlinFunction]:
+    """MUTANTの変更を全て含む、最も外側のブロック形式の関数を返します。"""
+    matcher = difflib.SequenceMatcher(None, original_lines, mutated_lines, autojunk=False)
+    changes = [(i1, i2) for tag, i1, i2, _, _ in matcher.get_opcodes() if tag != "equal"]
+    if not changes:
+        return None
+
+    candidates = [
+        function for function in functions
+        if function.body_start is not None
+        and all(function.body_start < i1 and i2 <= function.end for i1, i2 in changes)
+    ]
+    if not candidates:
+        return None
+
+    return min(candidates, key=lambda function: function.start)
+
+
+def _rename_signature(line: str, name: str, new_name: str) -> str:
+    """関数のシグネチャ行の関数名を変更し、privateにします。"""
+    masked = mask_lines([line])[0]
+    match = FUN_PATTERN.search(masked)
+    if match is None or match.group(1) != name:
+        raise ValueError(f"関数のシグネチャが見つかりません: {line}")
+
+    indent = line[:len(line) - len(line.lstrip())]
+    modifiers = [token for token in line[:match.start()].split() if token not in REMOVED_MODIFIERS]
+    rest = line[match.start():match.start(1)] + new_name + line[match.end(1):]
+    return indent + " ".join(modifiers + ["private", rest])
+
+
+def _body_indent(lines: List[str], function: KotlinFunction) -> str:
+    for line in lines[function.body_start + 1:function.end]:
+        if line.strip():
+            return line[:len(line) - len(line.lstrip())]
+    signature = lines[function.start]
+    return signature[:len(signature) - len(signature.lstrip())] + "    "
+
+
+def _switch_declaration_index(lines: List[str]) -> int:
+    """スキーマの切り替え用の変数を宣言する行のインデックスを返します。"""
+    index = 0
+    for i, line in enumerate(mask_lines(lines)):
+        stripped = line.strip()
+        if stripped.startswith("package ") or stripped.startswith("import "):
+            index = i + 1
+        elif stripped and not stripped.startswith("@file:"):
+            break
+    return index
+
+
+def build_mutant_schema(source_code: str, mutated_codes: List[Optional[str]]) -> MutantSchema:
+    """全てのMUTANTを実行時に切り替えられるスキーマのソースコードを生成します。
+
+    Args:
+        source_code: 元のソースコード
+        mutated_codes: MUTANTごとの変更後のソースコード（適用できなかったMUTANTはNone）
+
+    Returns:
+        スキーマのソースコードと、各MUTANTのIDの対応
+    """
+    original_lines = source_code.split("\n")
+    functions = find_functions(original_lines)
+
+    mutant_ids: Dict[int, int] = {}
+    unsupported: List[int] = []
+    # 関数の開始行 -> (関数, [(ID, コピーした関数の行リスト)])
+    copies: Dict[int, Tuple[KotlinFunction, List[Tuple[int, List[str]]]]] = {}
+
+    for index, mutated_code in enumerate(mutated_codes):
+        if mutated_code is None:
+            unsupported.append(index)
+            continue
+
+        mutated_lines = mutated_code.split("\n")
+        function = _find_mutated_function(functions, original_lines, mutated_lines)
+        if function is None:
+            unsupported.append(index)
+            continue
+
+        # 変更は関数の内側にあるため、関数の前の行は変わらない
+        end = function.end + len(mutated_lines) - len(original_lines)
+        function_lines = mutated_lines[function.start:end + 1]
+        if len(mutated_lines) <= end or mutated_lines[end] != original_lines[function.end]:
+            unsupported.append(index)
+            continue
+
+        mutant_id = len(mutant_ids) + 1
+        mutant_ids[index] = mutant_id
+
+        new_name = f"{function.name}__mutant{mutant_id}"
+        function_lines[0] = _rename_signature(function_lines[0], function.name, new_name)
+        copies.setdefault(function.start, (function, []))[1].append((mutant_id, function_lines))
+
+    # 後ろの関数から挿入し、前の行のインデックスがずれないようにする
+    schema_lines = list(original_lines)
+    for _, (function, function_copies) in sorted(copies.items(), reverse=True):
+        inserted = []
+        for mutant_id, function_lines in function_copies:
+            inserted.append("")
+            inserted.extend(function_lines)
+        schema_lines[function.end + 1:function.end + 1] = inserted
+
+        indent = _body_indent(original_lines, function)
+        args = ", ".join(function.params)
+        dispatch = [
+            f"{indent}if ({SWITCH_NAME} == {mutant_id}) return {function.name}__mutant{mutant_id}({args})"
+            for mutant_id, _ in function_copies
+        ]
+        schema_lines[function.body_start + 1:function.body_start + 1] = dispatch
+
+    if mutant_ids:
+        index = _switch_declaration_index(original_lines)
+        schema_lines[index:index] = [
+            "",
+            f'private val {SWITCH_NAME}: Int = System.getenv("{MUTANT_ID_ENV}")?.toIntOrNull() ?: 0',
+        ]
+
+    return MutantSchema("\n".join(schema_lines), mutant_ids, unsupported)
@@ -0,0 +1,46 @@
+"""
+同じソースコードに多数のDIFFを適用するために、前処理済みのソースコードを保持するモジュール。
+
+1回のグラフの実行では、1つのソースコードに数十個のMUTANTのDIFFを適用します。
+DiffHunkProcessorやDiffContextAdjusterはソースコードを毎回行に分割し、
+ハンクの位置を推測するたびにLineIndexを作り直していました。
+PreparedSourceは行のリスト、空白を除いた行のリスト、LineIndexを一度だけ作成し、
+全てのDIFFの処理で共有します。
+
+使用例:
+    source = PreparedSource.from_file(source_code_path)
+    mutated_codes = apply_diffs_for_mutant(source, diff_mutants)
+"""
+
+from pathlib import Path
+from typing import List, Optional
+from utils.line_index import LineIndex
+
+
+class PreparedSource:
+    def __init__(self, code: str):
+        """
+        Args:
+            code: ソースコード
+        """
+        self.code = code
+        # 共有するため、利用側では変更しないこと
+        self.lines: List[str] = code.split("\n")
+        self.stripped_lines: List[str] = [line.strip() for line in self.lines]
+        self._line_index: Optional[LineIndex] = None
+
+    @classmethod
+    def from_file(cls, path: Path) -> "PreparedSource":
+        """ファイルを読み込んで前処理します。"""
+        with open(path, "r") as f:
+            return cls(f.read())
+
+    @property
+    def line_index(self) -> LineIndex:
+        """ソースコードの行の索引。位置の推測が必要になった時点で一度だけ作成します。"""
+        if self._line_index is None:
+            self._line_index = LineIndex(self.lines)
+        return self._line_index
+
+    def __len__(self):
+        return len(self.lines)
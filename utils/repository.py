@@ -1,23 +1,424 @@
 from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+from contextlib import asynccontextmanager, contextmanager
+import asyncio
+import os
+import re
 import subprocess
+import tempfile
+from utils.gradle_runner import GradleRunner, GradleResult
+from utils.compile_errors import CompileResult, parse_compile_errors
+from utils.test_results import SKIPPED, TestFailure, TestReport, TestTimeout, to_test_filter
+
+# `--tests` には除外の指定がないため、初期化スクリプトでプロパティに指定したテストを除外する
+EXCLUDE_TESTS_PROPERTY = "excludeTests"
+EXCLUDE_TESTS_INIT_SCRIPT = f"""\
+allprojects {{
+    tasks.withType(Test).configureEach {{
+        def excluded = project.findProperty("{EXCLUDE_TESTS_PROPERTY}")
+        if (excluded) {{
+            excluded.toString().split(",").each {{ filter.excludeTestsMatching(it) }}
+        }}
+    }}
+}}
+"""
 
 
 class Repository:
-    def __init__(self, path: Path):
+    def __init__(self, path: Path, runner: Optional[GradleRunner] = None):
+        """
+        Args:
+            path: Gradleプロジェクトのディレクトリ
+            runner: Gradleの実行方法。省略時は `mise x gradle -- gradle` を毎回起動する
+        """
         self.path = path
+        self.runner = runner if runner is not None else GradleRunner()
 
     def clean(self):
         subprocess.run(["git", "reset", "--hard"], cwd=self.path, check=True)
         # subprocess.run(["git", "clean", "-fdx"], cwd=self.path)
 
-    def test(self):
-        subprocess.run(["mise", "x", "gradle", "--", "gradle", "test"], cwd=self.path, check=True)
+    @contextmanager
+    def swap(self, path: Path, content: str):
+        """ファイルの内容を一時的に置き換え、終了時にメモリ上に保持した元の内容に戻します。
+
+        `git reset --hard` でリポジトリ全体を戻す代わりに、変更したファイルだけを置き換えるため、
+        gitのインデックスに触れず、Gradleが変更を検出するのもこのファイルだけになります。
+        ファイルは一時ファイルからos.replaceで置き換えるため、途中の状態が読まれることはありません。
+        プロセスが強制終了されて元に戻せなかった場合は、clean()で復旧します。
+
+        Args:
+            path: 置き換えるファイルのパス
+            content: 置き換える内容
+        """
+        path = Path(path)
+        original = path.read_bytes()
+        _replace_file(path, content.encode())
+        try:
+            yield path
+        finally:
+            _replace_file(path, original)
+
+    @property
+    def test_results_dir(self) -> Path:
+        """GradleがJUnit XMLのレポートを出力するディレクトリ"""
+        return self.path / "build" / "test-results" / "test"
+
+    def _clear_test_results(self):
+        # 前回の実行のレポートを読まないように削除する（testタスクが実行されなかった場合に残るため）
+        if self.test_results_dir.exists():
+            for path in self.test_results_dir.glob("*.xml"):
+                path.unlink(missing_ok=True)
+
+    def run_tests(
+        self,
+        tests: Optional[List[str]] = None,
+        fallback_to_full_suite: bool = False,
+        env: Optional[Dict[str, str]] = None,
+        rerun: bool = False,
+        capture_output: bool = True,
+        fail_fast: bool = False,
+        timeout: Optional[float] = None,
+        exclude_tests: Optional[List[str]] = None,
+    ) -> TestReport:
+        """テストを実行し、JUnit XMLのレポートを解析した結果を返します。テストが失敗しても例外は送出しません。
+
+        Args:
+            tests: 実行するテストのフィルタ（`--tests` に渡す値）。省略時は全てのテストを実行する
+            fallback_to_full_suite: フィルタに一致するテストがない場合に全てのテストを実行するかどうか
+            env: テストに渡す環境変数
+            rerun: Trueの場合、入力が変わっていなくてもtestタスクを再実行する（コンパイルは再実行しない）
+            capture_output: Gradleの出力を取得するかどうか。フィルタがある場合は常に取得する
+            fail_fast: Trueの場合、最初に失敗したテストで実行を止める
+            timeout: Gradleの1回の実行のタイムアウト（秒）。超えた場合はGradleとテストのワーカーを終了する
+            exclude_tests: 実行から除くテストのフィルタ
+
+        Returns:
+            テストケースごとの結果
+        """
+        task = ["test", "--rerun"] if rerun else ["test"]
+        if fail_fast:
+            task.append("--fail-fast")
+        task.extend(self._exclude_tests_args(exclude_tests))
+
+        self._clear_test_results()
+        capture_output = capture_output or bool(tests) or bool(exclude_tests)
+        result = self.runner.run(self.path, [*task, *self._test_filter_args(tests)], capture_output=capture_output, env=env, timeout=timeout)
+
+        if tests and fallback_to_full_suite and not result.is_success and self._is_no_tests_found(result):
+            print("NO TESTS FOUND: FALLBACK TO FULL TEST SUITE")
+            self._clear_test_results()
+            result = self.runner.run(self.path, task, capture_output=capture_output, env=env, timeout=timeout)
+
+        return TestReport.load(self.test_results_dir, result)
+
+    def test(
+        self,
+        tests: Optional[List[str]] = None,
+        fallback_to_full_suite: bool = False,
+        env: Optional[Dict[str, str]] = None,
+        rerun: bool = False,
+        fail_fast: bool = False,
+        priority_tests: Optional[List[str]] = None,
+        timeout: Optional[float] = None,
+    ) -> TestReport:
+        """テストを実行します。失敗した場合はTestFailure（subprocess.CalledProcessErrorのサブクラス）を送出します。
+
+        Gradleが失敗した場合に加えて、JUnit XMLのレポートに失敗したテストケースがある場合も失敗とします。
+
+        Args:
+            tests: 実行するテストのフィルタ（`--tests` に渡す値）。省略時は全てのテストを実行する
+            fallback_to_full_suite: フィルタに一致するテストがない場合に全てのテストを実行するかどうか
+            env: テストに渡す環境変数
+            rerun: Trueの場合、入力が変わっていなくてもtestタスクを再実行する（コンパイルは再実行しない）
+            fail_fast: Trueの場合、最初に失敗したテストで実行を止める
+            priority_tests: 先に実行するテストケースのID（MUTANTを検出しやすいテストなど）。
+                これらが失敗した場合は残りのテストを実行せずにTestFailureを送出する。
+                成功した場合は、これらを除いて残りのテストを実行し、結果をまとめて返す
+            timeout: Gradleの1回の実行のタイムアウト（秒）。超えた場合はTestTimeoutを送出する
+
+        Returns:
+            テストケースごとの結果
+        """
+        passed_priority: Optional[TestReport] = None
+        if priority_tests:
+            # Gradleは1回の実行の中でテストの順番を指定できないため、先に優先するテストだけを実行する
+            print(f"PRIORITY TESTS: {len(priority_tests)}")
+            report = self.run_tests([to_test_filter(test) for test in priority_tests], env=env, rerun=rerun, fail_fast=fail_fast, timeout=timeout)
+            if report.timed_out:
+                raise TestTimeout(report)
+            # コンパイルエラーなどテスト以外の失敗は、残りのテストの実行で判定する
+            if report.failures:
+                raise TestFailure(report)
+            if any(case.status != SKIPPED for case in report.cases):
+                passed_priority = report
+
+        # 成功した優先するテストは、残りのテストの実行から除く
+        exclude_tests = [to_test_filter(case.id) for case in passed_priority.cases] if passed_priority is not None else None
+        # 全てのテストを実行する場合は、従来通りGradleの出力をそのまま表示する
+        report = self.run_tests(
+            tests,
+            fallback_to_full_suite=fallback_to_full_suite and passed_priority is None,
+            env=env,
+            rerun=rerun,
+            capture_output=False,
+            fail_fast=fail_fast,
+            timeout=timeout,
+            exclude_tests=exclude_tests,
+        )
+        if report.timed_out:
+            raise TestTimeout(report)
+        if passed_priority is not None:
+            if self._is_no_tests_found(report.gradle_result):
+                # 優先するテストで全てのテストを実行済み
+                return passed_priority
+            report = TestReport(passed_priority.cases + report.cases, report.gradle_result)
+        if not report.is_success:
+            raise TestFailure(report)
+        return report
 
-    def test2(self) -> tuple[bool, str, str]:
-        # 標準出力を取得
-        result = subprocess.run(["mise", "x", "gradle", "--", "gradle", "test", "--info"], cwd=self.path, check=False, capture_output=True, text=True)
-        # 成功失敗もpairで返す. 成功ならtrue, 失敗ならfalse
-        return result.returncode == 0, result.stdout, result.stderr
+    def compile_tests(self) -> CompileResult:
+        """テストを実行せずに、ソースコードとテストコードのコンパイルだけを行います。
+
+        Returns:
+            コンパイルの結果。失敗した場合はkotlincのエラーを解析して含める
+        """
+        result = self.runner.run(self.path, ["compileTestKotlin"], capture_output=True)
+        if result.is_success:
+            return CompileResult(True, [], result.stdout)
+
+        output = result.stdout + "\n" + result.stderr
+        return CompileResult(False, parse_compile_errors(output), output)
+
+    def _test_filter_args(self, tests: Optional[List[str]]) -> List[str]:
+        args = []
+        for test in tests or []:
+            args.extend(["--tests", test])
+        return args
+
+    def _exclude_tests_args(self, exclude_tests: Optional[List[str]]) -> List[str]:
+        if not exclude_tests:
+            return []
+        init_script = Path(tempfile.gettempdir()) / "exclude_tests.init.gradle"
+        if not init_script.exists() or init_script.read_text() != EXCLUDE_TESTS_INIT_SCRIPT:
+            # worktreeごとのスレッドから同時に書き込まれても壊れないように、一時ファイルから置き換える
+            fd, temp_path = tempfile.mkstemp(dir=init_script.parent, suffix=".tmp")
+            with os.fdopen(fd, "w") as f:
+                f.write(EXCLUDE_TESTS_INIT_SCRIPT)
+            os.replace(temp_path, init_script)
+        return ["--init-script", str(init_script), f"-P{EXCLUDE_TESTS_PROPERTY}={','.join(exclude_tests)}"]
+
+    def _is_no_tests_found(self, result: GradleResult) -> bool:
+        return "No tests found for given includes" in result.stdout + result.stderr
 
     def format(self):
-        subprocess.run(["mise", "x", "gradle", "--", "gradle", "ktlintFormat"], cwd=self.path, check=True)
+        self.runner.run(self.path, ["ktlintFormat"], check=True)
+
+    def restore_changed_files(self, keep: Sequence[Path] = ()):
+        """HEADから変更されたファイルを、keepに含まれるものを除いてHEADの内容に戻します。
+
+        `git reset --hard` でリポジトリ全体を戻す代わりに、フォーマットなどで変更されたファイルだけを戻します。
+
+        Args:
+            keep: 戻さないファイルのパス
+        """
+        result = subprocess.run(["git", "diff", "--name-only", "--relative"], cwd=self.path, check=True, capture_output=True, text=True)
+        kept = {self.relative_path(path) for path in keep}
+        changed = [name for name in result.stdout.splitlines() if name and Path(name) not in kept]
+        if changed:
+            subprocess.run(["git", "checkout", "--", *changed], cwd=self.path, check=True)
+
+    def tree_hash(self) -> str:
+        """HEADにおけるリポジトリのディレクトリのgitのtreeハッシュを返します。"""
+        result = subprocess.run(["git", "rev-parse", "HEAD:./"], cwd=self.path, check=True, capture_output=True, text=True)
+        return result.stdout.strip()
+
+    def relative_path(self, path: Path) -> Path:
+        """リポジトリ内のファイルパスを、リポジトリのルートからの相対パスに変換します。
+
+        Args:
+            path: リポジトリ内のファイルパス
+
+        Returns:
+            リポジトリのルートからの相対パス
+        """
+        return Path(path).resolve().relative_to(self.path.resolve())
+
+    def source_test_pairs(self, source_root: str = "src/main/kotlin", test_root: str = "src/test/kotlin") -> List[Tuple[Path, Path]]:
+        """ソースコードと、それに対応するテストコードの組を探します。
+
+        `<source_root>/**/X.kt` に対して、同じパッケージの `<test_root>/**/XTest.kt` を優先し、
+        なければ別のパッケージにある同じ名前のテストコードを対応させます。
+
+        Args:
+            source_root: ソースコードのディレクトリ（リポジトリのルートからの相対パス）
+            test_root: テストコードのディレクトリ（リポジトリのルートからの相対パス）
+
+        Returns:
+            (ソースコードのパス, テストコードのパス) のリスト。ソースコードのパス順
+        """
+        source_dir = self.path / source_root
+        test_dir = self.path / test_root
+
+        tests_by_name: Dict[str, List[Path]] = {}
+        for test_code_path in sorted(test_dir.rglob("*Test.kt")):
+            tests_by_name.setdefault(test_code_path.name, []).append(test_code_path)
+
+        pairs = []
+        for source_code_path in sorted(source_dir.rglob("*.kt")):
+            test_name = f"{source_code_path.stem}Test.kt"
+            same_package = test_dir / source_code_path.parent.relative_to(source_dir) / test_name
+            if same_package.exists():
+                pairs.append((source_code_path, same_package))
+            elif test_name in tests_by_name:
+                pairs.append((source_code_path, tests_by_name[test_name][0]))
+        return pairs
+
+
+def _replace_file(path: Path, content: bytes):
+    """同じディレクトリの一時ファイルに書き込んでから置き換え、ファイルの内容を原子的に更新します。"""
+    fd, temp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(content)
+        os.chmod(temp_path, path.stat().st_mode & 0o7777)
+        os.replace(temp_path, path)
+    except BaseException:
+        Path(temp_path).unlink(missing_ok=True)
+        raise
+
+def get_test_class_name(test_code_path: Path) -> str:
+    """テストコードのpackage宣言とファイル名から、テストクラスの完全修飾名を取得します。
+
+    Args:
+        test_code_path: テストコードのパス（例: src/test/kotlin/com/example/math/StatisticsCalculatorTest.kt）
+
+    Returns:
+        テストクラスの完全修飾名（例: com.example.math.StatisticsCalculatorTest）
+    """
+    class_name = Path(test_code_path).stem
+    match = re.search(r"^\s*package\s+([\w.]+)", Path(test_code_path).read_text(), re.MULTILINE)
+    if match is None:
+        return class_name
+    return f"{match.group(1)}.{class_name}"
+
+
+class WorktreePool:
+    """リポジトリの `git worktree` を複数作成し、ワーカーに貸し出すプール。
+
+    各worktreeは独立したチェックアウトなので、cleanやテストを並列に実行できます。
+    worktreeはHEADから作成されるため、コミットされていない変更は含まれません。
+    """
+
+    def __init__(self, repository: Repository, size: int, root: Optional[Path] = None, lazy: bool = False):
+        """
+        Args:
+            repository: worktreeの作成元のリポジトリ
+            size: 作成するworktreeの数
+            root: worktreeを作成するディレクトリ。省略時は一時ディレクトリ
+            lazy: Trueの場合、openではworktreeを作成せず、lease()で空きがない場合にsize個まで作成する
+        """
+        if size < 1:
+            raise ValueError(f"worktreeの数は1以上である必要があります: {size}")
+
+        self.repository = repository
+        self.size = size
+        self.root = root
+        self.lazy = lazy
+        self.repositories: List[Repository] = []
+        self._worktree_paths: List[Path] = []
+        self._temp_dir: Optional[tempfile.TemporaryDirectory] = None
+        self._available: Optional[asyncio.Queue] = None
+        self._worktree_root: Optional[Path] = None
+        self._prefix = ""
+        self._created = 0
+
+    def _git(self, *args: str) -> str:
+        result = subprocess.run(["git", *args], cwd=self.repository.path, check=True, capture_output=True, text=True)
+        return result.stdout.strip()
+
+    def open(self) -> "WorktreePool":
+        """worktreeを作成します。lazyの場合は作成の準備だけを行います。"""
+        # リポジトリがgitのルートではない場合もあるため、ルートからの相対位置を取得
+        self._prefix = self._git("rev-parse", "--show-prefix")
+
+        if self.root is None:
+            self._temp_dir = tempfile.TemporaryDirectory(prefix="worktree-pool-")
+            self._worktree_root = Path(self._temp_dir.name)
+        else:
+            self._worktree_root = self.root
+            self._worktree_root.mkdir(parents=True, exist_ok=True)
+
+        self._available = asyncio.Queue()
+        if not self.lazy:
+            for _ in range(self.size):
+                self._available.put_nowait(self._add_worktree(self._next_index()))
+
+        return self
+
+    def _next_index(self) -> int:
+        index = self._created
+        self._created += 1
+        return index
+
+    def _add_worktree(self, index: int) -> Repository:
+        worktree_path = self._worktree_root / f"worktree-{index}"
+        self._git("worktree", "add", "--detach", str(worktree_path), "HEAD")
+        self._worktree_paths.append(worktree_path)
+
+        # Gradleのランナーは元のリポジトリと共有する
+        repository = Repository(worktree_path / self._prefix, runner=self.repository.runner)
+        self.repositories.append(repository)
+        return repository
+
+    def close(self):
+        """作成したworktreeを削除します。"""
+        for worktree_path in self._worktree_paths:
+            subprocess.run(["git", "worktree", "remove", "--force", str(worktree_path)], cwd=self.repository.path, check=False)
+        subprocess.run(["git", "worktree", "prune"], cwd=self.repository.path, check=False)
+
+        self._worktree_paths = []
+        self.repositories = []
+        self._available = None
+        self._created = 0
+
+        if self._temp_dir is not None:
+            self._temp_dir.cleanup()
+            self._temp_dir = None
+
+    def __enter__(self) -> "WorktreePool":
+        return self.open()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @asynccontextmanager
+    async def lease(self):
+        """worktreeのリポジトリを1つ借ります。空きがない場合は返却されるまで待ちます。
+
+        lazyの場合は、空きがなく作成したworktreeがsize個に満たなければ新しく作成します。
+        """
+        if self._available is None:
+            raise RuntimeError("WorktreePoolが開かれていません")
+
+        if self._available.empty() and self._created < self.size:
+            # 番号はスレッドに渡す前に決め、同時に作成しても重ならないようにする
+            repository = await asyncio.to_thread(self._add_worktree, self._next_index())
+        else:
+            repository = await self._available.get()
+        try:
+            yield repository
+        finally:
+            self._available.put_nowait(repository)
+
+    def translate(self, path: Path, repository: Repository) -> Path:
+        """元のリポジトリ内のファイルパスを、worktree内の同じファイルのパスに変換します。
+
+        Args:
+            path: 元のリポジトリ内のファイルパス
+            repository: 変換先のworktreeのリポジトリ
+
+        Returns:
+            worktree内のファイルパス
+        """
+        return repository.path / self.repository.relative_path(path)
@@ -1,6 +1,7 @@
-from typing import List, Optional, Tuple
+from typing import List, Optional, Tuple, Union
 import logging
 from utils.detect_diff_hunks import DiffHunk
+from utils.prepared_source import PreparedSource
 
 # ロガーの設定
 logger = logging.getLogger(__name__)
@@ -34,10 +35,30 @@ def apply_hunk(source_code: str, hunk: DiffHunk) -> str:
     # ハンク適用前の行を追加
     result_lines.extend(source_lines[:start_line - 1])
     
-    # ハンクの内容を処理
-    current_source_line = start_line - 1  # 0-indexedに変換
-    
     # ハンクの内容に基づいて変更を適用
+    current_source_line = _apply_hunk_lines(hunk, source_lines, start_line - 1, result_lines)
+    
+    # ハンク適用後の残りの行を追加
+    if current_source_line < len(source_lines):
+        result_lines.extend(source_lines[current_source_line:])
+    
+    # 結果を文字列として返す
+    return '\n'.join(result_lines)
+
+
+def _apply_hunk_lines(hunk: DiffHunk, source_lines: List[str], current_source_line: int, result_lines: List[str]) -> int:
+    """
+    source_lines[current_source_line:] にハンクの内容を適用し、結果をresult_linesに追加します。
+    
+    Args:
+        hunk: 適用するDiffHunk
+        source_lines: ソースコードの行リスト
+        current_source_line: ハンクを適用する位置（0-indexed）
+        result_lines: 変更後の行を追加するリスト
+        
+    Returns:
+        ハンクの適用後に次に読むソースコードの位置（0-indexed）
+    """
     for line in hunk.diff_lines:  # linesからdiff_linesに変更
         if not line:
             continue
@@ -78,12 +99,7 @@ def apply_hunk(source_code: str, hunk: DiffHunk) -> str:
             line_content = line[1:]  # 先頭の'+'を削除
             result_lines.append(line_content)
     
-    # ハンク適用後の残りの行を追加
-    if current_source_line < len(source_lines):
-        result_lines.extend(source_lines[current_source_line:])
-    
-    # 結果を文字列として返す
-    return '\n'.join(result_lines)
+    return current_source_line
 
 
 def _is_content_similar(left: str, right: str) -> bool:
@@ -125,12 +141,12 @@ def _calculate_line_changes(before_code: str, after_code: str) -> Tuple[int, int
     return added_lines, deleted_lines
 
 
-def apply_hunks(source_code: str, hunks: List[DiffHunk]) -> str:
+def apply_hunks(source_code: Union[str, PreparedSource], hunks: List[DiffHunk]) -> str:
     """
     複数のDiffHunkをソースコードに順番に適用します。
     
     Args:
-        source_code: 元のソースコード
+        source_code: 元のソースコード。PreparedSourceを渡した場合は行の分割を共有する（変更はしない）
         hunks: 適用するDiffHunkのリスト
         
     Returns:
@@ -139,37 +155,49 @@ def apply_hunks(source_code: str, hunks: List[DiffHunk]) -> str:
     # ハンクを行番号順にソート
     sorted_hunks = sorted(hunks, key=lambda h: h.source_start_line)
     
-    # 各ハンクを順番に適用
-    result = source_code
-    
-    # 行番号の調整用の変数
-    line_offset = 0
-    
-    for i, hunk in enumerate(sorted_hunks):
-        # ハンクの行番号を調整
-        if line_offset != 0:
-            # 新しいハンクオブジェクトを作成して行番号を調整
-            adjusted_hunk = DiffHunk(
-                hunk.diff_lines,  # linesからdiff_linesに変更
-                hunk.source_start_line + line_offset,
-                hunk.source_end_line + line_offset
-            )
-        else:
-            adjusted_hunk = hunk
+    # ソースコードを一度だけ行に分割し、先頭から順にハンクを適用する
+    # 変更途中のコードは result_lines + source_lines[current_source_line:] で表す
+    source_lines = source_code.lines if isinstance(source_code, PreparedSource) else source_code.split('\n')
+    original_length = len(source_lines)
+    result_lines = []
+    current_source_line = 0
+    
+    for hunk in sorted_hunks:
+        # 変更途中のコードの行数
+        length = len(result_lines) + len(source_lines) - current_source_line
+        if length == 0:
+            # 前のハンクで全ての行が削除された場合、変更途中のコードは空文字列の1行として扱う
+            # （文字列を行に分割した場合と同じ）
+            source_lines = ['']
+            current_source_line = 0
+            length = 1
         
-        # 変更前のコードを保存
-        before_code = result
+        # これまでの行数の変化でハンクの行番号を調整
+        line_offset = length - original_length
+        start_line = hunk.source_start_line + line_offset
+        end_line = hunk.source_end_line + line_offset
         
-        # ハンクを適用
-        result = apply_hunk(result, adjusted_hunk)
+        # 行番号が範囲外の場合は例外を発生
+        if start_line < 1 or end_line > length:
+            raise ValueError(f"ハンクの行番号が範囲外です: {start_line}-{end_line}, ファイル行数: {length}")
         
-        # 行数の変化を計算
-        # TODO: resultから計算する。diffが正しいと信頼しない
-        # 実際の変更前後のコードから行数の変化を計算
-        added_lines, deleted_lines = _calculate_line_changes(before_code, result)
-        line_offset += (added_lines - deleted_lines)
+        if start_line - 1 < len(result_lines):
+            # 前のハンクの適用結果と重なる場合は、重なった行を未処理の行に戻す
+            source_lines = result_lines[start_line - 1:] + source_lines[current_source_line:]
+            del result_lines[start_line - 1:]
+            current_source_line = 0
+        else:
+            # ハンク適用前の行を追加
+            skip = start_line - 1 - len(result_lines)
+            result_lines.extend(source_lines[current_source_line:current_source_line + skip])
+            current_source_line += skip
+        
+        current_source_line = _apply_hunk_lines(hunk, source_lines, current_source_line, result_lines)
+    
+    # 最後のハンク適用後の残りの行を追加
+    result_lines.extend(source_lines[current_source_line:])
     
-    return result
+    return '\n'.join(result_lines)
 
 
 def apply_diff_from_file(source_path: str, diff: str) -> str:
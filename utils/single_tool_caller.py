@@ -1,15 +1,34 @@
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.runnables import chain
+from typing import AsyncIterator, Optional
+from utils.llm_scheduler import LLMCallScheduler, get_default_scheduler, get_model_name
+from utils.llm_response_cache import LLMResponseCache, get_default_response_cache
+import asyncio
 
 
 class SingleToolCaller:
-    def __init__(self, llm, tool):
+    def __init__(self, llm, tool, scheduler: Optional[LLMCallScheduler] = None, cache: Optional[LLMResponseCache] = None):
+        """
+        Args:
+            llm: LLM
+            tool: LLMに呼び出させるTool
+            scheduler: LLMの呼び出しを管理するスケジューラー。Noneの場合は共有のスケジューラーを使う
+            cache: LLMの応答のキャッシュ。Noneの場合は共有のキャッシュ（設定されていれば）を使う
+        """
         self.llm = llm
         self.tool = tool
+        self.scheduler = scheduler or get_default_scheduler()
+        self._cache = cache
+
+    @property
+    def cache(self) -> Optional[LLMResponseCache]:
+        return self._cache or get_default_response_cache()
 
     def tool_calls(self):
         @chain
         def _tool_calls(response):
+            # プロンプトキャッシュの効果を確認できるように、トークン数を記録する
+            self.scheduler.record_usage(self.llm, getattr(response, "usage_metadata", None))
             return response.tool_calls
         return _tool_calls
 
@@ -21,23 +40,127 @@ class SingleToolCaller:
             raise ValueError(f"Unknown tool: {tool_call['name']}")
         return _tool_router.map()
 
+    def _build_chain(self):
+        llm_with_tools = self.llm.bind_tools([self.tool], tool_choice=self.tool.name)
+        tool_calls = self.tool_calls()
+        tool_router = self.tool_router()
+
+        # https://python.langchain.com/v0.2/docs/how_to/tool_runtime/
+        return llm_with_tools | tool_calls | tool_router
+
     async def call(
         self,
         prompt_template: ChatPromptTemplate,
         invoke_args: dict,
     ) -> str:
-        llm_with_tools = self.llm.bind_tools([self.tool], tool_choice=self.tool.name)
-        tool_calls = self.tool_calls()
-        tool_router = self.tool_router()
+        cache = self.cache
+        if cache is not None and cache.enabled:
+            key = cache.key(self.llm, prompt_template.format_messages(**invoke_args), self.tool)
+            # replayモードでキャッシュがない場合はLLMResponseCacheMissが送出される
+            content = cache.get(key)
+            if content is not None:
+                return content
 
-        # https://python.langchain.com/v0.2/docs/how_to/tool_runtime/
-        chain = prompt_template | llm_with_tools | tool_calls | tool_router
+        # bind_toolsしたチェーンはLLMとToolの組み合わせごとに再利用する
+        tool_chain = self.scheduler.chain(self.llm, self.tool, self._build_chain)
+        chain = prompt_template | tool_chain
 
         # LLMにプロンプトを送信
-        response = await chain.ainvoke(invoke_args)
+        response = await self.scheduler.run(self.llm, lambda: chain.ainvoke(invoke_args))
 
         if 1 < len(response):
             print("warning: response contains multiple contents")
 
         # Toolの結果を取得
-        return response[0].content
+        content = response[0].content
+
+        if cache is not None and cache.enabled:
+            cache.put(key, content, model=get_model_name(self.llm))
+
+        return content
+
+    async def stream(
+        self,
+        prompt_template: ChatPromptTemplate,
+        invoke_args: dict,
+        argument: str,
+    ) -> AsyncIterator[str]:
+        """LLMの応答をストリーミングし、Toolの引数を生成されるたびに途中までの値として返します。
+
+        最後に返す値はcallの戻り値と同じToolの結果です。
+        スロットリングで再試行した場合は、最初から生成し直した値を再び返します。
+
+        Args:
+            prompt_template: プロンプトのテンプレート
+            invoke_args: プロンプトに渡す引数
+            argument: 途中までの値を返すToolの引数の名前（文字列の引数）
+
+        Returns:
+            引数の途中までの値のイテレーター
+        """
+        cache = self.cache
+        if cache is not None and cache.enabled:
+            key = cache.key(self.llm, prompt_template.format_messages(**invoke_args), self.tool)
+            content = cache.get(key)
+            if content is not None:
+                yield content
+                return
+
+        # 途中までの値と、最後の応答（例外の場合は例外）を受け渡すキュー
+        queue: asyncio.Queue = asyncio.Queue()
+        done = object()
+        # callと同じ再利用するチェーンから、bind_toolsしたLLMの部分（最後のtool_callsとtool_router以外）を使う
+        tool_chain = self.scheduler.chain(self.llm, self.tool, self._build_chain)
+        stream_chain = prompt_template
+        for step in tool_chain.steps[:-2]:
+            stream_chain = stream_chain | step
+
+        async def consume():
+            message = None
+            last = None
+            async for chunk in stream_chain.astream(invoke_args):
+                message = chunk if message is None else message + chunk
+                # 部分的なJSONの引数は、閉じていない文字列を閉じて解析される
+                if message.tool_calls:
+                    value = message.tool_calls[0]["args"].get(argument)
+                    if isinstance(value, str) and value != last:
+                        last = value
+                        await queue.put(value)
+            return message
+
+        async def run():
+            try:
+                message = await self.scheduler.run(self.llm, consume)
+            except Exception as e:
+                await queue.put((done, e))
+            else:
+                await queue.put((done, message))
+
+        task = asyncio.create_task(run())
+        try:
+            while True:
+                item = await queue.get()
+                if isinstance(item, tuple) and item[0] is done:
+                    result = item[1]
+                    break
+                yield item
+        finally:
+            # 利用側が途中でやめた場合はLLMの呼び出しを止める
+            task.cancel()
+
+        if isinstance(result, Exception):
+            raise result
+        if result is None or not result.tool_calls:
+            raise ValueError(f"Tool {self.tool.name} was not called")
+
+        self.scheduler.record_usage(self.llm, result.usage_metadata)
+        if 1 < len(result.tool_calls):
+            print("warning: response contains multiple contents")
+
+        # Toolの結果を取得
+        content = self.tool.invoke(result.tool_calls[0]).content
+
+        if cache is not None and cache.enabled:
+            cache.put(key, content, model=get_model_name(self.llm))
+
+        yield content
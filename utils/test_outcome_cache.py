@@ -0,0 +1,124 @@
+"""
+テストの実行結果をディスクにキャッシュするモジュール。
+
+変更後のソースコード、テストコード、ビルドファイル、リポジトリのHEADの内容から
+キーを作り、テストの成否を `results/test_cache/<キーの先頭2文字>/<キー>.json` に保存します。
+同じMUTANTを再びテストする場合はGradleを起動せずに結果を返せます。
+
+使用例:
+    cache = TestOutcomeCache()
+    tree_hash = repository.tree_hash()
+    key = cache.key(repository, {Path("src/main/kotlin/Foo.kt"): mutated_code}, tests, tree_hash=tree_hash)
+    outcome = cache.get(key)
+    if outcome is None:
+        ...
+        cache.put(key, passed)
+"""
+
+from pathlib import Path
+from typing import Dict, List, Optional
+import hashlib
+import json
+import os
+import tempfile
+from utils.repository import Repository
+
+# テストの結果に影響するビルドファイル
+BUILD_FILES = [
+    "build.gradle.kts",
+    "build.gradle",
+    "settings.gradle.kts",
+    "settings.gradle",
+    "gradle.properties",
+    "gradle/libs.versions.toml",
+]
+
+
+class TestOutcomeCache:
+    # pytestにテストクラスとして収集されないようにする
+    __test__ = False
+
+    def __init__(self, root: Path = Path("results/test_cache")):
+        """
+        Args:
+            root: キャッシュを保存するディレクトリ
+        """
+        self.root = root
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, repository: Repository, sources: Dict[Path, str], tests: Optional[List[str]] = None, tree_hash: Optional[str] = None) -> str:
+        """テストの結果を一意に決めるキーを作成します。
+
+        Args:
+            repository: テストを実行するリポジトリ
+            sources: リポジトリのルートからの相対パスと、その内容（変更後のソースコードやテストコード）
+            tests: 実行するテストのフィルタ
+            tree_hash: 事前に取得したHEADのtreeハッシュ。省略時はgitを実行して取得する。
+                多くのMUTANTのキーを作る場合は、1回だけ取得して渡す
+
+        Returns:
+            キャッシュのキー
+        """
+        hasher = hashlib.sha256()
+
+        # sources以外のファイルはHEADの内容と同じ
+        if tree_hash is None:
+            tree_hash = repository.tree_hash()
+        hasher.update(f"tree:{tree_hash}\n".encode())
+
+        for name in BUILD_FILES:
+            path = repository.path / name
+            if path.exists():
+                hasher.update(f"build:{name}\n".encode())
+                hasher.update(hashlib.sha256(path.read_bytes()).hexdigest().encode())
+
+        for path, content in sorted(sources.items(), key=lambda item: str(item[0])):
+            hasher.update(f"source:{Path(path).as_posix()}\n".encode())
+            hasher.update(hashlib.sha256(content.encode()).hexdigest().encode())
+
+        hasher.update(f"tests:{','.join(tests or [])}\n".encode())
+        return hasher.hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.root / key[:2] / f"{key}.json"
+
+    def get(self, key: str) -> Optional[dict]:
+        """キャッシュされたテストの結果を取得します。
+
+        Args:
+            key: キャッシュのキー
+
+        Returns:
+            テストの結果（`passed` を含む辞書）。キャッシュがない場合はNone
+        """
+        path = self._path(key)
+        try:
+            with open(path) as f:
+                outcome = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return outcome
+
+    def put(self, key: str, passed: bool, **details):
+        """テストの結果をキャッシュに保存します。
+
+        Args:
+            key: キャッシュのキー
+            passed: テストが成功した場合はTrue
+            details: 一緒に保存する情報
+        """
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        # 途中で中断されても壊れたファイルが残らないように、一時ファイルから置き換える
+        fd, temp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump({"passed": passed, **details}, f)
+        os.replace(temp_path, path)
+
+    def report(self) -> str:
+        return f"test cache: {self.hits} hits, {self.misses} misses"
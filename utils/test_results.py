@@ -0,0 +1,245 @@
+"""
+GradleのテストのJUnit XMLレポートを解析するモジュール。
+
+`build/test-results/test/*.xml` からテストケースごとの結果（名前、状態、実行時間、失敗メッセージ）を
+取り出します。標準出力を解析する代わりにこの結果でMUTANTの検出を判定し、
+LLMに渡すエラーメッセージも失敗したテストだけの短い要約にします。
+
+使用例:
+    report = repository.run_tests(tests=["com.example.FooTest"])
+    if not report.is_success:
+        print(report.summary())
+"""
+
+from pathlib import Path
+from typing import List, Optional
+from utils.compile_errors import parse_compile_errors
+from utils.gradle_runner import GradleResult
+import subprocess
+import xml.etree.ElementTree as ET
+
+PASSED = "passed"
+FAILED = "failed"
+ERROR = "error"
+SKIPPED = "skipped"
+
+# 失敗の要約から除くスタックトレースの行
+FRAMEWORK_FRAME_PREFIXES = (
+    "at org.junit.",
+    "at org.gradle.",
+    "at java.base/",
+    "at jdk.internal.",
+    "at sun.reflect.",
+    "at kotlin.test.",
+    "at worker.org.gradle.",
+)
+
+
+def to_test_filter(test_id: str) -> str:
+    """テストケースのIDを、Gradleの `--tests` に渡せる形式に変換します。
+
+    JUnit 5のレポートではメソッド名に `()` が付くため取り除きます。
+    """
+    return test_id[:-2] if test_id.endswith("()") else test_id
+
+
+class TestCaseResult:
+    # pytestにテストクラスとして収集されないようにする
+    __test__ = False
+
+    def __init__(self, class_name: str, name: str, status: str, duration: float, message: Optional[str] = None, details: Optional[str] = None):
+        """
+        Args:
+            class_name: テストクラスの完全修飾名
+            name: テストケースの名前
+            status: passed, failed, error, skipped のいずれか
+            duration: 実行時間（秒）
+            message: 失敗した場合のメッセージ
+            details: 失敗した場合のスタックトレース
+        """
+        self.class_name = class_name
+        self.name = name
+        self.status = status
+        self.duration = duration
+        self.message = message
+        self.details = details
+
+    @property
+    def id(self) -> str:
+        return f"{self.class_name}.{self.name}"
+
+    @property
+    def is_failure(self) -> bool:
+        return self.status in (FAILED, ERROR)
+
+    def __repr__(self):
+        return f"TestCaseResult({self.id!r}, {self.status!r})"
+
+    def summary(self, max_frames: int = 3) -> str:
+        """失敗したテストケースの要約を返します。"""
+        lines = [f"{self.status.upper()} {self.id} ({self.duration:.3f}s)"]
+        if self.message:
+            lines.append(f"  {self.message.strip()}")
+
+        frames = []
+        for line in (self.details or "").splitlines():
+            line = line.strip()
+            if line.startswith("at ") and not line.startswith(FRAMEWORK_FRAME_PREFIXES):
+                frames.append(f"    {line}")
+        lines.extend(frames[:max_frames])
+        return "\n".join(lines)
+
+
+def parse_junit_xml(path: Path) -> List[TestCaseResult]:
+    """JUnit XMLのファイルからテストケースの結果を取り出します。
+
+    Args:
+        path: JUnit XMLのファイル
+
+    Returns:
+        テストケースの結果のリスト
+    """
+    root = ET.parse(path).getroot()
+    suites = [root] if root.tag == "testsuite" else root.iter("testsuite")
+
+    results = []
+    for suite in suites:
+        for testcase in suite.iter("testcase"):
+            status = PASSED
+            message = None
+            details = None
+            for tag in (FAILED, ERROR):
+                # JUnit XMLでは失敗は <failure>、予期しない例外は <error> で表される
+                element = testcase.find("failure" if tag == FAILED else "error")
+                if element is not None:
+                    status = tag
+                    message = element.get("message")
+                    details = element.text
+                    break
+            else:
+                if testcase.find(SKIPPED) is not None:
+                    status = SKIPPED
+
+            results.append(TestCaseResult(
+                class_name=testcase.get("classname") or suite.get("name", ""),
+                name=testcase.get("name", ""),
+                status=status,
+                duration=float(testcase.get("time") or 0),
+                message=message,
+                details=details,
+            ))
+    return results
+
+
+class TestReport:
+    # pytestにテストクラスとして収集されないようにする
+    __test__ = False
+
+    def __init__(self, cases: List[TestCaseResult], gradle_result: Optional[GradleResult] = None):
+        """
+        Args:
+            cases: テストケースの結果のリスト
+            gradle_result: テストを実行したGradleの結果
+        """
+        self.cases = cases
+        self.gradle_result = gradle_result
+
+    @classmethod
+    def load(cls, results_dir: Path, gradle_result: Optional[GradleResult] = None) -> "TestReport":
+        """ディレクトリ内の全てのJUnit XMLを読み込みます。
+
+        Args:
+            results_dir: JUnit XMLのディレクトリ（build/test-results/test）
+            gradle_result: テストを実行したGradleの結果
+        """
+        cases = []
+        for path in sorted(results_dir.glob("*.xml")) if results_dir.exists() else []:
+            try:
+                cases.extend(parse_junit_xml(path))
+            except ET.ParseError as e:
+                print(f"warning: failed to parse {path}: {e}")
+        return cls(cases, gradle_result)
+
+    @property
+    def failures(self) -> List[TestCaseResult]:
+        return [case for case in self.cases if case.is_failure]
+
+    @property
+    def failed_tests(self) -> List[str]:
+        """失敗したテストケースのIDのリスト"""
+        return [case.id for case in self.failures]
+
+    @property
+    def is_success(self) -> bool:
+        """Gradleが成功し、失敗したテストケースがない場合はTrue"""
+        if self.gradle_result is not None and not self.gradle_result.is_success:
+            return False
+        return not self.failures
+
+    @property
+    def timed_out(self) -> bool:
+        """Gradleがタイムアウトして強制終了された場合はTrue"""
+        return self.gradle_result is not None and self.gradle_result.timed_out
+
+    @property
+    def output(self) -> str:
+        if self.gradle_result is None:
+            return ""
+        return self.gradle_result.stdout + "\n" + self.gradle_result.stderr
+
+    def summary(self, limit: int = 10) -> str:
+        """LLMに渡すための失敗の要約を返します。
+
+        失敗したテストケースがあればその要約を、なければコンパイルエラーの要約を、
+        それもなければGradleの出力の末尾を返します。
+
+        Args:
+            limit: 含めるテストケース（または行）の最大数
+        """
+        failures = self.failures
+        if self.timed_out:
+            return f"TIMED OUT after {self.gradle_result.elapsed:.1f}s ({len(self.cases)} tests finished, {len(failures)} failed)"
+        if failures:
+            lines = [case.summary() for case in failures[:limit]]
+            if limit < len(failures):
+                lines.append(f"... and {len(failures) - limit} more failed tests")
+            lines.append(f"{len(failures)} of {len(self.cases)} tests failed")
+            return "\n".join(lines)
+
+        errors = parse_compile_errors(self.output)
+        if errors:
+            return "\n".join(str(error) for error in errors[:limit])
+
+        return "\n".join(self.output.strip().splitlines()[-limit:])
+
+
+class TestFailure(subprocess.CalledProcessError):
+    """テストが失敗した場合のエラー。テストの結果を含みます。"""
+
+    # pytestにテストクラスとして収集されないようにする
+    __test__ = False
+
+    def __init__(self, report: TestReport):
+        gradle_result = report.gradle_result
+        super().__init__(
+            gradle_result.returncode if gradle_result is not None and not gradle_result.is_success else 1,
+            ["gradle", *(gradle_result.args if gradle_result is not None else [])],
+            gradle_result.stdout if gradle_result is not None else "",
+            gradle_result.stderr if gradle_result is not None else "",
+        )
+        self.report = report
+
+    def __str__(self):
+        failed_tests = self.report.failed_tests
+        if failed_tests:
+            return f"{len(failed_tests)} tests failed: {', '.join(failed_tests[:5])}"
+        return super().__str__()
+
+
+class TestTimeout(TestFailure):
+    """テストがタイムアウトした場合のエラー。無限ループなどでテストが終わらないMUTANTは検出されたものとみなします。"""
+
+    __test__ = False
+
+    def __str__(self):
+        return f"tests timed out after {self.report.gradle_result.elapsed:.1f}s"